@@ -13,10 +13,88 @@ class Settings:
     DATABASE_HOST: str = os.getenv("DATABASE_HOST", "localhost")
     DATABASE_PORT: str = os.getenv("DATABASE_PORT", "3306")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")  # "" = mysql+aiomysql ด้วยค่าด้านบน
+
+    # Connection pool (ใช้ทั้ง sync และ async engine)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # วินาที (ต่ำกว่า wait_timeout ของ MySQL)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
 
     # Other configurations
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # YOLO inference service
+    YOLO_MODEL_PATH: str = os.getenv("YOLO_MODEL_PATH", "app/models/best.pt")
+    YOLO_WORKERS: int = int(os.getenv("YOLO_WORKERS", 1))
+    YOLO_BACKEND: str = os.getenv("YOLO_BACKEND", "torch")  # "torch" หรือ "onnx"
+    YOLO_ONNX_INT8: bool = os.getenv("YOLO_ONNX_INT8", "false").lower() == "true"
+    YOLO_EXPORT_DIR: str = os.getenv("YOLO_EXPORT_DIR", "app/models/exported")
+    YOLO_IMGSZ: int = int(os.getenv("YOLO_IMGSZ", 640))
+    YOLO_BATCH_WINDOW_MS: float = float(os.getenv("YOLO_BATCH_WINDOW_MS", 15))  # เวลารอรวม batch สูงสุดต่อ request
+    YOLO_MAX_BATCH: int = int(os.getenv("YOLO_MAX_BATCH", 8))
+    YOLO_TORCH_THREADS: int = int(os.getenv("YOLO_TORCH_THREADS", 0))  # 0 = แบ่ง CPU ตามจำนวน replica
+    YOLO_CPU_AFFINITY: str = os.getenv("YOLO_CPU_AFFINITY", "")  # "", "auto" หรือ "0-3;4-7"
+    YOLO_MAX_PENDING: int = int(os.getenv("YOLO_MAX_PENDING", 32))  # งานค้างสูงสุดก่อนตอบ 503
+    YOLO_RETRY_AFTER: int = int(os.getenv("YOLO_RETRY_AFTER", 1))
+    YOLO_DETECT_TIMEOUT: float = float(os.getenv("YOLO_DETECT_TIMEOUT", 30))  # วินาทีที่รอผลตรวจจับสูงสุด (0 = ไม่จำกัด)
+
+    # /packing/detect: ถอดรหัสภาพจากหน่วยความจำ และเก็บภาพลงดิสก์แบบ background
+    DETECT_IN_MEMORY: bool = os.getenv("DETECT_IN_MEMORY", "true").lower() == "true"
+    DETECT_ARCHIVE_IMAGES: bool = os.getenv("DETECT_ARCHIVE_IMAGES", "true").lower() == "true"
+    DETECT_RESULT_CACHE_SIZE: int = int(os.getenv("DETECT_RESULT_CACHE_SIZE", 64))  # ผลล่าสุดที่เก็บไว้สร้างภาพ annotated
+    DETECT_CACHE_MAX_MB: int = int(os.getenv("DETECT_CACHE_MAX_MB", 64))  # cache ผลตรวจจับตาม hash ของภาพ
+    DETECT_CACHE_DIR: str = os.getenv("DETECT_CACHE_DIR", "")  # "" = ไม่ใช้ชั้นดิสก์
+    DETECT_CACHE_DISK_MAX_MB: int = int(os.getenv("DETECT_CACHE_DISK_MAX_MB", 512))  # เกินแล้วลบไฟล์ที่ใช้ล่าสุดนานที่สุดก่อน
+
+    # กล้อง RTSP (หนึ่ง thread ถอดรหัสต่อกล้อง)
+    CAMERA_BUFFER_SIZE: int = int(os.getenv("CAMERA_BUFFER_SIZE", 4))  # จำนวนเฟรมล่าสุดที่เก็บไว้
+    CAMERA_RECONNECT_DELAY: float = float(os.getenv("CAMERA_RECONNECT_DELAY", 2))
+    CAMERA_OPEN_TIMEOUT: float = float(os.getenv("CAMERA_OPEN_TIMEOUT", 10))  # วินาที
+    CAMERA_READ_TIMEOUT: float = float(os.getenv("CAMERA_READ_TIMEOUT", 5))  # วินาที
+    STREAM_JPEG_QUALITY: int = int(os.getenv("STREAM_JPEG_QUALITY", 80))
+    STREAM_MAX_WIDTH: int = int(os.getenv("STREAM_MAX_WIDTH", 0))  # 0 = ขนาดเดิมของกล้อง
+
+    # Live detection บนกล้อง
+    LIVE_INFERENCE_FPS: float = float(os.getenv("LIVE_INFERENCE_FPS", 2))
+    LIVE_MAX_FPS: float = float(os.getenv("LIVE_MAX_FPS", 10))
+
+    # ตรวจสอบออเดอร์จากผลตรวจจับ (label ของ YOLO -> product_id)
+    LABEL_INDEX_TTL: float = float(os.getenv("LABEL_INDEX_TTL", 300))  # วินาที
+    YOLO_LABEL_MAP_PATH: str = os.getenv("YOLO_LABEL_MAP_PATH", "")  # JSON {"label": product_id} (ถ้ามี)
+
+    # Principal cache (ผู้ใช้ที่ login แล้ว สำหรับตรวจสิทธิ์)
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))  # วินาที (0 = ปิด)
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024))
+
+    # Password hashing (bcrypt)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))  # เปลี่ยนแล้ว hash เดิมจะถูก rehash ตอน login
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))  # เกินนี้ตอบ 503
+
+    # Catalog snapshot (หน้าแรก / หน้าหมวดหมู่)
+    CATALOG_TTL: float = float(os.getenv("CATALOG_TTL", 300))  # วินาที
+
+    # Page cache ของหน้า HTML สาธารณะ (ผู้ใช้ที่ยังไม่ login)
+    PAGE_CACHE_SIZE: int = int(os.getenv("PAGE_CACHE_SIZE", 64))
+    PAGE_CACHE_MAX_AGE: int = int(os.getenv("PAGE_CACHE_MAX_AGE", 0))  # วินาที (0 = ต้อง revalidate ทุกครั้ง)
+
+    # ค้นหาสินค้า (ค่าเริ่มต้นใช้ inverted index ในหน่วยความจำ)
+    SEARCH_USE_FULLTEXT: bool = os.getenv("SEARCH_USE_FULLTEXT", "false").lower() == "true"  # ใช้ MySQL FULLTEXT แทน
+
+    # Rollup ยอดขายรายชั่วโมง / รายวัน (dashboard ผู้บริหาร)
+    DASHBOARD_USE_ROLLUPS: bool = os.getenv("DASHBOARD_USE_ROLLUPS", "true").lower() == "true"
+    ROLLUP_RECONCILE_INTERVAL: float = float(os.getenv("ROLLUP_RECONCILE_INTERVAL", 3600))  # วินาที (0 = ปิด)
+    ROLLUP_RECONCILE_DAYS: int = int(os.getenv("ROLLUP_RECONCILE_DAYS", 2))  # คำนวณใหม่ย้อนหลังกี่วัน
+
+    # Cache ข้อมูล dashboard (วินาที, 0 = ไม่ cache)
+    DASHBOARD_CACHE_TTL_TODAY: float = float(os.getenv("DASHBOARD_CACHE_TTL_TODAY", 15))
+    DASHBOARD_CACHE_TTL_WEEK: float = float(os.getenv("DASHBOARD_CACHE_TTL_WEEK", 60))
+    DASHBOARD_CACHE_TTL_MONTH: float = float(os.getenv("DASHBOARD_CACHE_TTL_MONTH", 300))
+    DASHBOARD_CACHE_TTL_YEAR: float = float(os.getenv("DASHBOARD_CACHE_TTL_YEAR", 900))
+    DASHBOARD_CACHE_MAX_STALE: float = float(os.getenv("DASHBOARD_CACHE_MAX_STALE", 300))  # ตอบค่าเก่าระหว่างคำนวณใหม่ได้นานสุด
+
 settings = Settings()
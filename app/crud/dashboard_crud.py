@@ -1,13 +1,20 @@
 # app/crud/dashboard_crud.py
 
-import json
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.crud.rollup_crud import summarize_window
 from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
 from app.models.user import User
 
-def get_executive_dashboard_data(db: Session, period: str):
-    now = datetime.utcnow()
+def get_period_range(period: str, now: datetime = None):
+    """
+    คืนค่า (start_date, end_date) ของ period: today / week / month / year
+    """
+    now = now or datetime.utcnow()
     # กำหนดช่วงเวลาตาม period ที่รับมา
     if period == "today":
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -19,125 +26,168 @@ def get_executive_dashboard_data(db: Session, period: str):
         start_date = now - timedelta(days=365)
     else:
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = now
-
-    # ดึงออเดอร์ในช่วงเวลาที่กำหนด พร้อมโหลด user relationship
-    orders = db.query(Order)\
-        .options(joinedload(Order.user))\
-        .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-        .all()
+    return start_date, now
 
-    # จำนวนออเดอร์ทั้งหมดในช่วงเวลา
-    total_orders = len(orders)
+def in_range(column, start_date, end_date, include_end: bool = True):
+    return and_(column >= start_date, column <= end_date if include_end else column < end_date)
 
-    # ยอดขายรวม (เฉพาะออเดอร์ที่ completed)
-    total_sales = sum(order.total for order in orders if order.status == "completed")
+# จำนวนออเดอร์และยอดขาย (เฉพาะ completed) ในช่วงเวลา: SQL แถวเดียว
+def get_order_totals(db: Session, start_date, end_date, include_end: bool = True):
+    total_orders, total_sales = db.query(
+        func.count(Order.order_id),
+        func.sum(case((Order.status == "completed", Order.total), else_=0)),
+    ).filter(in_range(Order.created_at, start_date, end_date, include_end)).one()
+    return total_orders or 0, total_sales or 0
 
-    # จำนวนลูกค้าใหม่ (แก้ไขให้ใช้ role_id แทน role string)
+# จำนวนลูกค้าใหม่ (role_id = 2) ในช่วงเวลา
+def get_new_customer_count(db: Session, start_date, end_date):
     try:
-        new_customers = db.query(User).filter(
+        return db.query(func.count(User.id)).filter(
             User.role_id == 2,  # 2 = customer
             User.created_at >= start_date,
             User.created_at <= end_date
-        ).count()
+        ).scalar() or 0
     except Exception:
-        new_customers = 0
+        return 0
+
+def format_day(day) -> str:
+    # MySQL คืนค่า DATE() เป็น date ส่วน SQLite คืนค่าเป็น string
+    return day if isinstance(day, str) else day.strftime("%Y-%m-%d")
+
+# ยอดขายรายวัน (เฉพาะ completed) GROUP BY วันที่
+def get_daily_sales(db: Session, start_date, end_date):
+    day = func.date(Order.created_at)
+    rows = db.query(day.label("day"), func.sum(Order.total))\
+        .filter(Order.status == "completed", in_range(Order.created_at, start_date, end_date))\
+        .group_by(day)\
+        .order_by(day)\
+        .all()
+    return [{"date": format_day(row_day), "amount": amount} for row_day, amount in rows]
+
+# สินค้าขายดี: SUM(quantity) GROUP BY สินค้า จากออเดอร์ในช่วงเวลา
+def get_top_products(db: Session, start_date, end_date, limit: int = 5):
+    name = func.coalesce(Product.name, "Unknown")
+    quantity = func.sum(OrderItem.quantity)
+    rows = db.query(name.label("name"), quantity.label("quantity"))\
+        .select_from(OrderItem)\
+        .join(Order, Order.order_id == OrderItem.order_id)\
+        .outerjoin(Product, Product.product_id == OrderItem.product_id)\
+        .filter(in_range(Order.created_at, start_date, end_date))\
+        .group_by(name)\
+        .order_by(quantity.desc())\
+        .limit(limit)\
+        .all()
+    return [{"name": row.name, "quantity": int(row.quantity or 0)} for row in rows]
+
+# ออเดอร์ล่าสุด (ดึงเฉพาะคอลัมน์ที่แสดง)
+def get_recent_orders(db: Session, start_date, end_date, limit: int = 5):
+    rows = db.query(Order.order_id, User.email, Order.total, Order.status)\
+        .outerjoin(User, User.id == Order.user_id)\
+        .filter(in_range(Order.created_at, start_date, end_date))\
+        .order_by(Order.created_at.desc())\
+        .limit(limit)\
+        .all()
+    return [
+        {"id": order_id, "customer": email or "Unknown", "total": total, "status": status}
+        for order_id, email, total, status in rows
+    ]
+
+# สรุปประสิทธิภาพพนักงาน: COUNT GROUP BY assigned_to พร้อม email ใน query เดียว
+def get_staff_performance(db: Session, start_date, end_date):
+    orders_handled = func.count(Order.order_id)
+    rows = db.query(Order.assigned_to, User.email, orders_handled)\
+        .outerjoin(User, User.id == Order.assigned_to)\
+        .filter(Order.assigned_to.isnot(None), in_range(Order.created_at, start_date, end_date))\
+        .group_by(Order.assigned_to, User.email)\
+        .order_by(orders_handled.desc())\
+        .all()
+    return [
+        {
+            "name": email or "Unknown",
+            "orders_handled": count,
+            "avg_time": 0,  # หากมีข้อมูลเวลาในการประมวลผลให้คำนวณจริง
+            "rating": 5,  # กำหนดค่า dummy rating หากไม่มีข้อมูลจริง
+        }
+        for _, email, count in rows
+    ]
+
+# สินค้าขายดีจาก product_id -> จำนวน (รวมตามชื่อแบบเดียวกับ get_top_products)
+def rank_products(db: Session, quantities: dict, limit: int = 5):
+    names = dict(db.query(Product.product_id, Product.name).filter(Product.product_id.in_(list(quantities)))) if quantities else {}
+    by_name = {}
+    for product_id, quantity in quantities.items():
+        name = names.get(product_id) or "Unknown"
+        by_name[name] = by_name.get(name, 0) + quantity
+    ranked = sorted(by_name.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [{"name": name, "quantity": quantity} for name, quantity in ranked if quantity]
+
+# ประสิทธิภาพพนักงานจาก staff_id -> จำนวนออเดอร์ (รูปแบบเดียวกับ get_staff_performance)
+def rank_staff(db: Session, handled: dict):
+    emails = dict(db.query(User.id, User.email).filter(User.id.in_(list(handled)))) if handled else {}
+    ranked = sorted(handled.items(), key=lambda item: -item[1])
+    return [
+        {"name": emails.get(staff_id) or "Unknown", "orders_handled": count, "avg_time": 0, "rating": 5}
+        for staff_id, count in ranked if count
+    ]
+
+# ข้อมูล dashboard ของแอดมิน: จำนวนผู้ใช้ทั้งหมด และยอดขาย completed ของวันนี้
+def get_admin_summary(db: Session, now: datetime = None):
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    user_count = db.query(func.count(User.id)).scalar() or 0
+    sales_today = db.query(func.sum(Order.total))\
+        .filter(Order.status == "completed", in_range(Order.created_at, today, today + timedelta(days=1), include_end=False))\
+        .scalar() or 0.0
+    return {"user_count": user_count, "sales_today": sales_today}
+
+def percent_change(current, previous) -> float:
+    return ((current - previous) / previous * 100) if previous > 0 else 0.0
+
+def get_executive_dashboard_data(db: Session, period: str):
+    """
+    ข้อมูล dashboard ผู้บริหาร อ่านจาก rollup ยอดขาย (DASHBOARD_USE_ROLLUPS) หรือ
+    คำนวณด้วย SUM / COUNT ... GROUP BY จาก tb_orders โดยตรง
+    """
+    start_date, end_date = get_period_range(period)
 
     # คำนวณข้อมูลของช่วงเวลาก่อนหน้า (previous period)
     period_delta = end_date - start_date
     previous_start = start_date - period_delta
     previous_end = start_date
 
-    previous_orders_all = db.query(Order)\
-        .filter(Order.created_at >= previous_start, Order.created_at < previous_end)\
-        .all()
-    previous_total_sales = sum(order.total for order in previous_orders_all if order.status == "completed")
-    previous_total_orders = len(previous_orders_all)
-    
-    try:
-        previous_new_customers = db.query(User).filter(
-            User.role_id == 2,  # 2 = customer
-            User.created_at >= previous_start,
-            User.created_at <= previous_end
-        ).count()
-    except Exception:
-        previous_new_customers = 0
+    if settings.DASHBOARD_USE_ROLLUPS:
+        # ✅ อ่านจาก rollup รายวัน / รายชั่วโมง + เศษชั่วโมงจาก tb_orders
+        current = summarize_window(db, start_date, end_date)
+        previous = summarize_window(db, previous_start, previous_end, include_end=False, details=False)
+        total_orders, total_sales = current["total_orders"], current["total_sales"]
+        previous_total_orders, previous_total_sales = previous["total_orders"], previous["total_sales"]
+        daily_sales = [{"date": day.strftime("%Y-%m-%d"), "amount": amount} for day, amount in current["daily_sales"].items()]
+        top_products = rank_products(db, current["products"])
+        staff_performance = rank_staff(db, current["staff"])
+    else:
+        total_orders, total_sales = get_order_totals(db, start_date, end_date)
+        previous_total_orders, previous_total_sales = get_order_totals(db, previous_start, previous_end, include_end=False)
+        daily_sales = get_daily_sales(db, start_date, end_date)
+        top_products = get_top_products(db, start_date, end_date)
+        staff_performance = get_staff_performance(db, start_date, end_date)
+
+    new_customers = get_new_customer_count(db, start_date, end_date)
+    previous_new_customers = get_new_customer_count(db, previous_start, previous_end)
 
     # คำนวณเปอร์เซ็นต์เปลี่ยนแปลง
-    growth_rate = ((total_sales - previous_total_sales) / previous_total_sales * 100) if previous_total_sales > 0 else 0.0
-    sales_change = ((total_sales - previous_total_sales) / previous_total_sales * 100) if previous_total_sales > 0 else 0.0
-    orders_change = ((total_orders - previous_total_orders) / previous_total_orders * 100) if previous_total_orders > 0 else 0.0
-    customers_change = ((new_customers - previous_new_customers) / previous_new_customers * 100) if previous_new_customers > 0 else 0.0
-
-    # สรุปยอดขายรายวัน (เฉพาะ completed)
-    daily_sales_dict = {}
-    for order in orders:
-        if order.status != "completed":
-            continue
-        order_date = order.created_at.strftime("%Y-%m-%d")
-        daily_sales_dict[order_date] = daily_sales_dict.get(order_date, 0) + order.total
-    daily_sales = [{"date": date, "amount": amount} for date, amount in sorted(daily_sales_dict.items())]
-
-    # สินค้าขายดี: ใช้ order_items relationship แทน
-    product_sales = {}
-    for order in orders:
-        if hasattr(order, 'order_items'):
-            for item in order.order_items:
-                product_name = item.product.name if item.product else "Unknown"
-                product_sales[product_name] = product_sales.get(product_name, 0) + item.quantity
-    
-    top_products = [
-        {"name": name, "quantity": quantity}
-        for name, quantity in sorted(product_sales.items(), key=lambda x: x[1], reverse=True)
-    ][:5]
-
-    # ออเดอร์ล่าสุด (จำกัด 5 รายการ)
-    recent_orders_query = db.query(Order)\
-        .options(joinedload(Order.user))\
-        .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-        .order_by(Order.created_at.desc())\
-        .limit(5)\
-        .all()
-    
-    recent_orders = []
-    for order in recent_orders_query:
-        recent_orders.append({
-            "id": order.order_id,
-            "customer": order.user.email if order.user else "Unknown",  # แก้ไขตรงนี้
-            "total": order.total,
-            "status": order.status
-        })
-
-    # สรุปประสิทธิภาพพนักงาน (group by assigned_to)
-    staff_dict = {}
-    for order in orders:
-        if order.assigned_to:
-            staff_dict.setdefault(order.assigned_to, []).append(order)
-    
-    staff_performance = []
-    for staff_id, orders_list in staff_dict.items():
-        staff_user = db.query(User).filter(User.id == staff_id).first()
-        staff_name = staff_user.email if staff_user else "Unknown"
-        orders_handled = len(orders_list)
-        avg_time = 0  # หากมีข้อมูลเวลาในการประมวลผลให้คำนวณจริง
-        rating = 5   # กำหนดค่า dummy rating หากไม่มีข้อมูลจริง
-        staff_performance.append({
-            "name": staff_name,
-            "orders_handled": orders_handled,
-            "avg_time": avg_time,
-            "rating": rating
-        })
+    sales_change = percent_change(total_sales, previous_total_sales)
+    orders_change = percent_change(total_orders, previous_total_orders)
+    customers_change = percent_change(new_customers, previous_new_customers)
 
     return {
         "total_sales": total_sales,
         "total_orders": total_orders,
         "new_customers": new_customers,
-        "growth_rate": round(growth_rate, 1),
+        "growth_rate": round(sales_change, 1),
         "sales_change": round(sales_change, 1),
         "orders_change": round(orders_change, 1),
         "customers_change": round(customers_change, 1),
         "daily_sales": daily_sales,
         "top_products": top_products,
-        "recent_orders": recent_orders,
-        "staff_performance": staff_performance
-    }
\ No newline at end of file
+        "recent_orders": get_recent_orders(db, start_date, end_date),
+        "staff_performance": staff_performance,
+    }
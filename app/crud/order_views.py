@@ -0,0 +1,55 @@
+# app/crud/order_views.py
+
+from sqlalchemy.orm import Session, Query, joinedload, selectinload
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
+from app.models.user import User
+
+# ชุด query ของออเดอร์แบบต่างๆ ที่โหลดข้อมูลที่เกี่ยวข้องล่วงหน้า
+# จำนวน query คงที่ไม่ขึ้นกับจำนวนออเดอร์ / สินค้า (ไม่มี lazy load ทีละแถว)
+# ทุกฟังก์ชันคืนค่า Query ให้ router ต่อ .filter() / .order_by() / .first() / .all() ได้เอง
+
+# ---------- summary: คอลัมน์ของออเดอร์ + email ลูกค้า (1 query, ไม่สร้าง ORM object) ----------
+def order_summaries(db: Session) -> Query:
+    return db.query(
+        Order.order_id,
+        Order.user_id,
+        User.email,
+        Order.total,
+        Order.status,
+        Order.created_at,
+        Order.slip_path,
+        Order.assigned_to,
+    ).outerjoin(User, User.id == Order.user_id)
+
+# ---------- with-items-and-products: ออเดอร์ + ลูกค้า (JOIN) + รายการสินค้าและชื่อสินค้า (SELECT ... IN + JOIN) = 2 query ----------
+def orders_with_items_and_products(db: Session) -> Query:
+    return db.query(Order).options(
+        joinedload(Order.user).load_only(User.email),
+        selectinload(Order.order_items).joinedload(OrderItem.product).load_only(Product.name),
+    )
+
+# ---------- item rows: รายการสินค้า + ชื่อสินค้าเป็นคอลัมน์ (1 query) ----------
+def order_item_rows(db: Session) -> Query:
+    return db.query(
+        OrderItem.item_id,
+        OrderItem.order_id,
+        OrderItem.product_id,
+        Product.name.label("product_name"),
+        OrderItem.quantity,
+        OrderItem.price_at_order,
+        OrderItem.total_item_price,
+    ).outerjoin(Product, Product.product_id == OrderItem.product_id).order_by(OrderItem.item_id)
+
+def serialize_item(item) -> dict:
+    """
+    รายการสินค้าในออเดอร์ (จาก orders_with_items_and_products) ในรูปแบบที่หน้า admin / preparation ใช้
+    """
+    return {
+        "product_id": item.product_id,
+        "quantity": item.quantity,
+        "price": item.price_at_order,
+        "total": item.total_item_price,
+        "product_name": item.product.name if item.product else "Unknown",
+    }
@@ -0,0 +1,59 @@
+# app/crud/product.py
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models.product import Product
+
+
+# ดึงสินค้าตามหมวดหมู่ (ใช้ index ของคอลัมน์ category) ไม่ระบุหมวดหมู่ = ทั้งหมด
+def get_products(db: Session, category: str = None):
+    query = db.query(Product)
+    if category and category != "all":
+        query = query.filter(Product.category == category)
+    return query.order_by(Product.product_id).all()
+
+# คอลัมน์ที่ API ให้เลือกผ่าน fields=
+PRODUCT_FIELDS = ("product_id", "name", "price", "description", "image_path", "stock", "category")
+
+# ดึงสินค้าแบบ keyset pagination (product_id > cursor) เลือกเฉพาะคอลัมน์ที่ต้องการ
+def list_products_page(
+    db: Session,
+    fields=PRODUCT_FIELDS,
+    cursor: int = None,
+    limit: int = 20,
+    category: str = None,
+    min_price: float = None,
+    max_price: float = None,
+):
+    query = db.query(*[getattr(Product, field) for field in fields])
+    if cursor is not None:
+        query = query.filter(Product.product_id > cursor)
+    if category and category != "all":
+        query = query.filter(Product.category == category)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+
+    # ดึงเกินมา 1 แถวเพื่อรู้ว่ายังมีหน้าถัดไปหรือไม่
+    rows = query.order_by(Product.product_id).limit(limit + 1).all()
+    return [row._asdict() for row in rows[:limit]], len(rows) > limit
+
+# ค้นหาด้วย MySQL FULLTEXT (index ft_tb_products_name_description แบบ ngram parser) คืนค่า [(product_id, score)]
+def search_products_fulltext(db: Session, query: str, limit: int = 20, category: str = None):
+    params = {"q": query, "limit": limit}
+    category_filter = ""
+    if category and category != "all":
+        category_filter = "AND category = :category "
+        params["category"] = category
+    rows = db.execute(
+        text(
+            "SELECT product_id, MATCH (name, description) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score "
+            "FROM tb_products "
+            "WHERE MATCH (name, description) AGAINST (:q IN NATURAL LANGUAGE MODE) "
+            + category_filter +
+            "ORDER BY score DESC, product_id LIMIT :limit"
+        ),
+        params,
+    )
+    return [(row.product_id, round(float(row.score), 4)) for row in rows]
@@ -0,0 +1,259 @@
+# app/crud/rollup_crud.py
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.sales_rollup import SalesRollup, ProductSalesRollup, StaffRollup
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+ROLLUP_MODELS = (SalesRollup, ProductSalesRollup, StaffRollup)
+
+# ---------- เวลา ----------
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def ceil_hour(value: datetime) -> datetime:
+    floored = floor_hour(value)
+    return floored if floored == value else floored + HOUR
+
+def floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def ceil_day(value: datetime) -> datetime:
+    floored = floor_day(value)
+    return floored if floored == value else floored + DAY
+
+def in_range(column, start, end, include_end: bool = False):
+    return and_(column >= start, column <= end if include_end else column < end)
+
+# ---------- คำนวณ rollup ใหม่ ----------
+
+def collect_orders(db: Session, condition, bucket_of=floor_hour, with_products: bool = True):
+    """
+    รวมยอดออเดอร์ดิบที่ตรงกับ condition ตาม bucket
+    คืนค่า (sales: bucket -> [orders, completed, completed_sales],
+            products: (bucket, product_id) -> quantity (ว่างถ้า with_products=False),
+            staff: (bucket, staff_id) -> orders_handled)
+    """
+    sales = defaultdict(lambda: [0, 0, 0])
+    staff = defaultdict(int)
+    rows = db.query(Order.created_at, Order.status, Order.total, Order.assigned_to).filter(condition)
+    for created_at, status, total, assigned_to in rows:
+        bucket = bucket_of(created_at)
+        totals = sales[bucket]
+        totals[0] += 1
+        if status == "completed":
+            totals[1] += 1
+            totals[2] += total or 0
+        if assigned_to is not None:
+            staff[(bucket, assigned_to)] += 1
+
+    products = defaultdict(int)
+    if not with_products:
+        return sales, products, staff
+    items = db.query(Order.created_at, OrderItem.product_id, OrderItem.quantity)\
+        .join(Order, Order.order_id == OrderItem.order_id)\
+        .filter(condition)
+    for created_at, product_id, quantity in items:
+        products[(bucket_of(created_at), product_id)] += quantity or 0
+    return sales, products, staff
+
+def replace_buckets(db: Session, granularity: str, start: datetime, end: datetime, sales, products, staff):
+    """
+    ลบ rollup ของ granularity ในช่วง [start, end) แล้วเขียนค่าที่คำนวณใหม่แทน
+    """
+    for model in ROLLUP_MODELS:
+        db.query(model).filter(model.granularity == granularity, in_range(model.bucket, start, end))\
+            .delete(synchronize_session=False)
+    db.bulk_insert_mappings(SalesRollup, [
+        {"granularity": granularity, "bucket": bucket, "orders_count": orders,
+         "completed_count": completed, "completed_sales": amount}
+        for bucket, (orders, completed, amount) in sales.items()
+    ])
+    db.bulk_insert_mappings(ProductSalesRollup, [
+        {"granularity": granularity, "bucket": bucket, "product_id": product_id, "quantity": quantity}
+        for (bucket, product_id), quantity in products.items() if quantity
+    ])
+    db.bulk_insert_mappings(StaffRollup, [
+        {"granularity": granularity, "bucket": bucket, "staff_id": staff_id, "orders_handled": count}
+        for (bucket, staff_id), count in staff.items()
+    ])
+
+def rebuild_hours(db: Session, start: datetime, end: datetime):
+    """
+    rollup รายชั่วโมงในช่วง [start, end) จาก tb_orders (start / end ต้องเป็นต้นชั่วโมง)
+    """
+    sales, products, staff = collect_orders(db, in_range(Order.created_at, start, end))
+    replace_buckets(db, "hour", start, end, sales, products, staff)
+
+def rebuild_days(db: Session, start: datetime, end: datetime):
+    """
+    rollup รายวันในช่วง [start, end) จากแถวรายชั่วโมง (start / end ต้องเป็นเที่ยงคืน)
+    """
+    sales = defaultdict(lambda: [0, 0, 0])
+    for bucket, orders, completed, amount in db.query(
+        SalesRollup.bucket, SalesRollup.orders_count, SalesRollup.completed_count, SalesRollup.completed_sales
+    ).filter(SalesRollup.granularity == "hour", in_range(SalesRollup.bucket, start, end)):
+        totals = sales[floor_day(bucket)]
+        totals[0] += orders
+        totals[1] += completed
+        totals[2] += amount
+
+    products = defaultdict(int)
+    for bucket, product_id, quantity in db.query(
+        ProductSalesRollup.bucket, ProductSalesRollup.product_id, ProductSalesRollup.quantity
+    ).filter(ProductSalesRollup.granularity == "hour", in_range(ProductSalesRollup.bucket, start, end)):
+        products[(floor_day(bucket), product_id)] += quantity
+
+    staff = defaultdict(int)
+    for bucket, staff_id, count in db.query(
+        StaffRollup.bucket, StaffRollup.staff_id, StaffRollup.orders_handled
+    ).filter(StaffRollup.granularity == "hour", in_range(StaffRollup.bucket, start, end)):
+        staff[(floor_day(bucket), staff_id)] += count
+
+    replace_buckets(db, "day", start, end, sales, products, staff)
+
+def refresh_order_rollups(db: Session, *created_ats):
+    """
+    อัปเดต rollup ของชั่วโมง / วันที่ออเดอร์ (ตาม created_at) อยู่ หลังออเดอร์ถูกสร้าง เปลี่ยนสถานะ หรือถูกลบ
+    เรียกหลัง commit ของออเดอร์แล้ว (created_at ให้เก็บไว้ก่อน commit) ผิดพลาดแค่ log ไว้ให้ reconcile ซ่อม
+    """
+    hours = sorted({floor_hour(created_at) for created_at in created_ats if created_at is not None})
+    if not hours:
+        return
+    try:
+        for hour in hours:
+            rebuild_hours(db, hour, hour + HOUR)
+        for day in sorted({floor_day(hour) for hour in hours}):
+            rebuild_days(db, day, day + DAY)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ อัปเดต rollup ยอดขายไม่สำเร็จ: {e}")
+
+def reconcile_rollups(db: Session, days: int = None) -> int:
+    """
+    คำนวณ rollup ใหม่จาก tb_orders ย้อนหลัง days วัน (None = ทั้งหมด) แก้ค่าที่คลาดเคลื่อน
+    เช่น อัปเดตพร้อมกันสองรายการ หรือแก้ออเดอร์ใน DB โดยตรง คืนค่าจำนวนวันที่คำนวณใหม่
+    """
+    end = floor_day(datetime.utcnow()) + DAY
+    if days is None:
+        first = db.query(func.min(Order.created_at)).scalar()
+        start = floor_day(first) if first else end
+        for model in ROLLUP_MODELS:
+            db.query(model).delete(synchronize_session=False)
+    else:
+        start = end - DAY * (days + 1)
+    rebuild_hours(db, start, end)
+    rebuild_days(db, start, end)
+    db.commit()
+    return (end - start).days
+
+def rollups_empty(db: Session) -> bool:
+    return db.query(SalesRollup.bucket).first() is None
+
+# ---------- อ่าน rollup ----------
+
+def window_segments(start: datetime, end: datetime):
+    """
+    แบ่งช่วงเวลา [start, end) เป็น (raw, hourly, daily)
+    - raw: เศษที่ไม่เต็มชั่วโมงตอนต้น / ท้าย อ่านจาก tb_orders
+    - hourly: ชั่วโมงเต็มของวันที่ไม่เต็มวัน
+    - daily: วันเต็ม
+    """
+    raw, hourly, daily = [], [], []
+    first_hour, last_hour = ceil_hour(start), floor_hour(end)
+    if first_hour >= last_hour:
+        return [(start, end)], hourly, daily
+    if start < first_hour:
+        raw.append((start, first_hour))
+    first_day, last_day = ceil_day(first_hour), floor_day(last_hour)
+    if first_day >= last_day:
+        hourly.append((first_hour, last_hour))
+    else:
+        if first_hour < first_day:
+            hourly.append((first_hour, first_day))
+        daily.append((first_day, last_day))
+        if last_day < last_hour:
+            hourly.append((last_day, last_hour))
+    if last_hour < end:
+        raw.append((last_hour, end))
+    return raw, hourly, daily
+
+def rollup_condition(model, hourly, daily):
+    return or_(
+        *[and_(model.granularity == "hour", in_range(model.bucket, start, end)) for start, end in hourly],
+        *[and_(model.granularity == "day", in_range(model.bucket, start, end)) for start, end in daily],
+    )
+
+def summarize_window(db: Session, start: datetime, end: datetime, include_end: bool = True, details: bool = True) -> dict:
+    """
+    ยอดรวมของออเดอร์ที่ created_at อยู่ในช่วงเวลา จาก rollup + เศษชั่วโมงจาก tb_orders
+    คืนค่า dict: total_orders, total_sales และถ้า details=True
+    daily_sales (วัน -> ยอดขาย completed), products (product_id -> จำนวน), staff (staff_id -> จำนวนออเดอร์)
+    """
+    raw, hourly, daily = window_segments(start, end)
+    # ช่วงสุดท้ายเป็นช่วงเดียวที่อาจรวมเวลาปลายทาง
+    raw_condition = or_(*[
+        in_range(Order.created_at, raw_start, raw_end, include_end and raw_end == end)
+        for raw_start, raw_end in raw
+    ]) if raw else None
+    if include_end and (not raw or raw[-1][1] != end):
+        boundary = Order.created_at == end
+        raw_condition = boundary if raw_condition is None else or_(raw_condition, boundary)
+
+    total_orders, total_sales = 0, 0
+    daily_sales = defaultdict(lambda: [0, 0])  # วัน -> [completed, ยอดขาย]
+    products = defaultdict(int)
+    staff = defaultdict(int)
+
+    if hourly or daily:
+        rows = db.query(
+            SalesRollup.bucket, SalesRollup.orders_count, SalesRollup.completed_count, SalesRollup.completed_sales
+        ).filter(rollup_condition(SalesRollup, hourly, daily))
+        for bucket, orders, completed, amount in rows:
+            total_orders += orders
+            total_sales += amount
+            if details and completed:
+                day = daily_sales[floor_day(bucket)]
+                day[0] += completed
+                day[1] += amount
+
+        if details:
+            quantity = func.sum(ProductSalesRollup.quantity)
+            for product_id, total in db.query(ProductSalesRollup.product_id, quantity)\
+                    .filter(rollup_condition(ProductSalesRollup, hourly, daily))\
+                    .group_by(ProductSalesRollup.product_id):
+                products[product_id] += int(total or 0)
+
+            handled = func.sum(StaffRollup.orders_handled)
+            for staff_id, total in db.query(StaffRollup.staff_id, handled)\
+                    .filter(rollup_condition(StaffRollup, hourly, daily))\
+                    .group_by(StaffRollup.staff_id):
+                staff[staff_id] += int(total or 0)
+
+    if raw_condition is not None:
+        sales, raw_products, raw_staff = collect_orders(db, raw_condition, bucket_of=floor_day, with_products=details)
+        for day, (orders, completed, amount) in sales.items():
+            total_orders += orders
+            total_sales += amount
+            if details and completed:
+                totals = daily_sales[day]
+                totals[0] += completed
+                totals[1] += amount
+        for (_, product_id), quantity in raw_products.items():
+            products[product_id] += quantity
+        for (_, staff_id), count in raw_staff.items():
+            staff[staff_id] += count
+
+    summary = {"total_orders": total_orders, "total_sales": total_sales}
+    if details:
+        summary["daily_sales"] = {day: amount for day, (_, amount) in sorted(daily_sales.items())}
+        summary["products"] = dict(products)
+        summary["staff"] = dict(staff)
+    return summary
@@ -4,13 +4,15 @@ from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.services.auth import verify_password, hash_password
+from app.services.principal_cache import invalidate_user
 from fastapi import HTTPException
 from datetime import datetime
 
 
-def create_user(db: Session, user: UserCreate):
-    # แฮชรหัสผ่านก่อนบันทึก
-    hashed_password = hash_password(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: str = None):
+    # แฮชรหัสผ่านก่อนบันทึก (route แบบ async ส่ง hash ที่คำนวณนอก event loop มาให้)
+    if hashed_password is None:
+        hashed_password = hash_password(user.password)
     
     db_user = User(
         email=user.email,
@@ -44,6 +46,7 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
     db_user = db.query(User).filter(User.id == user_id).first()
     if not db_user:
         return None
+    old_email = db_user.email
 
     # แฮชรหัสผ่านหากมีการอัปเดต
     if user.password:
@@ -68,6 +71,7 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
     
     db.commit()
     db.refresh(db_user)
+    invalidate_user(user_id, email=old_email)
     return db_user
 
 # ฟังก์ชันลบ User ด้วย ID
@@ -75,8 +79,10 @@ def delete_user(db: Session, user_id: int):
     db_user = db.query(User).filter(User.id == user_id).first()
     if not db_user:
         return None
+    email = db_user.email
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id, email=email)
     return db_user
 
 # อนุญาติให้ผู้ใช้เข้าถึงระบบ
@@ -88,6 +94,7 @@ def update_user_status(db: Session, user_id: int, is_active: bool):
     db_user.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_user)
+    invalidate_user(user_id, email=db_user.email)
     return db_user
 
 # ดึงข้อมูลผู้ใช้ตามบทบาท
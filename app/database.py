@@ -2,6 +2,7 @@
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker,declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from .config import settings
 
 # SQLAlchemy database URL สำหรับ MySQL
@@ -10,10 +11,42 @@ SQLALCHEMY_DATABASE_URL = (
     f"{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
 )
 
+# URL สำหรับ async engine (ค่าเริ่มต้นใช้ aiomysql กับฐานข้อมูลเดียวกัน)
+# ตั้ง ASYNC_DATABASE_URL เองได้ เช่น sqlite+aiosqlite:///./test.db สำหรับทดสอบในเครื่อง
+ASYNC_SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL or (
+    f"mysql+aiomysql://{settings.DATABASE_USERNAME}:{settings.DATABASE_PASSWORD}@"
+    f"{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
+)
+
+def pool_options(url: str) -> dict:
+    """
+    ค่า connection pool จาก Settings (SQLite ไม่ใช้ pool แบบ QueuePool จึงไม่ส่งค่าเหล่านี้)
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
 # สร้าง Engine และ Session สำหรับ MySQL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine ถูกสร้างเมื่อมีการใช้งานครั้งแรก (ไม่ต้องมี driver async ถ้าไม่ได้ใช้)
+async_engine = None
+AsyncSessionLocal = None
+
+def get_async_sessionmaker():
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **pool_options(ASYNC_SQLALCHEMY_DATABASE_URL))
+        AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
 # กำหนด Base สำหรับการสร้างโมเดล
 Base = declarative_base()
 
@@ -24,3 +57,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency สำหรับ async route: query ผ่าน AsyncSession ไม่บล็อก event loop
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -6,6 +6,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 from app import middleware
 from app.routers import user, product, public, admin, preparation, packing
+from app.database import dispose_async_engine
+from app.services.auth import shutdown_password_executor
+from app.services.rollup_reconciler import rollup_reconciler
 from fastapi.openapi.utils import get_openapi
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.trustedhost import TrustedHostMiddleware
@@ -39,11 +42,30 @@ app.include_router(user.router)
 app.include_router(user.protected_router)
 app.include_router(user.admin_router)
 app.include_router(product.order_router)
+app.include_router(product.product_router)
 app.include_router(public.router)
 app.include_router(admin.router)
 app.include_router(preparation.router)
 # app.include_router(packing.router)
 
+# ✅ ปิด connection pool ของ async engine ตอนปิด server
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+@app.on_event("shutdown")
+def stop_password_executor():
+    shutdown_password_executor()
+
+# ✅ reconcile rollup ยอดขายของ dashboard เป็นระยะ
+@app.on_event("startup")
+async def start_rollup_reconciler():
+    rollup_reconciler.start()
+
+@app.on_event("shutdown")
+async def stop_rollup_reconciler():
+    await rollup_reconciler.stop()
+
 # CORS middleware เพื่อให้ Swagger UI สามารถทำงานได้
 app.add_middleware(
     CORSMiddleware,
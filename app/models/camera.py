@@ -1,11 +1,14 @@
 # app/models/camera.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Camera(Base):
     __tablename__ = "tb_cameras"
+    __table_args__ = (
+        Index("ix_tb_cameras_assigned_to", "assigned_to"),  # กล้องของพนักงานแพ็ค
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(255), nullable=False)
@@ -1,11 +1,19 @@
 # app/models/order.py
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Order(Base):
     __tablename__ = "tb_orders"
+    # index ตามเงื่อนไขที่ query บ่อย (migration: migrations/versions/0002_hot_query_indexes.py)
+    __table_args__ = (
+        Index("ix_tb_orders_status_created_at", "status", "created_at"),  # คิวออเดอร์ตามสถานะ, ยอดขาย completed ตามช่วงเวลา
+        Index("ix_tb_orders_assigned_to_status", "assigned_to", "status"),  # ออเดอร์ที่พนักงานแพ็คกำลังทำ
+        Index("ix_tb_orders_assigned_to_created_at", "assigned_to", "created_at"),  # ประวัติงานของพนักงานรายวัน
+        Index("ix_tb_orders_created_at", "created_at"),  # dashboard / rollup ตามช่วงเวลา
+        Index("ix_tb_orders_user_id_created_at", "user_id", "created_at"),  # ออเดอร์ของลูกค้า
+    )
     
     order_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("tb_users.id"), nullable=False)
@@ -1,11 +1,14 @@
 # app/models/order_item.py
 
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class OrderItem(Base):
     __tablename__ = "tb_order_items"
+    __table_args__ = (
+        Index("ix_tb_order_items_order_id", "order_id"),  # รายการสินค้าของออเดอร์
+    )
     
     item_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     order_id = Column(Integer, ForeignKey("tb_orders.order_id"), nullable=False)
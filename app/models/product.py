@@ -13,9 +13,10 @@ class Product(Base):
     description = Column(Text, nullable=False)
     image_path = Column(String(255), nullable=False)
     stock = Column(Integer, default=0)
+    category = Column(String(50), nullable=False, default="other", server_default="other", index=True)
     
     # ความสัมพันธ์กับตาราง OrderItem
     order_items = relationship("OrderItem", back_populates="product")
     
     def __repr__(self):
-        return f"<Product(product_id={self.product_id}, name='{self.name}', price={self.price}, stock={self.stock})>"
\ No newline at end of file
+        return f"<Product(product_id={self.product_id}, name='{self.name}', price={self.price}, stock={self.stock}, category='{self.category}')>"
\ No newline at end of file
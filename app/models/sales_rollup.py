@@ -0,0 +1,42 @@
+# app/models/sales_rollup.py
+
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.database import Base
+
+# granularity: "hour" = bucket ต้นชั่วโมง, "day" = bucket เที่ยงคืน (UTC เหมือน created_at ของออเดอร์)
+
+class SalesRollup(Base):
+    __tablename__ = "tb_sales_rollup"
+
+    granularity = Column(String(4), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)      # ออเดอร์ทุกสถานะ
+    completed_count = Column(Integer, nullable=False, default=0)   # ออเดอร์ที่ completed
+    completed_sales = Column(Float, nullable=False, default=0.0)   # ยอดขายของออเดอร์ที่ completed
+
+    def __repr__(self):
+        return f"<SalesRollup(granularity='{self.granularity}', bucket={self.bucket}, orders_count={self.orders_count}, completed_sales={self.completed_sales})>"
+
+
+class ProductSalesRollup(Base):
+    __tablename__ = "tb_product_sales_rollup"
+
+    granularity = Column(String(4), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProductSalesRollup(granularity='{self.granularity}', bucket={self.bucket}, product_id={self.product_id}, quantity={self.quantity})>"
+
+
+class StaffRollup(Base):
+    __tablename__ = "tb_staff_rollup"
+
+    granularity = Column(String(4), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    staff_id = Column(Integer, primary_key=True)
+    orders_handled = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StaffRollup(granularity='{self.granularity}', bucket={self.bucket}, staff_id={self.staff_id}, orders_handled={self.orders_handled})>"
@@ -1,6 +1,6 @@
 # app/models/user.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 import typing
@@ -14,6 +14,9 @@ if typing.TYPE_CHECKING:
 
 class User(Base):
     __tablename__ = "tb_users"
+    __table_args__ = (
+        Index("ix_tb_users_role_id_is_active", "role_id", "is_active"),  # ผู้ใช้ตามบทบาท / รอ activate
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False)
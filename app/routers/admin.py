@@ -7,18 +7,23 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from app.services.ws_manager import NotifyPayload, notify_admin
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, cast, Date, and_, or_
+from sqlalchemy import and_, or_
 from app.models.user import User
 from app.models.order import Order
 from app.models.camera import Camera
 from app.services.auth import get_user_with_role_and_position_and_isActive, get_current_user, get_user_with_role
+from app.services.principal_cache import invalidate_user
 from app.services.ws_manager import admin_connections
-from app.database import get_db
+from app.database import get_db, get_async_db, get_async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.templating import Jinja2Templates
 from app.crud import camera as camera_crud
 from app.schemas.camera import CameraCreate, CameraUpdate, Camera as CameraSchema
 from app.crud import user as user_crud
 from app.crud import dashboard_crud
+from app.crud.rollup_crud import refresh_order_rollups
+from app.crud.order_views import orders_with_items_and_products, serialize_item
+from app.services.dashboard_cache import dashboard_cache, period_ttl
 
 admin_connections: List[WebSocket] = []
 templates = Jinja2Templates(directory="app/templates")
@@ -53,33 +58,25 @@ def dashboard_redirect(
     else:
         raise HTTPException(status_code=403, detail="❌ Access Denied: Role or Position Invalid")
 
+# ✅ คำนวณข้อมูล dashboard ด้วย session ของตัวเอง (dashboard_cache อาจเรียกเบื้องหลังหลัง request จบแล้ว)
+async def compute_dashboard(function, *args):
+    async with get_async_sessionmaker()() as db:
+        return await db.run_sync(function, *args)
+
 # Route สำหรับดึงข้อมูลแดชบอร์ด
 @router.get("/dashboard-data")
-def get_dashboard_data(
-    db: Session = Depends(get_db),
+async def get_dashboard_data(
     current_user=Depends(get_user_with_role_and_position_and_isActive(1, 2))
 ):
     """
-    ดึงข้อมูลแดชบอร์ด พร้อมยอดขายวันนี้จากออเดอร์ที่สถานะเป็น completed
+    ดึงข้อมูลแดชบอร์ด พร้อมยอดขายวันนี้จากออเดอร์ที่สถานะเป็น completed (cache ตาม TTL ของ "today")
     """
-    # นับจำนวนผู้ใช้ทั้งหมด
-    user_count = db.query(User).count()
-
-    # คำนวณยอดขายวันนี้ จากตาราง Order
-    sales_today = (
-        db.query(func.sum(Order.total))
-        .filter(
-            Order.status == "completed",  # เฉพาะสถานะที่เป็น completed
-            cast(Order.created_at, Date) == datetime.utcnow().date()  # เฉพาะออเดอร์วันนี้
-        )
-        .scalar() or 0.0  # หากไม่มีข้อมูลให้ส่ง 0.0
+    return await dashboard_cache.get(
+        ("admin",),
+        lambda: compute_dashboard(dashboard_crud.get_admin_summary),
+        period_ttl("today"),
     )
 
-    return {
-        "user_count": user_count,
-        "sales_today": sales_today
-    }
-
 # Route สำหรับ Activate ผู้ใช้
 @router.get("/activate", response_class=HTMLResponse)
 def get_user_management(
@@ -136,6 +133,7 @@ def update_user_role(
     
     db.commit()
     db.refresh(user)
+    invalidate_user(user.id, email=user.email)
     
     role_name = "employee" if new_role_id == 1 else "customer"
     return {"message": f"✅ บทบาทของผู้ใช้ {user_id} ถูกอัปเดตเป็น {role_name}"}
@@ -167,6 +165,7 @@ def update_user_position(
     user.position_id = int(new_position_id)  # แปลงเป็น int ก่อนบันทึก
     db.commit()
     db.refresh(user)
+    invalidate_user(user.id, email=user.email)
 
     position_names = {
         1: "executive",
@@ -206,8 +205,10 @@ def delete_user(
         if admin_count == 0:
             raise HTTPException(status_code=400, detail="❌ Cannot delete the last admin/executive")
 
+    email = user.email
     db.delete(user)
     db.commit()
+    invalidate_user(user_id, email=email)
     
     return {"message": f"✅ ผู้ใช้ {user_id} ถูกลบสำเร็จ"}
 
@@ -239,21 +240,12 @@ def get_pending_orders(
     """
     ดึงข้อมูลออเดอร์ที่มีสถานะ pending
     """
-    pending_orders = db.query(Order).filter(Order.status == "pending").all()
+    # โหลดลูกค้า รายการสินค้า และชื่อสินค้าล่วงหน้า (จำนวน query คงที่)
+    pending_orders = orders_with_items_and_products(db).filter(Order.status == "pending").all()
     
     orders_data = []
     for order in pending_orders:
-        # ดึงข้อมูลสินค้าจาก relationship แทน
-        items_data = []
-        if order.order_items:
-            for item in order.order_items:
-                items_data.append({
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price": item.price_at_order,
-                    "total": item.total_item_price,
-                    "product_name": item.product.name if item.product else "Unknown"
-                })
+        items_data = [serialize_item(item) for item in order.order_items]
 
         # ตรวจสอบ slip_path
         if order.slip_path:
@@ -325,7 +317,9 @@ def approve_order(
         raise HTTPException(status_code=404, detail="❌ Order not found")
 
     order.status = "confirmed"
+    created_at = order.created_at
     db.commit()
+    refresh_order_rollups(db, created_at)
     return {"message": f"✅ Order {order_id} confirmed successfully"}
 
 @router.put("/users/{user_id}/change-role", response_class=JSONResponse)
@@ -351,6 +345,7 @@ def change_user_role(
     user.position_id = role
     user.is_active = False
     db.commit()
+    invalidate_user(user_id, email=user.email)
     return {"message": f"✅ User {user_id} role updated to {role}"}
 
 # Route สำหรับยกเลิกออเดอร์
@@ -367,8 +362,10 @@ def cancel_order(
     if not order:
         raise HTTPException(status_code=404, detail="❌ Order not found")
 
+    created_at = order.created_at
     db.delete(order)
     db.commit()
+    refresh_order_rollups(db, created_at)
     return {"message": f"✅ Order {order_id} canceled successfully"}
 
 # Route สำหรับดึงข้อมูลผู้ใช้ที่ต้องการ Activate
@@ -561,15 +558,19 @@ async def get_executive_dashboard(
 @router.get("/api/executive/dashboard-data")
 async def get_executive_dashboard_data(
     period: str = Query('today', enum=['today', 'week', 'month', 'year']),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 1))
 ):
-    return dashboard_crud.get_executive_dashboard_data(db, period)
+    # ✅ cache ตาม period: หลายแท็บที่ poll พร้อมกันใช้ผลการคำนวณเดียวกัน (query รันผ่าน run_sync ไม่บล็อก event loop)
+    return await dashboard_cache.get(
+        ("executive", period),
+        lambda: compute_dashboard(dashboard_crud.get_executive_dashboard_data, period),
+        period_ttl(period),
+    )
 
 
 # Camera Management Routes
 @router.get("/cameras", response_class=HTMLResponse)
-async def get_cameras_page(
+def get_cameras_page(
     request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 2))
@@ -591,7 +592,7 @@ async def get_cameras_page(
 
 # Camera API Endpoints
 @router.get("/api/cameras", response_model=List[CameraSchema])
-async def get_cameras(
+def get_cameras(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 2))
 ):
@@ -599,7 +600,7 @@ async def get_cameras(
     return camera_crud.get_cameras(db)
 
 @router.post("/api/cameras", response_model=CameraSchema)
-async def create_camera(
+def create_camera(
     camera: CameraCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 2))
@@ -609,7 +610,7 @@ async def create_camera(
     return db_camera
 
 @router.put("/api/cameras/{camera_id}", response_model=CameraSchema)
-async def update_camera(
+def update_camera(
     camera_id: int,
     camera: CameraUpdate,
     db: Session = Depends(get_db),
@@ -622,7 +623,7 @@ async def update_camera(
     return db_camera
 
 @router.delete("/api/cameras/{camera_id}")
-async def delete_camera(
+def delete_camera(
     camera_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 2))
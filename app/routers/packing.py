@@ -1,9 +1,8 @@
 # app/routers/packing.py
 
-from concurrent.futures import ThreadPoolExecutor,ProcessPoolExecutor
 import asyncio
 import requests
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException,Query,Header, Response, Request, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException,Query,Header, Response, Request, Form, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session, joinedload
@@ -13,88 +12,65 @@ from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.product import Product
 from app.schemas.order import VerifyRequest
-from app.services.auth import get_user_with_role_and_position_and_isActive, get_current_user
-from app.database import get_db
-import subprocess,json,shutil,torch,os,cv2,traceback,threading
-from ultralytics import YOLO
+from app.services.auth import get_user_with_role_and_position_and_isActive, get_current_user, get_websocket_user
+from app.services.yolo_service import get_yolo_service, InferenceQueueFull, InferenceTimeout
+from app.services.image_archive import archive_detection_images, write_image
+from app.services.detection_results import recent_detections
+from app.services.detection_cache import detection_cache, detection_cache_key
+from app.services import yolo_worker
+from app.services.camera_broker import get_camera_broker
+from app.services.mjpeg_stream import get_mjpeg_hub
+from app.services.live_detection import get_live_detection_manager
+from app.services.order_verification import verify_detections
+from app.crud.rollup_crud import refresh_order_rollups
+from app.config import settings
+from app.database import get_db, get_async_db, get_async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+import shutil,os,cv2,traceback,threading
 
 router = APIRouter(prefix="/packing", tags=["Packing Staff"])
 stream_lock = asyncio.Lock()  # Lock เพื่อจัดการการเข้าถึง Stream
 
-# ✅ โหลดโมเดล YOLOv10
-MODEL_PATH = "app/models/best.pt"
+# ✅ โมเดล YOLOv10 ถูกโหลดค้างไว้ใน app/services/yolo_service.py
 UPLOAD_DIR = "uploads/packing_images"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # stream_lock = threading.Lock()  # Lock เพื่อจัดการการเข้าถึง Stream
 
-try:
-    model = YOLO(MODEL_PATH)
-except Exception as e:
-    raise HTTPException(status_code=500, detail=f"❌ Failed to load YOLOv10 model: {str(e)}")
 
+# ✅ กล้อง IP RTSP: แต่ละกล้องถูกถอดรหัสด้วย thread เดียวใน app/services/camera_broker.py
+# (stream / snapshot / detect อ่านเฟรมล่าสุดจาก ring buffer แทนการเรียก VideoCapture.read() ใน request)
 
-# ✅ กล้อง IP RTSP
-RTSP_LINK = None
-
-# gst_pipeline = (
-#     f"rtspsrc location={RTSP_LINK} latency=0 ! "
-#     "decodebin ! videoconvert ! appsink"
-# )
-# video_capture = cv2.VideoCapture(gst_pipeline, cv2.CAP_GSTREAMER)
-
-video_capture = cv2.VideoCapture(RTSP_LINK, cv2.CAP_FFMPEG)
-# video_capture = cv2.VideoCapture(RTSP_LINK)
-video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # ลดขนาด buffer เพื่อประมวลผลได้เร็วขึ้น
-video_capture.set(cv2.CAP_PROP_FPS, 15)  # ลด Frame Rate
-video_capture.set(cv2.CAP_PROP_POS_MSEC, 5000)  # กำหนด timeout (5 วินาที)
-
-video_captures = {}  # ใช้ camera_id เป็น key
-
-async def start_camera(camera_id: int, rtsp_link: str):
-    global video_captures
+async def get_camera_or_404(db: AsyncSession, camera_id: int) -> Camera:
+    camera = await db.get(Camera, camera_id)
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return camera
 
-    # ถ้ามีกล้องตัวนี้อยู่แล้วให้ปิดก่อน
-    if camera_id in video_captures:
-        video_captures[camera_id].release()
-        del video_captures[camera_id]
-        await asyncio.sleep(1)
+async def read_camera_frame(camera_id: int):
+    """
+    ดึงเฟรมล่าสุดของกล้องที่เปิดอยู่ (ถ้ายังไม่มีเฟรมจะรอใน thread ของกล้องไม่เกิน CAMERA_READ_TIMEOUT)
+    """
+    broker = get_camera_broker()
+    feed = broker.get(camera_id)
+    if feed is None:
+        raise HTTPException(status_code=400, detail=f"Camera {camera_id} is not opened")
 
-    print(f"🔍 เปิดกล้อง {camera_id} ที่ {rtsp_link}")
-    
-    video_capture = cv2.VideoCapture(rtsp_link, cv2.CAP_FFMPEG)
-    if not video_capture.isOpened():
-        print(f"❌ ไม่สามารถเปิดกล้อง {camera_id}")
-        return False
-
-    video_captures[camera_id] = video_capture
-    print(f"✅ เปิดกล้อง {camera_id} สำเร็จ")
-    return True
-
-async def stop_camera(camera_id: int):
-    global video_captures
-    if camera_id in video_captures:
-        print(f"🛑 ปิดกล้อง {camera_id}")
-        video_captures[camera_id].release()
-        del video_captures[camera_id]
-        await asyncio.sleep(1)
-    print(f"✅ กล้อง {camera_id} ถูกปิด")
+    entry = feed.latest() or await broker.next_frame(feed)
+    if entry is None:
+        raise HTTPException(status_code=504, detail=f"Cannot read frame from camera {camera_id}")
+    return entry
 
 # ✅ แคปภาพจากกล้อง
 @router.get("/snapshot")
 async def snapshot(
     camera_id: int = Query(..., description="ID ของกล้องที่ต้องการแคปภาพ"),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
-    global video_captures
-
-    if camera_id not in video_captures or not video_captures[camera_id].isOpened():
-        raise HTTPException(status_code=400, detail=f"Camera {camera_id} is not opened")
-
-    success, frame = video_captures[camera_id].read()
-    if not success:
-        raise HTTPException(status_code=500, detail=f"Cannot read frame from camera {camera_id}")
+    _, _, frame = await read_camera_frame(camera_id)
 
     # encode เป็น jpg
     _, buffer = cv2.imencode('.jpg', frame)
@@ -112,40 +88,50 @@ async def stream_video(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
-    global video_captures
-
-    # ดึงข้อมูลกล้องจาก DB
-    camera = db.query(Camera).filter(Camera.id == camera_id).first()
-    if not camera:
-        raise HTTPException(status_code=404, detail="Camera not found")
-
-    rtsp_link = camera.stream_url  # ดึง RTSP link จาก DB
-
-    # ตรวจสอบว่ากล้องถูกเปิดแล้วหรือยัง
-    if camera_id not in video_captures or not video_captures[camera_id].isOpened():
-        await start_camera(camera_id, rtsp_link)
+    # ดึงข้อมูลกล้องจาก DB (session สั้น ๆ ไม่ถือ connection ค้างไว้ตลอดการสตรีม)
+    async with get_async_sessionmaker()() as adb:
+        camera = await get_camera_or_404(adb, camera_id)
+    # ✅ คืน connection ของ session ที่ใช้ตรวจสิทธิ์ก่อนเริ่มสตรีม
+    await run_in_threadpool(db.close)
+
+    # ✅ ลงทะเบียนเป็นผู้ชม (ถ้ากล้องยังไม่เปิด broker จะเปิดให้)
+    broker = get_camera_broker()
+    feed = broker.acquire(camera_id, camera.stream_url)
+    # ✅ รอเปิดกล้องแบบ awaitable พร้อม timeout (กล้องที่ค้างไม่บล็อก event loop)
+    # client หลุด / request ถูกยกเลิกระหว่างรอ (CancelledError) ก็ต้องคืนกล้องเหมือนกัน
+    try:
+        ready = await broker.wait_ready(feed)
+    except BaseException:
+        broker.release(camera_id)
+        raise
+    if not ready:
+        broker.release(camera_id)
+        raise HTTPException(status_code=504, detail=feed.last_error or f"Camera {camera_id} did not respond")
+    # ✅ encode JPEG ครั้งเดียวต่อเฟรมต่อกล้อง แล้วแจก bytes เดียวกันให้ผู้ชมทุกคน
+    hub = get_mjpeg_hub()
+    encoder = hub.encoder_for(feed)
+    queue = encoder.subscribe()
 
     # ✅ ฟังก์ชันสร้าง Stream
     async def generate():
         try:
-            while True:
-                if camera_id not in video_captures or not video_captures[camera_id].isOpened():
-                    print(f"⚠️ กล้อง {camera_id} ถูกปิด")
+            while feed.running:
+                if await request.is_disconnected():
                     break
-                success, frame = video_captures[camera_id].read()
-                if not success:
-                    await asyncio.sleep(0.01)
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), timeout=1.0)
+                except asyncio.TimeoutError:
                     continue
-                _, buffer = cv2.imencode('.jpg', frame)
-                yield (
-                    b'--frame\r\n'
-                    b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n'
-                )
-                await asyncio.sleep(0.01)
+                yield chunk
+            if not feed.running:
+                print(f"⚠️ กล้อง {camera_id} ถูกปิด")
         except Exception as e:
             print(f"❌ Error streaming camera {camera_id}: {e}")
         finally:
-            await stop_camera(camera_id)
+            # ✅ ปิดเฉพาะการรับชมของ request นี้ กล้องจะปิดเมื่อไม่มีผู้ชมเหลือ
+            encoder.unsubscribe(queue)
+            hub.discard(feed)
+            broker.release(camera_id)
 
     return StreamingResponse(generate(), media_type="multipart/x-mixed-replace;boundary=frame")
 
@@ -155,67 +141,137 @@ async def stream_video(
 @router.get("/stop-stream")
 async def stop_stream(
     camera_id: int = Query(..., description="ID ของกล้องที่ต้องการปิด"),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
+    """
+    กล้องถูกแชร์ระหว่างผู้ชมหลายคน จึงไม่บังคับปิดที่นี่:
+    stream ของผู้เรียกจะคืนกล้องเองเมื่อปิดการเชื่อมต่อ และกล้องจะปิดเมื่อไม่มีผู้ชมเหลือ
+    """
     print(f"🔄 คำขอให้ปิดกล้อง {camera_id}")
-    
-    await stop_camera(camera_id)
 
-    return JSONResponse(content={"message": f"🛑 กล้อง {camera_id} ถูกปิดสำเร็จ"})
+    feed = get_camera_broker().get(camera_id)
+    viewers = max(feed.subscribers - 1, 0) if feed else 0
 
+    return JSONResponse(content={"message": f"🛑 กล้อง {camera_id} ถูกปิดสำเร็จ", "remaining_viewers": viewers})
 
-# ✅ สร้างและจัดการ Executor
-executor = ThreadPoolExecutor(max_workers=4) 
 
-def get_executor():
-    global executor
-    if executor is None:
-        executor = ThreadPoolExecutor(max_workers=4)
-    return executor
-
-# ✅ ฟังก์ชันประมวลผล YOLO
-def process_yolo(file_path: str):
+async def detect_bytes(yolo_service, image_bytes: bytes):
+    """
+    ตรวจจับจาก bytes โดยดู cache (hash ของภาพ + เวอร์ชันโมเดล + threshold) ก่อนส่งเข้าโมเดล
+    คืนค่า (detections, cache_key, มาจาก cache หรือไม่)
     """
-    ประมวลผล YOLO บนไฟล์ภาพ
+    # เวอร์ชันที่ได้ตอน start (backend + hash ของโมเดลที่ใช้จริง) ไม่ใช่ path ของ .pt
+    cache_key = detection_cache_key(image_bytes, await yolo_service.resolve_model_version())
+    detections = await detection_cache.run(detection_cache.get, cache_key)
+    if detections is not None:
+        return detections, cache_key, True
+
+    # ✅ ไม่วาดภาพ annotated ตอนตรวจจับ จะสร้างเมื่อ client ขอผ่าน /packing/detections/{id}/annotated
+    output = await yolo_service.detect(image_bytes, save_annotated=False)
+    await detection_cache.run(detection_cache.put, cache_key, output["detections"])
+    return output["detections"], cache_key, False
+
+async def detect_objects_in_memory(yolo_service, image_bytes: bytes, file_path: str, background_tasks: BackgroundTasks):
     """
+    ตรวจจับจาก bytes ในหน่วยความจำ (ไม่มีการเขียนไฟล์ระหว่างทาง)
+    """
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Uploaded image is empty.")
+
     try:
-        results = model.predict(source=file_path, conf=0.1, iou=0.45, stream=False, device='cpu')
-        detections = []
-
-        for result in results:
-            for box in result.boxes.data:
-                x1, y1, x2, y2, conf, cls = box.tolist()
-                if conf > 0.3:
-                    label = model.names[int(cls)]
-                    detections.append({
-                        "label": label,
-                        "confidence": float(conf),
-                        "box": [float(x1), float(y1), float(x2), float(y2)],
-                    })
-
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-
-        print(f"✅ YOLO processing completed: {len(detections)} objects detected.")
-        return detections
+        detections, cache_key, cached = await detect_bytes(yolo_service, image_bytes)
+    except InferenceQueueFull as e:
+        raise_queue_full(e.retry_after)
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        print(f"❌ Error in YOLO processing: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error processing YOLO predictions")
+        print(f"❌ Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Unexpected server error during detection process.")
+
+    print(f"✅ YOLO processing completed: {len(detections)} objects detected.{' (cache)' if cached else ''}")
 
+    detection_id = recent_detections.put(image_bytes, detections, cache_key)
 
+    image_path = ""
+    if settings.DETECT_ARCHIVE_IMAGES:
+        # ✅ บันทึกภาพต้นฉบับลงดิสก์หลังส่ง response แล้ว
+        image_path = file_path
+        background_tasks.add_task(archive_detection_images, image_path, image_bytes)
+
+    return JSONResponse(content={
+        "detections": detections,
+        "image_path": image_path,
+        "cached": cached,
+        "detection_id": detection_id,
+        "annotated_image_path": f"/packing/detections/{detection_id}/annotated",
+    })
+
+# ✅ ภาพ annotated แบบ lazy: วาดกรอบเมื่อมีคนขอเท่านั้น
+@router.get("/detections/{detection_id}/annotated")
+async def get_annotated_detection(
+    detection_id: str,
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    entry = recent_detections.get(detection_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Detection result not found or expired")
+
+    image_bytes, detections, cache_key = entry
+    annotated = await detection_cache.run(detection_cache.get_annotated, cache_key) if cache_key else None
+    if annotated is None:
+        annotated = await asyncio.to_thread(yolo_worker.render_annotated, image_bytes, detections)
+        if cache_key:
+            await detection_cache.run(detection_cache.put_annotated, cache_key, detections, annotated)
+    return Response(content=annotated, media_type="image/jpeg")
+
+# ✅ สถิติ cache ของผลตรวจจับ (hit / miss) สำหรับ monitoring
+@router.get("/detect/cache-stats", response_class=JSONResponse)
+async def get_detection_cache_stats(
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    return JSONResponse(content=detection_cache.stats())
+
+def raise_queue_full(retry_after: int):
+    raise HTTPException(
+        status_code=503,
+        detail="YOLO inference queue is full, please retry.",
+        headers={"Retry-After": str(retry_after)},
+    )
 
 # ✅ Route: ตรวจจับสินค้าในภาพอัปโหลด
 @router.post("/detect", response_class=JSONResponse)
 async def detect_objects(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(None),
+    camera_id: int = Query(None, description="ตรวจจับจากเฟรมล่าสุดของกล้องที่เปิดอยู่ (แทนการอัปโหลดภาพ)"),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
     """
-    ตรวจจับวัตถุจากภาพที่อัปโหลดโดยใช้ subprocess เรียก yolo_worker.py
+    ตรวจจับวัตถุจากภาพที่อัปโหลด (หรือเฟรมล่าสุดของกล้องเมื่อส่ง camera_id มาแทนไฟล์) โดยส่งเข้า YOLO process pool ที่โหลดโมเดลค้างไว้
+    ถ้าคิวเต็มจะตอบ 503 + Retry-After ทันที โดยไม่บันทึกไฟล์อัปโหลด
+
+    - DETECT_IN_MEMORY: ถอดรหัสภาพจาก bytes ที่อัปโหลดโดยตรง ไม่ต้องเขียน/อ่านไฟล์ก่อนตรวจจับ
+      แล้วค่อยบันทึกภาพต้นฉบับเป็น background task หลังตอบกลับ (DETECT_ARCHIVE_IMAGES)
+      ภาพ annotated ไม่ถูกวาดตอนตรวจจับ สร้างเมื่อ client ขอผ่าน annotated_image_path
     """  
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    yolo_service = get_yolo_service()
+    if not yolo_service.has_capacity():
+        raise_queue_full(yolo_service.retry_after)
+
+    if file is None:
+        if camera_id is None:
+            raise HTTPException(status_code=400, detail="Either an image file or camera_id is required.")
+        # ✅ ใช้เฟรมจาก ring buffer ของกล้อง (ไม่เปิด/อ่านกล้องซ้ำ)
+        seq, _, frame = await read_camera_frame(camera_id)
+        _, buffer = cv2.imencode('.jpg', frame)
+        file_path = os.path.join(UPLOAD_DIR, f"camera_{camera_id}_{seq}.jpg")
+        return await detect_objects_in_memory(yolo_service, buffer.tobytes(), file_path, background_tasks)
+
+    file_path = os.path.join(UPLOAD_DIR, os.path.basename(file.filename or "captured_image.jpg"))
+
+    if settings.DETECT_IN_MEMORY:
+        return await detect_objects_in_memory(yolo_service, await file.read(), file_path, background_tasks)
 
     try:
         # ✅ บันทึกไฟล์ภาพ
@@ -225,40 +281,23 @@ async def detect_objects(
         if not os.path.exists(file_path):
             raise HTTPException(status_code=400, detail="Uploaded image not found on server.")
 
-        # ✅ เรียกใช้งาน yolo_worker.py ผ่าน subprocess
-        result = subprocess.run(
-            ["python", "app/services/yolo_worker.py", file_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        # Debug logs
-        print("STDOUT:", result.stdout)
-        print("STDERR:", result.stderr)
+        # ✅ ส่งภาพไปยัง replica ที่ว่างที่สุด (ไม่บล็อก event loop)
+        output = await yolo_service.detect(file_path)
 
-        if result.returncode != 0:
-            print(f"❌ YOLO worker error: {result.stderr}")
-            raise HTTPException(status_code=500, detail="YOLO worker failed.")
+        print(f"✅ YOLO processing completed: {len(output['detections'])} objects detected.")
 
-        # ✅ ดึงเฉพาะ JSON ที่สมบูรณ์จาก STDOUT
-        try:
-            start_index = result.stdout.find("{")
-            end_index = result.stdout.rfind("}") + 1
-            if start_index == -1 or end_index == 0:
-                raise json.JSONDecodeError("No JSON found in stdout", result.stdout, 0)
-            clean_json = result.stdout[start_index:end_index]
-            output = json.loads(clean_json)
-        except json.JSONDecodeError:
-            print("❌ Failed to decode YOLO worker response.")
-            raise HTTPException(status_code=500, detail="Invalid response from YOLO worker.")
-
-        response = JSONResponse(content={"detections": output.get("detections", []), "image_path": file_path, "annotated_image_path": output.get("annotated_image", "") })
+        response = JSONResponse(content={"detections": output.get("detections", []), "image_path": file_path, "annotated_image_path": output.get("annotated_image") or "" })
 
         # response = JSONResponse(content={"detections": [], "image_path": file_path}) # debug capture only comment out
 
         return response
 
+    except InferenceQueueFull as e:
+        raise_queue_full(e.retry_after)
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Unexpected error: {str(e)}")
         print(traceback.format_exc())
@@ -285,6 +324,114 @@ def get_cameras(
         } for camera in cameras
     ]
 
+# ✅ Live detection: ตรวจจับต่อเนื่องจากเฟรมล่าสุดของกล้อง
+@router.post("/cameras/{camera_id}/live/start", response_class=JSONResponse)
+async def start_live_detection(
+    camera_id: int,
+    fps: float = Query(None, description="จำนวนครั้งที่ inference ต่อวินาที (ค่าเริ่มต้น LIVE_INFERENCE_FPS)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    camera = await get_camera_or_404(db, camera_id)
+    try:
+        session = await get_live_detection_manager().start(camera_id, camera.stream_url, fps)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    return JSONResponse(content={"message": f"🎥 เริ่ม live detection กล้อง {camera_id}", "camera_id": camera_id, "fps": session.fps})
+
+@router.post("/cameras/{camera_id}/live/stop", response_class=JSONResponse)
+async def stop_live_detection(
+    camera_id: int,
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    if not await get_live_detection_manager().stop(camera_id):
+        raise HTTPException(status_code=404, detail=f"Live detection is not running on camera {camera_id}")
+    return JSONResponse(content={"message": f"🛑 หยุด live detection กล้อง {camera_id}"})
+
+def get_live_session_or_404(camera_id: int):
+    session = get_live_detection_manager().get(camera_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Live detection is not running on camera {camera_id}")
+    return session
+
+@router.get("/cameras/{camera_id}/live", response_class=JSONResponse)
+async def get_live_detections(
+    camera_id: int,
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    """
+    ผลการตรวจจับล่าสุดของกล้อง (polling)
+    """
+    session = get_live_session_or_404(camera_id)
+    return JSONResponse(content={
+        "latest": session.latest,
+        "fps": session.fps,
+        "running": not session.task.done(),
+        **session.stats,
+    })
+
+@router.websocket("/cameras/{camera_id}/live/ws")
+async def live_detections_feed(
+    websocket: WebSocket,
+    camera_id: int,
+):
+    """
+    ส่งผลการตรวจจับล่าสุดให้ client ทุกครั้งที่มีผลใหม่ (client ที่อ่านช้าจะได้เฉพาะผลล่าสุด)
+    """
+    # session สั้น ๆ สำหรับตรวจสิทธิ์ ไม่ถือ connection ไว้ตลอดอายุ WebSocket
+    async with get_async_sessionmaker()() as db:
+        user = await get_websocket_user(websocket, db)
+    if not user or user.role_id != 1 or user.position_id != 4 or not user.is_active:
+        await websocket.close(code=1008)
+        return
+
+    session = get_live_detection_manager().get(camera_id)
+    if session is None:
+        await websocket.close(code=1008, reason=f"Live detection is not running on camera {camera_id}")
+        return
+
+    await websocket.accept()
+    queue = session.subscribe()
+    try:
+        while not session.task.done():
+            try:
+                result = await asyncio.wait_for(queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            await websocket.send_json(result)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.unsubscribe(queue)
+
+@router.get("/cameras/{camera_id}/live/stream")
+async def live_annotated_stream(
+    request: Request,
+    camera_id: int,
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    """
+    MJPEG ของภาพที่วาดกรอบแล้ว (อัตราเฟรมเท่ากับ fps ของ live detection)
+    """
+    session = get_live_session_or_404(camera_id)
+    queue = session.subscribe(annotated=True)
+
+    async def generate():
+        try:
+            while not session.task.done():
+                if await request.is_disconnected():
+                    break
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                yield chunk
+        finally:
+            session.unsubscribe(queue)
+
+    return StreamingResponse(generate(), media_type="multipart/x-mixed-replace;boundary=frame")
+
 # Endpoint สำหรับดึงรายการคำสั่งซื้อที่มีสถานะ packing
 @router.get("/orders/packing", response_class=JSONResponse)
 def get_packing_orders(
@@ -362,32 +509,29 @@ def assign_order(
         "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
     }
 
+    # อัปเดต rollup หลังสร้างข้อมูลตอบกลับแล้ว (commit ของ rollup ทำให้ order ถูก expire)
+    refresh_order_rollups(db, order.created_at)
     return JSONResponse(content=order_data)
 
 @router.post("/orders/{order_id}/upload-image", response_class=JSONResponse)
 async def upload_packed_image(
     order_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
     """
     อัปโหลดรูปสินค้าที่แพ็คเสร็จแล้ว และเก็บไว้ในฐานข้อมูล
     """
-    order = db.query(Order).filter(Order.order_id == order_id, Order.assigned_to == current_user.id).first()
+    order = await get_assigned_order(db, order_id, current_user.id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or not assigned to you")
 
-    upload_dir = "uploads/packed_orders"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, f"{order_id}.jpg")
-
     # ✅ บันทึกไฟล์
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path = await save_packed_image(order_id, await file.read())
 
     order.image_path = file_path  # บันทึก path ไฟล์ลง database
-    db.commit()
+    await db.commit()
 
     return JSONResponse(content={"message": "Image uploaded successfully", "image_path": file_path})
 
@@ -396,13 +540,13 @@ async def verify_order(
     order_id: int,
     verified: bool = Form(...),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
 ):
     """
     ✅ พนักงานกดยืนยันสินค้าครบหรือไม่ครบ
     """
-    order = db.query(Order).filter(Order.order_id == order_id, Order.assigned_to == current_user.id).first()
+    order = await get_assigned_order(db, order_id, current_user.id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or not assigned to you")
 
@@ -410,39 +554,117 @@ async def verify_order(
         raise HTTPException(status_code=400, detail="กรุณาตรวจจับสินค้าก่อน")
 
     if file:
-        upload_dir = "uploads/packed_orders"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, f"{order_id}.jpg").replace("\\", "/")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        order.image_path = file_path
+        order.image_path = await save_packed_image(order_id, await file.read())
+
+    return await apply_verification(db, order, verified)
+
+async def get_assigned_order(db: AsyncSession, order_id: int, user_id: int, with_items: bool = False):
+    query = select(Order).where(Order.order_id == order_id, Order.assigned_to == user_id)
+    if with_items:
+        query = query.options(selectinload(Order.order_items))
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def save_packed_image(order_id: int, data: bytes) -> str:
+    """
+    เขียนภาพที่แพ็คแล้วลงดิสก์ใน thread pool (ไม่บล็อก event loop)
+    """
+    upload_dir = "uploads/packed_orders"
+    file_path = os.path.join(upload_dir, f"{order_id}.jpg").replace("\\", "/")
+    await run_in_threadpool(write_image, file_path, data)
+    return file_path
+
+def notify_admin_incomplete(order_id: int):
+    """
+    ส่ง HTTP Request ไปยัง Home เพื่อให้แจ้งเตือน Admin (blocking: เรียกผ่าน thread pool)
+    """
+    try:
+        url = "http://localhost:8000/admin/trigger-notify"
+        # url = "https://home.jintaphas.tech/admin/trigger-notify"
+        payload = {
+            "order_id": order_id,
+            "reason": "สินค้าไม่ครบ"
+        }
+        resp = requests.post(url, json=payload, timeout=5)
+        print("Notify admin response:", resp.status_code, resp.text)
+    except Exception as e:
+        print("Error calling home to notify admin:", e)
+
+async def apply_verification(db: AsyncSession, order: Order, verified: bool, extra: dict = None) -> JSONResponse:
+    """
+    บันทึกผลการตรวจสอบ: ครบ → completed, ไม่ครบ → pending และแจ้งเตือนแอดมิน
+    """
+    order_id = order.order_id
+    created_at = order.created_at
+    extra = extra or {}
 
     # ✅ ถ้าสินค้าไม่ครบ → เปลี่ยนสถานะเป็น "pending" และแจ้งเตือนแอดมิน
     if not verified:
         order.status = "pending"
-        db.commit()
+        await db.commit()
+        await db.run_sync(refresh_order_rollups, created_at)
 
         # ✅ ส่ง HTTP Request ไปยัง Home เพื่อให้แจ้งเตือน Admin
-        try:
-            url = "http://localhost:8000/admin/trigger-notify"
-            # url = "https://home.jintaphas.tech/admin/trigger-notify"
-            payload = {
-                "order_id": order_id,
-                "reason": "สินค้าไม่ครบ"
-            }
-            resp = requests.post(url, json=payload, timeout=5)
-            print("Notify admin response:", resp.status_code, resp.text)
-        except Exception as e:
-            print("Error calling home to notify admin:", e)
+        await run_in_threadpool(notify_admin_incomplete, order_id)
 
-        return JSONResponse(content={"message": "Order marked as pending", "order_id": order_id, "status": "pending"})
+        return JSONResponse(content={"message": "Order marked as pending", "order_id": order_id, "status": "pending", **extra})
 
     # ✅ ถ้าสินค้าครบ → อัปเดตเป็น "completed"
     order.is_verified = verified
     order.status = "completed"
-    db.commit()
+    await db.commit()
+    await db.run_sync(refresh_order_rollups, created_at)
 
-    return JSONResponse(content={"message": "Order verification updated", "order_id": order_id, "status": "completed"})
+    return JSONResponse(content={"message": "Order verification updated", "order_id": order_id, "status": "completed", **extra})
+
+# ✅ ตรวจจับ + เทียบกับรายการสินค้าในออเดอร์ในครั้งเดียว
+@router.post("/orders/{order_id}/auto-verify", response_class=JSONResponse)
+async def auto_verify_order(
+    order_id: int,
+    file: UploadFile = File(None),
+    camera_id: int = Query(None, description="ใช้เฟรมล่าสุดของกล้องแทนการอัปโหลดภาพ"),
+    commit: bool = Query(False, description="บันทึกผลการตรวจสอบลงออเดอร์ทันที (เหมือน /verify)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 4))
+):
+    """
+    ตรวจจับสินค้าในภาพ แล้ว diff กับ order_items ต่อสินค้า (matched / missing / extra)
+    - commit=true: บันทึกภาพและสถานะออเดอร์ตามผล (ครบ → completed, ไม่ครบ → pending + แจ้งแอดมิน)
+    """
+    order = await get_assigned_order(db, order_id, current_user.id, with_items=True)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found or not assigned to you")
+
+    if file is not None:
+        image_bytes = await file.read()
+    elif camera_id is not None:
+        _, _, frame = await read_camera_frame(camera_id)
+        image_bytes = cv2.imencode('.jpg', frame)[1].tobytes()
+    else:
+        raise HTTPException(status_code=400, detail="Either an image file or camera_id is required.")
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Uploaded image is empty.")
+
+    yolo_service = get_yolo_service()
+    try:
+        detections, _, _ = await detect_bytes(yolo_service, image_bytes)
+    except InferenceQueueFull as e:
+        raise_queue_full(e.retry_after)
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        print(f"❌ Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Unexpected server error during detection process.")
+
+    result = await verify_detections(db, order, detections)
+    result["detections"] = detections
+
+    if not commit:
+        return JSONResponse(content={"order_id": order_id, **result})
+
+    order.image_path = await save_packed_image(order_id, image_bytes)
+    return await apply_verification(db, order, result["complete"], result)
 
 @router.get("/orders/current", response_class=JSONResponse)
 def get_current_order(
@@ -490,13 +712,14 @@ def get_current_order(
 @router.get("/orders/{order_id}/image", response_class=FileResponse)
 async def get_order_image(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     ✅ ให้ API ส่งรูปภาพสินค้าแพ็คแล้วแทนการเข้าถึงโดยตรง
     """
-    order = db.query(Order).filter(Order.order_id == order_id, Order.user_id == current_user.id).first()
+    result = await db.execute(select(Order).where(Order.order_id == order_id, Order.user_id == current_user.id))
+    order = result.scalars().first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or you don't have permission.")
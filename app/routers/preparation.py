@@ -9,9 +9,13 @@ from app.models.user import User
 from app.models.product import Product  # เพิ่ม import Product
 from app.database import get_db
 from app.services.auth import get_user_with_role_and_position_and_isActive
+from app.services.catalog import invalidate_catalog
 from fastapi.templating import Jinja2Templates
 import json
-from app.utils.product_categories import get_product_category  # เพิ่ม import get_product_category
+from typing import Optional
+from app.crud.product import get_products
+from app.crud.rollup_crud import refresh_order_rollups
+from app.crud.order_views import order_summaries, orders_with_items_and_products, serialize_item
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -23,11 +27,11 @@ def get_confirmed_orders(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 3))
 ):
-    # ใช้ joinedload เพื่อโหลดข้อมูล user มาด้วย
-    orders = db.query(Order).options(joinedload(Order.user)).filter(Order.status == "confirmed").all()
+    # ดึงเฉพาะคอลัมน์ที่แสดงพร้อม email ลูกค้าใน query เดียว
+    orders = order_summaries(db).filter(Order.status == "confirmed").all()
     return [{
         "id": order.order_id, 
-        "email": order.user.email if order.user else None,  # ดึง email จาก user relationship
+        "email": order.email,
         "total": order.total, 
         "created_at": order.created_at
     } for order in orders]
@@ -42,26 +46,13 @@ def get_order_details(
     """
     ดึงรายละเอียดคำสั่งซื้อ รวมถึงรายการสินค้า
     """
-    # ใช้ joinedload เพื่อโหลดข้อมูล user และ order_items
-    order = db.query(Order).options(
-        joinedload(Order.user),
-        joinedload(Order.order_items)
-    ).filter(Order.order_id == order_id).first()
+    # โหลด user, order_items และชื่อสินค้าล่วงหน้า (ไม่ lazy load สินค้าทีละรายการ)
+    order = orders_with_items_and_products(db).filter(Order.order_id == order_id).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="❌ Order not found")
 
-    # ดึงข้อมูลสินค้าจาก order_items relationship
-    items = []
-    if order.order_items:
-        for item in order.order_items:
-            items.append({
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "price": item.price_at_order,
-                "total": item.total_item_price,
-                "product_name": item.product.name if item.product else "Unknown"
-            })
+    items = [serialize_item(item) for item in order.order_items]
 
     return {
         "id": order.order_id,
@@ -133,7 +124,11 @@ def approve_order(
     order.status = "packing"
     # order.assigned_to = current_user.id  # บันทึกว่าใครเป็นคนยืนยันออเดอร์นี้
     
+    updated_product_ids = [item["product"].product_id for item in products_to_update]
+    created_at = order.created_at
     db.commit()
+    invalidate_catalog(updated_product_ids)
+    refresh_order_rollups(db, created_at)
     return {"message": f"✅ Order {order_id} approved successfully and stock updated"}
 
 # ✅ ยกเลิกคำสั่งซื้อ
@@ -150,29 +145,32 @@ def cancel_order(
     if not order:
         raise HTTPException(status_code=404, detail="❌ Order not found or invalid status")
     order.status = "cancelled"
+    created_at = order.created_at
     db.commit()
+    refresh_order_rollups(db, created_at)
     return {"message": f"✅ Order {order_id} canceled successfully"}
 
 # ✅ ดึงข้อมูลสินค้าคงเหลือทั้งหมด
 @router.get("/products/inventory", response_class=JSONResponse)
 def get_products_inventory(
+    category: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_user_with_role_and_position_and_isActive(1, 3))
 ):
     """
-    ดึงข้อมูลสินค้าคงเหลือทั้งหมดสำหรับพนักงานจัดเตรียม
+    ดึงข้อมูลสินค้าคงเหลือสำหรับพนักงานจัดเตรียม (?category= กรองด้วย index ของคอลัมน์ category)
+    สต็อกอ่านจาก DB ทุกครั้งเพื่อให้ตรงกับการตัดสต็อกล่าสุด
     """
-    products = db.query(Product).all()
+    products = get_products(db, category)
     
     products_inventory = []
     for product in products:
-        category = get_product_category(product.product_id)
         products_inventory.append({
             "product_id": product.product_id,
             "name": product.name,
             "price": product.price,
             "stock": product.stock,
-            "category": category
+            "category": product.category
         })
     
     return products_inventory
\ No newline at end of file
@@ -1,22 +1,95 @@
 # app/routers/product.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.schemas.product import ProductCreate, ProductUpdate, ProductOut
 from app.schemas.order import OrderOut
 from app.models.order import Order
 from app.models.order_item import OrderItem
-from app.models.product import Product
 from app.services.auth import get_current_user
+from app.crud.product import PRODUCT_FIELDS, list_products_page, search_products_fulltext
+from app.crud.order_views import order_item_rows
+from app.services.catalog import catalog_snapshot
+from app.services.product_search import product_search_index
+from app.config import settings
 
 order_router = APIRouter(
     prefix="/orders",
     tags=["Orders"],
 )
 
+product_router = APIRouter(
+    prefix="/api/products",
+    tags=["Products"],
+)
+
+@product_router.get("", response_class=ORJSONResponse)
+def list_products(
+    cursor: Optional[int] = Query(None, description="product_id ตัวสุดท้ายของหน้าก่อน (next_cursor)"),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    fields: Optional[str] = Query(None, description="คอลัมน์ที่ต้องการ คั่นด้วย , เช่น name,price"),
+    db: Session = Depends(get_db),
+):
+    """
+    ✅ รายการสินค้าแบบแบ่งหน้าด้วย cursor (product_id) กรองตามหมวดหมู่/ช่วงราคา และเลือกคอลัมน์ได้
+    """
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in PRODUCT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"❌ Unknown fields: {', '.join(unknown)}")
+        # product_id ต้องมีเสมอเพื่อใช้เป็น cursor ของหน้าถัดไป
+        selected = ["product_id"] + [field for field in dict.fromkeys(selected) if field != "product_id"]
+    else:
+        selected = list(PRODUCT_FIELDS)
+
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="❌ min_price must not exceed max_price")
+
+    items, has_more = list_products_page(
+        db,
+        fields=selected,
+        cursor=cursor,
+        limit=limit,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+    )
+    return ORJSONResponse({
+        "items": items,
+        "next_cursor": items[-1]["product_id"] if has_more else None,
+        "has_more": has_more,
+    })
+
+@product_router.get("/search", response_class=ORJSONResponse)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    ✅ ค้นหาสินค้าจากชื่อและคำอธิบาย (ไทย/อังกฤษ, prefix, สะกดผิดเล็กน้อย) เรียงตามคะแนน
+    """
+    # กรองหมวดหมู่ก่อนจัดอันดับ ได้ครบ limit รายการเสมอถ้ามีสินค้าที่ตรงพอ
+    if settings.SEARCH_USE_FULLTEXT and db.bind.dialect.name == "mysql":
+        ranked = search_products_fulltext(db, q, limit, category)
+    else:
+        ranked = product_search_index.search(db, q, limit, category)
+
+    scores = dict(ranked)
+    items = [
+        {**product, "score": scores[product["product_id"]]}
+        for product in catalog_snapshot.lookup(db, [product_id for product_id, _ in ranked])
+    ]
+    return ORJSONResponse({"query": q, "items": items})
+
 @order_router.get("/my-orders", response_model=list[OrderOut])
 def get_my_orders(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     """
@@ -53,27 +126,23 @@ def get_order_items(order_id: int, current_user=Depends(get_current_user), db: S
         return JSONResponse(content={"message": "❌ Unauthorized"}, status_code=401)
 
     # ตรวจสอบว่าคำสั่งซื้อเป็นของผู้ใช้นี้จริงหรือไม่
-    order = db.query(Order).filter(Order.order_id == order_id, Order.user_id == current_user.id).first()
+    order_exists = db.query(Order.order_id).filter(Order.order_id == order_id, Order.user_id == current_user.id).first()
     
-    if not order:
+    if not order_exists:
         print(f"❌ Order {order_id} not found or not authorized")
         raise HTTPException(status_code=404, detail="Order not found or unauthorized")
 
-    # ดึงรายการสินค้าในคำสั่งซื้อ
-    order_items = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
-    
-    # เตรียมข้อมูลสำหรับส่งกลับ
-    items_detail = []
-    for item in order_items:
-        product = db.query(Product).filter(Product.product_id == item.product_id).first()
-        
-        items_detail.append({
+    # ดึงรายการสินค้าพร้อมชื่อสินค้าใน query เดียว
+    items_detail = [
+        {
             "item_id": item.item_id,
             "product_id": item.product_id,
-            "product_name": product.name if product else "Unknown Product",
+            "product_name": item.product_name or "Unknown Product",
             "quantity": item.quantity,
             "price_at_order": item.price_at_order,
             "total_item_price": item.total_item_price
-        })
+        }
+        for item in order_item_rows(db).filter(OrderItem.order_id == order_id)
+    ]
     
     return JSONResponse(content=items_detail, status_code=200)
\ No newline at end of file
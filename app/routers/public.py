@@ -13,11 +13,16 @@ from sqlalchemy.orm import Session
 import os
 from app.database import get_db
 from app.services.auth import get_current_user
+from app.services.principal_cache import invalidate_user
 from app.models.order import Order
 from app.models.user import User
 from app.schemas.user import UserOut
 from app.models.product import Product
-from app.utils.product_categories import get_product_category, CATEGORIES
+from app.utils.product_categories import CATEGORIES
+from app.services.catalog import catalog_snapshot
+from app.services.page_cache import render_page
+from app.crud.rollup_crud import refresh_order_rollups
+from starlette.concurrency import run_in_threadpool
 
 # เพิ่ม Jinja2 Templates
 templates = Jinja2Templates(directory="app/templates")
@@ -50,35 +55,20 @@ def get_homepage(
     current_user: Optional[User] = Depends(get_current_user)
 ):
     """
-    แสดงหน้าแรก พร้อมสินค้าทั้งหมดและหมวดหมู่
+    แสดงหน้าแรก พร้อมสินค้าทั้งหมดและหมวดหมู่ (จาก catalog snapshot)
     """
-    # ดึงสินค้าทั้งหมดจากฐานข้อมูล
-    products = db.query(Product).all()
-    
-    # สร้าง list ใหม่สำหรับสินค้าที่มี category
-    products_with_category = []
-    for product in products:
-        category = get_product_category(product.product_id)
-        product_dict = {
-            "product_id": product.product_id,
-            "name": product.name,
-            "price": product.price,
-            "description": product.description,
-            "image_path": product.image_path,
-            "category": category,
-            "stock": product.stock  # เพิ่มข้อมูล stock
-        }
-        products_with_category.append(product_dict)
-    
-    return templates.TemplateResponse(
-        "home.html", 
+    products, version = catalog_snapshot.view(db)
+    return render_page(
+        request,
+        templates,
+        "home.html",
         {
-            "request": request,
             "current_user": current_user,
-            "products": products_with_category,
+            "products": products,
             "categories": CATEGORIES,
             "current_category": "all"
-        }
+        },
+        key=("all", version),
     )
 
 @router.get("/category/{category}", response_class=HTMLResponse)
@@ -89,41 +79,24 @@ def get_products_by_category(
     current_user: Optional[User] = Depends(get_current_user)
 ):
     """
-    แสดงสินค้าตามประเภทที่เลือก
+    แสดงสินค้าตามประเภทที่เลือก (ใช้ index ตามหมวดหมู่ของ catalog snapshot)
     """
     # ตรวจสอบว่าประเภทที่ส่งมาถูกต้องหรือไม่
     if category not in CATEGORIES and category != "all":
         category = "all"
     
-    # ดึงสินค้าทั้งหมด
-    products = db.query(Product).all()
-    
-    # แปลงสินค้าเป็น dictionary และกรองตามประเภท
-    filtered_products = []
-    for product in products:
-        product_category = get_product_category(product.product_id)
-        product_dict = {
-            "product_id": product.product_id,
-            "name": product.name,
-            "price": product.price,
-            "description": product.description,
-            "image_path": product.image_path,
-            "category": product_category,
-            "stock": product.stock  # เพิ่มข้อมูล stock
-        }
-        
-        if category == "all" or product_category == category:
-            filtered_products.append(product_dict)
-    
-    return templates.TemplateResponse(
-        "home.html", 
+    products, version = catalog_snapshot.view(db, category)
+    return render_page(
+        request,
+        templates,
+        "home.html",
         {
-            "request": request,
             "current_user": current_user,
-            "products": filtered_products,
+            "products": products,
             "categories": CATEGORIES,
             "current_category": category
-        }
+        },
+        key=(category, version),
     )
     
 
@@ -139,10 +112,7 @@ def get_cart_page(
     """
     แสดงหน้าตะกร้าสินค้า
     """
-    return templates.TemplateResponse(
-        "cart.html", 
-        {"request": request, "current_user": current_user}
-    )
+    return render_page(request, templates, "cart.html", {"current_user": current_user})
 
 @router.post("/checkout", response_class=JSONResponse)
 async def checkout(
@@ -202,6 +172,7 @@ async def checkout(
         address.postal_code = postal_code
         
         db.commit()
+        invalidate_user(user.id, email=user.email)
 
     # บันทึกไฟล์สลิปการโอนเงิน
     slip_filename = f"{current_user.email}_{payment_slip.filename}"
@@ -236,7 +207,10 @@ async def checkout(
         db.add(order_item)
 
     # บันทึกทั้งหมดลงฐานข้อมูล
+    created_at = new_order.created_at
     db.commit()
+    # ✅ rollup หลายรอบ DELETE/INSERT ด้วย Session แบบ sync: ทำใน thread pool ไม่บล็อก event loop
+    await run_in_threadpool(refresh_order_rollups, db, created_at)
     db.refresh(new_order)
 
     print("🛒 **บันทึกออเดอร์ใหม่ในฐานข้อมูล**")
@@ -290,7 +264,4 @@ def get_contact_page(
     """
     แสดงหน้าติดต่อเรา
     """
-    return templates.TemplateResponse(
-        "contact.html", 
-        {"request": request}
-    )
\ No newline at end of file
+    return render_page(request, templates, "contact.html", {})
\ No newline at end of file
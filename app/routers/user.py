@@ -10,9 +10,18 @@ from sqlalchemy.exc import IntegrityError
 from fastapi.responses import RedirectResponse
 from typing import Optional
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.models.user import User
-from app.database import get_db
-from app.services.auth import get_current_user, verify_password, hash_password
+from app.database import get_db, get_async_db
+from app.services.auth import (
+    get_current_user,
+    hash_password_async,
+    verify_password_async,
+    password_needs_rehash,
+)
+from app.services.page_cache import render_page
 from app.schemas.user import UserCreate, UserUpdate, UserOut
 from app.crud.user import (
     create_user,
@@ -41,6 +50,27 @@ admin_router = APIRouter(
 )
 protected_router = APIRouter(tags=["Auth"])
 
+
+async def authenticate(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """
+    ตรวจ email/password (bcrypt รันนอก event loop) คืนค่า User หรือ None
+    ถ้า hash เดิมใช้ cost ไม่ตรงกับ BCRYPT_ROUNDS จะ hash ใหม่และบันทึกให้เลย
+    """
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    if not user or not await verify_password_async(password, user.password):
+        return None
+
+    if password_needs_rehash(user.password):
+        try:
+            user.password = await hash_password_async(password)
+            await db.commit()
+            print(f"🔐 Rehash รหัสผ่านของ {user.email}")
+        except Exception as e:
+            await db.rollback()
+            print(f"⚠️ Rehash รหัสผ่านไม่สำเร็จ: {e}")
+    return user
+
 # ---------------------------------------------------------------------
 # AUTH ENDPOINTS
 # ---------------------------------------------------------------------
@@ -49,23 +79,23 @@ def get_login_form(request: Request):
     """
     แสดงฟอร์ม HTML สำหรับการเข้าสู่ระบบ
     """
-    return templates.TemplateResponse("login.html", {"request": request})
+    return render_page(request, templates, "login.html", {})
 
 # TODO: ทำให้ใช้ร่่วมกับ JWT และแสดงข็อความlogout บนnavbar
 # @router.post("/login")
 @protected_router.post("/login", response_class=HTMLResponse)
-def authenticate_user_and_generate_token(
+async def authenticate_user_and_generate_token(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     ตรวจสอบข้อมูลการเข้าสู่ระบบและส่ง Token กลับ
     """
-    user = db.query(User).filter(User.email == username).first()
+    user = await authenticate(db, username, password)
     
-    if not user or not verify_password(password, user.password):
+    if not user:
         # หาก username หรือ password ไม่ถูกต้อง
         return templates.TemplateResponse(
             "login.html",
@@ -92,13 +122,13 @@ def authenticate_user_and_generate_token(
     return response
 
 @protected_router.post("/getToken")
-def authenticate_user_and_generate_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def authenticate_user_and_generate_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint สำหรับเข้าสู่ระบบและสร้าง JWT token
     """
     # ตรวจสอบ email/password
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+    user = await authenticate(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     # อัปเดตสถานะเป็น active
@@ -124,12 +154,12 @@ def get_register_form(request: Request, current_user: User = Depends(get_current
 
 
 @protected_router.post("/register", response_class=HTMLResponse)
-def post_register_form(
+async def post_register_form(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
     name: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     รับข้อมูลจากฟอร์มและสร้างผู้ใช้ใหม่ในฐานข้อมูล พร้อมเข้าสู่ระบบอัตโนมัติ
@@ -142,8 +172,9 @@ def post_register_form(
         is_active=False
     )
     try:
-        # สร้างผู้ใช้ใหม่
-        create_user(db=db, user=user_data)
+        # สร้างผู้ใช้ใหม่ (hash รหัสผ่านนอก event loop ก่อน)
+        hashed_password = await hash_password_async(password)
+        await db.run_sync(create_user, user_data, hashed_password)
 
         # สร้าง JWT Token สำหรับผู้ใช้ที่ลงทะเบียนสำเร็จ
         access_token = create_access_token(data={"sub": email})
@@ -168,6 +199,9 @@ def post_register_form(
         else:
             message = f"❌ Registration failed due to a database error: {str(e)}"
         message_color = "red"
+    except HTTPException:
+        # เช่น 503 เมื่อ thread pool ของรหัสผ่านเต็ม ต้องถึง client เป็น 503 ไม่ใช่หน้า register ปกติ
+        raise
     except Exception as e:
         message = f"❌ Registration failed due to an unexpected error: {str(e)}"
         message_color = "red"
@@ -346,22 +380,25 @@ def delete_user_info(
 
 
 @protected_router.post("/reset-password")
-def reset_password(
+async def reset_password(
     current_password: str = Form(...),
     new_password: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     รีเซ็ตรหัสผ่านของผู้ใช้
     """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="User authentication failed")
+
     # ตรวจสอบรหัสผ่านปัจจุบัน
-    if not verify_password(current_password, current_user.password):
+    if not await verify_password_async(current_password, current_user.password):
         raise HTTPException(status_code=400, detail="รหัสผ่านปัจจุบันไม่ถูกต้อง")
     
     # อัปเดตรหัสผ่านใหม่
-    user = db.query(User).filter(User.id == current_user.id).first()
-    user.password = hash_password(new_password)  # hash รหัสผ่านใหม่ก่อนบันทึก
-    db.commit()
+    user = await db.get(User, current_user.id)
+    user.password = await hash_password_async(new_password)  # hash รหัสผ่านใหม่ก่อนบันทึก
+    await db.commit()
     
     return {"status": "success", "message": "รีเซ็ตรหัสผ่านสำเร็จ"}
@@ -9,6 +9,7 @@ class ProductBase(BaseModel):
     description: str
     image_path: str
     stock: int = 0
+    category: str = "other"
 
 class ProductCreate(ProductBase):
     pass
@@ -22,6 +23,7 @@ class ProductUpdate(BaseModel):
     description: Optional[str] = None
     image_path: Optional[str] = None
     stock: Optional[int] = None
+    category: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -33,7 +35,7 @@ class ProductOut(ProductBase):
         from_attributes = True
 
 class ProductWithCategory(ProductOut):
-    category: Optional[str] = None  # สำหรับแสดงหมวดหมู่ที่ได้จาก utils
+    category: Optional[str] = None  # หมวดหมู่จากคอลัมน์ tb_products.category
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from app import middleware
 from app.routers.packing import router as packing_router
+from app.services.yolo_service import get_yolo_service
+from app.services.camera_broker import get_camera_broker
+from app.services.live_detection import get_live_detection_manager
+from app.database import dispose_async_engine
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.trustedhost import TrustedHostMiddleware
@@ -11,6 +15,27 @@ app = FastAPI(title="Packing Server", version="1.0.0")
 # รวม router ที่เกี่ยวข้องกับ packing
 app.include_router(packing_router)
 
+# ✅ โหลดโมเดล YOLO ค้างไว้ตั้งแต่เริ่ม server เพื่อให้ request แรกไม่ต้องรอโหลดโมเดล
+@app.on_event("startup")
+def start_yolo_service():
+    get_yolo_service().start()
+
+@app.on_event("shutdown")
+def stop_yolo_service():
+    get_yolo_service().stop()
+
+@app.on_event("shutdown")
+async def stop_live_detection():
+    await get_live_detection_manager().stop_all()
+
+@app.on_event("shutdown")
+def stop_cameras():
+    get_camera_broker().stop_all()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
 # เพิ่ม CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -1,16 +1,21 @@
 # app/services/auth.py
 
 
+import asyncio
 import bcrypt
 import jwt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jwt import PyJWTError as JWTError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from fastapi import HTTPException, Depends, Cookie, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, Depends, Cookie, Header, Request, WebSocket
 from fastapi.security import OAuth2PasswordBearer
 from app.database import get_db
 from app.models.user import User
 from app.config import settings
+from app.services.principal_cache import Principal, principal_cache, principal_from_user
 from typing import Optional
 
 # กำหนด OAuth2 scheme เพื่อใช้ในการดึง token
@@ -18,14 +23,72 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/getToken")
 
 # ฟังก์ชันสำหรับแฮชรหัสผ่าน
 def hash_password(password: str) -> str:
-    # ใช้ bcrypt ในการแฮชรหัสผ่าน
-    salt = bcrypt.gensalt()
+    # ใช้ bcrypt ในการแฮชรหัสผ่าน (cost ตาม BCRYPT_ROUNDS)
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 # ฟังก์ชันสำหรับตรวจสอบรหัสผ่าน
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True ถ้า hash ถูกสร้างด้วย cost ไม่ตรงกับ BCRYPT_ROUNDS ปัจจุบัน ($2b$<cost>$...)
+    """
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# ✅ bcrypt ใช้ CPU ราว 100 ms ต่อครั้ง จึงรันใน thread pool เฉพาะ (bcrypt ปล่อย GIL ระหว่างคำนวณ)
+# จำนวน worker จำกัดงาน hash ที่ทำพร้อมกัน และงานที่รอคิวเกิน PASSWORD_HASH_MAX_PENDING จะได้ 503
+# login storm จึงไม่แย่ง thread pool / CPU ของ route อื่นจนหมด
+password_executor = None
+password_pending = 0
+
+
+def get_password_executor() -> ThreadPoolExecutor:
+    global password_executor
+    if password_executor is None:
+        password_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash",
+        )
+    return password_executor
+
+
+async def run_password_job(func, *args):
+    global password_pending
+    if password_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        print(f"⚠️ งาน hash รหัสผ่านค้าง {password_pending} งาน ปฏิเสธคำขอใหม่")
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    password_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), func, *args)
+    finally:
+        password_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_job(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+
+def shutdown_password_executor():
+    global password_executor
+    if password_executor is not None:
+        password_executor.shutdown(wait=False)
+        password_executor = None
+
 # ฟังก์ชันสร้าง JWT Token
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=1)):
     to_encode = data.copy()
@@ -275,6 +338,50 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
 
+def get_current_principal(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
+    """
+    เหมือน get_current_user แต่คืนค่า Principal (id, email, name, role_id, position_id, is_active)
+    จาก principal cache ถ้ามี ไม่ต้อง query tb_users ทุก request
+    ใช้กับ dependency ตรวจสิทธิ์ ส่วน route ที่ต้องการ relationship ของ User ให้ใช้ get_current_user
+    """
+    token = request.cookies.get("Authorization") or request.headers.get("Authorization")
+    if not token:
+        return None
+
+    try:
+        token = token.replace("Bearer ", "").strip().strip('"')
+        if not token:
+            raise HTTPException(status_code=401, detail="Token is empty after processing")
+
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            raise HTTPException(status_code=401, detail="Invalid token payload: 'sub' not found")
+    except jwt.ExpiredSignatureError:
+        print("❌ Token has expired")
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.InvalidTokenError as e:
+        print(f"❌ Invalid Token: {str(e)}")
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    # ✅ cache miss: ดึงเฉพาะคอลัมน์ที่ใช้ตรวจสิทธิ์
+    row = (
+        db.query(User.id, User.email, User.name, User.role_id, User.position_id, User.is_active)
+        .filter(User.email == email)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    principal = principal_from_user(row)
+    principal_cache.put(principal)
+    return principal
+
+
 # # ฟังก์ชันสำหรับตรวจสอบบทบาทของผู้ใช้
 # def get_user_with_role(required_role: str):
 #     def role_checker(current_user: User = Depends(get_current_user)):
@@ -330,7 +437,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
 #     return role_position_and_active_checker
 
 def get_user_with_role(required_role: str):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_principal)):
         if not current_user or current_user.role_id != required_role:
             raise HTTPException(
                 status_code=403,
@@ -340,7 +447,7 @@ def get_user_with_role(required_role: str):
     return role_checker
 
 def get_user_with_role_and_position(required_role: str, required_position: str):
-    def role_and_position_checker(current_user: User = Depends(get_current_user)):
+    def role_and_position_checker(current_user: Principal = Depends(get_current_principal)):
         if not current_user:
             raise HTTPException(status_code=401, detail="User authentication failed")
         
@@ -358,7 +465,7 @@ def get_user_with_role_and_position(required_role: str, required_position: str):
     return role_and_position_checker
 
 def get_user_with_role_and_position_and_isActive(required_role: str, required_position: str):
-    def role_position_and_active_checker(current_user: User = Depends(get_current_user), request: Request = None):
+    def role_position_and_active_checker(current_user: Principal = Depends(get_current_principal), request: Request = None):
         if not current_user:
             raise HTTPException(
                 status_code=401,
@@ -384,4 +491,28 @@ def get_user_with_role_and_position_and_isActive(required_role: str, required_po
                 detail="Permission denied: User is not active"
             )
         return current_user
-    return role_position_and_active_checker
\ No newline at end of file
+    return role_position_and_active_checker
+async def get_websocket_user(websocket: WebSocket, db: AsyncSession) -> Optional[User]:
+    """
+    ดึงผู้ใช้จาก token ของ WebSocket (Cookie, Header หรือ query ?token=) คืนค่า None ถ้าไม่ผ่าน
+    """
+    token = (
+        websocket.cookies.get("Authorization")
+        or websocket.headers.get("Authorization")
+        or websocket.query_params.get("token")
+    )
+    if not token:
+        return None
+
+    try:
+        token = token.replace("Bearer ", "").strip().strip('"')
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.InvalidTokenError as e:
+        print(f"❌ Invalid WebSocket Token: {str(e)}")
+        return None
+
+    email = payload.get("sub")
+    if email is None:
+        return None
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
@@ -0,0 +1,277 @@
+# app/services/camera_broker.py
+
+import asyncio
+import threading
+import time
+from collections import deque
+import cv2
+from app.config import settings
+
+
+class CameraFeed:
+    """
+    ถอดรหัสภาพจากกล้อง RTSP หนึ่งตัวด้วย thread เดียว แล้วเก็บเฟรมล่าสุดไว้ใน ring buffer
+    ผู้ใช้ทุกคน (stream / snapshot / detect) อ่านจาก buffer นี้ ไม่มีใครเรียก capture.read() เอง
+    """
+
+    def __init__(self, camera_id: int, stream_url: str, buffer_size: int, reconnect_delay: float,
+                 open_timeout: float = 10.0, read_timeout: float = 5.0):
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.reconnect_delay = reconnect_delay
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.ready = threading.Event()  # set เมื่อได้เฟรมแรก
+        self.last_error = None
+        self.frames = deque(maxlen=max(1, buffer_size))  # (seq, timestamp, frame)
+        self.seq = 0
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        self.waiters = []  # (loop, future, after_seq) ของผู้รอจาก async route
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.ready.set()  # ปลดผู้ที่รอเปิดกล้องอยู่
+        with self.condition:
+            self.condition.notify_all()
+            self._wake_waiters_locked(None)
+
+    def _open(self):
+        print(f"🔍 เปิดกล้อง {self.camera_id} ที่ {self.stream_url}")
+        # ✅ timeout ของ FFMPEG backend เพื่อไม่ให้ open/read ค้างไม่มีกำหนด
+        params = [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000),
+        ]
+        capture = cv2.VideoCapture(self.stream_url, cv2.CAP_FFMPEG, params)
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # ลดขนาด buffer เพื่อให้ได้เฟรมล่าสุดเสมอ
+        if not capture.isOpened():
+            capture.release()
+            self.last_error = f"Cannot open camera {self.camera_id}"
+            print(f"❌ ไม่สามารถเปิดกล้อง {self.camera_id}")
+            return None
+        print(f"✅ เปิดกล้อง {self.camera_id} สำเร็จ")
+        return capture
+
+    def _run(self):
+        capture = None
+        try:
+            while self.running:
+                if capture is None:
+                    capture = self._open()
+                    if capture is None:
+                        time.sleep(self.reconnect_delay)
+                        continue
+
+                success, frame = capture.read()
+                if not success:
+                    # สัญญาณหลุด/อ่านเกิน read_timeout: ปิดแล้วเชื่อมต่อใหม่
+                    self.last_error = f"Cannot read frame from camera {self.camera_id}"
+                    print(f"⚠️ อ่านเฟรมจากกล้อง {self.camera_id} ไม่ได้ กำลังเชื่อมต่อใหม่")
+                    capture.release()
+                    capture = None
+                    time.sleep(self.reconnect_delay)
+                    continue
+
+                with self.condition:
+                    self.seq += 1
+                    entry = (self.seq, time.time(), frame)
+                    self.frames.append(entry)
+                    self.condition.notify_all()
+                    self._wake_waiters_locked(entry)
+                self.ready.set()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Error reading camera {self.camera_id}: {e}")
+        finally:
+            self.running = False
+            self.ready.set()
+            with self.condition:
+                self.condition.notify_all()
+                self._wake_waiters_locked(None)
+            if capture is not None:
+                capture.release()
+            print(f"✅ กล้อง {self.camera_id} ถูกปิด")
+
+    def latest(self):
+        """
+        คืนค่าเฟรมล่าสุด (seq, timestamp, frame) หรือ None ถ้ายังไม่มีเฟรม
+        """
+        with self.condition:
+            return self.frames[-1] if self.frames else None
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: float = 1.0):
+        """
+        รอจนมีเฟรมที่ใหม่กว่า after_seq (blocking สำหรับ thread เช่น mjpeg_stream) หมดเวลาจะคืน None
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.running and (not self.frames or self.frames[-1][0] <= after_seq):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.frames[-1] if self.frames and self.frames[-1][0] > after_seq else None
+
+    def watch(self, loop, after_seq: int = 0):
+        """
+        asyncio future ที่ได้เฟรมใหม่กว่า after_seq (หรือ None เมื่อกล้องหยุด) ไม่ใช้ thread ในการรอ
+        thread ถอดรหัสส่งผลเข้า event loop ด้วย call_soon_threadsafe ผู้เรียกต้อง unwatch() เสมอ
+        """
+        future = loop.create_future()
+        with self.condition:
+            if self.frames and self.frames[-1][0] > after_seq:
+                future.set_result(self.frames[-1])
+            elif not self.running:
+                future.set_result(None)
+            else:
+                self.waiters.append((loop, future, after_seq))
+        return future
+
+    def unwatch(self, future):
+        with self.condition:
+            self.waiters = [waiter for waiter in self.waiters if waiter[1] is not future]
+
+    def _wake_waiters_locked(self, entry):
+        """
+        ส่งเฟรม (หรือ None = กล้องหยุด) ให้ผู้รอที่ต้องการเฟรมนี้ เรียกขณะถือ self.condition
+        """
+        waiting = []
+        for loop, future, after_seq in self.waiters:
+            if entry is not None and entry[0] <= after_seq:
+                waiting.append((loop, future, after_seq))
+                continue
+            try:
+                loop.call_soon_threadsafe(_set_result, future, entry)
+            except RuntimeError:
+                pass  # event loop ถูกปิดไปแล้ว
+        self.waiters = waiting
+
+
+def _set_result(future, entry):
+    if not future.done():  # ผู้รออาจหมดเวลา / ถูกยกเลิกไปแล้ว
+        future.set_result(entry)
+
+
+class CameraBroker:
+    """
+    ดูแล CameraFeed ของทุกกล้อง: หนึ่งกล้องถอดรหัสครั้งเดียว ไม่ว่าจะมีผู้ชมกี่คน
+    นับจำนวนผู้ใช้ (acquire/release) และปิดกล้องเมื่อไม่มีผู้ใช้เหลืออยู่
+
+    การรอกล้องจาก async route รอบน asyncio future ที่ thread ถอดรหัสปลุกเอง (ไม่กิน thread ระหว่างรอ)
+    และมี timeout เสมอ กล้องที่ค้างจึงไม่บล็อก event loop หรือ request อื่น
+    """
+
+    def __init__(self, buffer_size: int = 4, reconnect_delay: float = 2.0,
+                 open_timeout: float = 10.0, read_timeout: float = 5.0):
+        self.buffer_size = buffer_size
+        self.reconnect_delay = reconnect_delay
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.feeds = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, camera_id: int, stream_url: str) -> CameraFeed:
+        with self.lock:
+            feed = self.feeds.get(camera_id)
+            if feed is not None and (feed.stream_url != stream_url or not feed.running):
+                # URL ของกล้องถูกเปลี่ยนใน DB หรือ thread เดิมหยุดไปแล้ว: เปิดใหม่ (ผู้ใช้เดิมย้ายมาด้วย)
+                feed.stop()
+                subscribers = feed.subscribers
+                feed = None
+            else:
+                subscribers = 0
+            if feed is None:
+                feed = CameraFeed(
+                    camera_id, stream_url, self.buffer_size, self.reconnect_delay,
+                    open_timeout=self.open_timeout, read_timeout=self.read_timeout,
+                )
+                feed.subscribers = subscribers
+                feed.start()
+                self.feeds[camera_id] = feed
+            feed.subscribers += 1
+            return feed
+
+    def release(self, camera_id: int):
+        with self.lock:
+            feed = self.feeds.get(camera_id)
+            if feed is None:
+                return
+            feed.subscribers -= 1
+            if feed.subscribers <= 0:
+                print(f"🛑 ปิดกล้อง {camera_id} (ไม่มีผู้ชมแล้ว)")
+                feed.stop()
+                del self.feeds[camera_id]
+
+    async def _wait_frame(self, feed: CameraFeed, after_seq: int, timeout: float):
+        future = feed.watch(asyncio.get_running_loop(), after_seq)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            feed.unwatch(future)
+
+    async def wait_ready(self, feed: CameraFeed, timeout: float = None) -> bool:
+        """
+        รอจนกล้องส่งเฟรมแรก (awaitable) คืนค่า False ถ้ากล้องเปิดไม่สำเร็จภายในเวลาที่กำหนด
+        """
+        timeout = self.open_timeout if timeout is None else timeout
+        if not feed.ready.is_set() and await self._wait_frame(feed, 0, timeout) is None:
+            return False
+        return feed.running and feed.latest() is not None
+
+    async def next_frame(self, feed: CameraFeed, after_seq: int = 0, timeout: float = None):
+        """
+        เฟรมที่ใหม่กว่า after_seq (awaitable) หรือ None เมื่อหมดเวลา
+        """
+        timeout = self.read_timeout if timeout is None else timeout
+        return await self._wait_frame(feed, after_seq, timeout)
+
+    def get(self, camera_id: int):
+        with self.lock:
+            return self.feeds.get(camera_id)
+
+    def stop(self, camera_id: int):
+        """
+        บังคับปิดกล้อง (ผู้ชมที่เหลือจะหลุดออกจาก stream)
+        """
+        with self.lock:
+            feed = self.feeds.pop(camera_id, None)
+        if feed is not None:
+            feed.stop()
+
+    def stop_all(self):
+        with self.lock:
+            feeds, self.feeds = list(self.feeds.values()), {}
+        for feed in feeds:
+            feed.stop()
+
+    def stats(self):
+        with self.lock:
+            return {
+                camera_id: {"subscribers": feed.subscribers, "seq": feed.seq, "stream_url": feed.stream_url}
+                for camera_id, feed in self.feeds.items()
+            }
+
+
+camera_broker = None
+
+
+def get_camera_broker() -> CameraBroker:
+    global camera_broker
+    if camera_broker is None:
+        camera_broker = CameraBroker(
+            buffer_size=settings.CAMERA_BUFFER_SIZE,
+            reconnect_delay=settings.CAMERA_RECONNECT_DELAY,
+            open_timeout=settings.CAMERA_OPEN_TIMEOUT,
+            read_timeout=settings.CAMERA_READ_TIMEOUT,
+        )
+    return camera_broker
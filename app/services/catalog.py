@@ -0,0 +1,106 @@
+# app/services/catalog.py
+
+import threading
+import time
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.product import Product
+from app.services.product_search import product_search_index
+
+
+def serialize_product(product) -> dict:
+    """
+    แปลงสินค้าเป็น dict ที่ template หน้าแรก / หน้าหมวดหมู่ใช้
+    """
+    return {
+        "product_id": product.product_id,
+        "name": product.name,
+        "price": product.price,
+        "description": product.description,
+        "image_path": product.image_path,
+        "category": product.category,
+        "stock": product.stock,
+    }
+
+
+class CatalogSnapshot:
+    """
+    snapshot ของสินค้าทั้งหมดในหน่วยความจำ สำหรับหน้าแรกและหน้าหมวดหมู่
+    - products: product_id -> dict ที่ serialize ไว้แล้ว
+    - lists: "all" / ชื่อหมวดหมู่ -> list ของ dict (เรียงตาม product_id) ใช้ส่งให้ template ได้ทันที
+    - invalidate(product_ids) โหลดใหม่เฉพาะสินค้าที่เปลี่ยน, invalidate() โหลดใหม่ทั้งหมด
+    - ttl กันกรณีแก้ข้อมูลสินค้านอกแอป (เช่นแก้ใน DB โดยตรง)
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.products = None
+        self.lists = {}
+        self.dirty = set()
+        self.built_at = 0.0
+        self.version = 0  # เพิ่มทุกครั้งที่ข้อมูลใน snapshot เปลี่ยน (ใช้เป็นส่วนหนึ่งของ key ของ page cache)
+
+    def _rebuild_lists(self):
+        self.version += 1
+        ordered = [self.products[product_id] for product_id in sorted(self.products)]
+        lists = {"all": ordered}
+        for product in ordered:
+            lists.setdefault(product["category"], []).append(product)
+        self.lists = lists
+
+    def _refresh(self, db: Session):
+        if self.products is None or time.monotonic() - self.built_at > self.ttl:
+            self.products = {product.product_id: serialize_product(product) for product in db.query(Product).all()}
+            self.dirty.clear()
+            self.built_at = time.monotonic()
+            self._rebuild_lists()
+            print(f"✅ สร้าง catalog snapshot ใหม่: {len(self.products)} สินค้า")
+        elif self.dirty:
+            product_ids, self.dirty = list(self.dirty), set()
+            for product_id in product_ids:
+                self.products.pop(product_id, None)
+            for product in db.query(Product).filter(Product.product_id.in_(product_ids)).all():
+                self.products[product.product_id] = serialize_product(product)
+            self._rebuild_lists()
+
+    def view(self, db: Session, category: str = "all"):
+        """
+        (list ของสินค้าในหมวดหมู่, version ของ snapshot) อ่านพร้อมกันภายใต้ lock เดียว
+        """
+        with self.lock:
+            self._refresh(db)
+            return self.lists.get(category, []), self.version
+
+    def get(self, db: Session, category: str = "all") -> list:
+        """
+        list ของสินค้า (dict) ในหมวดหมู่ที่ระบุ ("all" = ทั้งหมด) ไม่ query DB ถ้า snapshot ยังใหม่อยู่
+        """
+        return self.view(db, category)[0]
+
+    def lookup(self, db: Session, product_ids) -> list:
+        """
+        dict ของสินค้าตาม product_id ที่ระบุ (คงลำดับเดิม ข้ามสินค้าที่ไม่มีแล้ว)
+        """
+        with self.lock:
+            self._refresh(db)
+            return [self.products[product_id] for product_id in product_ids if product_id in self.products]
+
+    def invalidate(self, product_ids=None):
+        with self.lock:
+            if product_ids is None:
+                self.products = None
+            elif self.products is not None:
+                self.dirty.update(product_ids)
+
+
+catalog_snapshot = CatalogSnapshot(ttl=settings.CATALOG_TTL)
+
+
+def invalidate_catalog(product_ids=None):
+    """
+    เรียกหลังเพิ่ม/แก้สินค้าหรือสต็อก (ส่ง product_ids เพื่อโหลดใหม่เฉพาะสินค้านั้น)
+    search index ของสินค้าจะถูกทำใหม่ตามไปด้วย
+    """
+    catalog_snapshot.invalidate(product_ids)
+    product_search_index.invalidate(product_ids)
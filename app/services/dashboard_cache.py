@@ -0,0 +1,81 @@
+# app/services/dashboard_cache.py
+
+import asyncio
+import time
+from app.config import settings
+
+# TTL (วินาที) ของข้อมูล dashboard แต่ละช่วงเวลา: ช่วงยาวเปลี่ยนช้ากว่า จึง cache ได้นานกว่า
+PERIOD_TTLS = {
+    "today": settings.DASHBOARD_CACHE_TTL_TODAY,
+    "week": settings.DASHBOARD_CACHE_TTL_WEEK,
+    "month": settings.DASHBOARD_CACHE_TTL_MONTH,
+    "year": settings.DASHBOARD_CACHE_TTL_YEAR,
+}
+
+
+def period_ttl(period: str) -> float:
+    return PERIOD_TTLS.get(period, settings.DASHBOARD_CACHE_TTL_TODAY)
+
+
+class DashboardCache:
+    """
+    cache ผลลัพธ์ของ dashboard ตาม key (เช่น ("executive", period)) บน event loop ของ server
+    - อายุไม่เกิน ttl: ตอบจาก cache
+    - หมดอายุแต่ไม่เกิน ttl + max_stale: ตอบค่าเดิมทันที แล้วคำนวณใหม่เบื้องหลัง 1 งาน
+    - ไม่มีค่า / เก่าเกินไป: รอผลการคำนวณ request ที่มาพร้อมกันด้วย key เดียวกันรองานเดียวกัน
+    compute ต้องเปิด DB session ของตัวเอง เพราะอาจทำงานต่อหลัง request ที่เรียกจบไปแล้ว
+    """
+
+    def __init__(self, max_stale: float = 300.0):
+        self.max_stale = max_stale
+        self.entries = {}  # key -> (value, computed_at)
+        self.inflight = {}  # key -> asyncio.Task
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "computations": 0, "errors": 0}
+
+    async def _compute(self, key, compute):
+        try:
+            value = await compute()
+            self.entries[key] = (value, time.monotonic())
+            self.stats["computations"] += 1
+            return value
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ คำนวณ dashboard {key} ไม่สำเร็จ: {e}")
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    def _refresh(self, key, compute) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            # งานเบื้องหลังที่ไม่มีใครรอผล: อ่าน exception ทิ้งไว้ (log แล้วใน _compute)
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.inflight[key] = task
+        return task
+
+    async def get(self, key, compute, ttl: float):
+        if ttl <= 0:
+            return await compute()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, computed_at = entry
+            age = time.monotonic() - computed_at
+            if age < ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < ttl + self.max_stale:
+                self.stats["stale"] += 1
+                self._refresh(key, compute)
+                return value
+
+        self.stats["misses"] += 1
+        # shield: request ที่ถูกยกเลิก (ผู้ใช้ปิดแท็บ) ไม่ยกเลิกงานที่ request อื่นรออยู่
+        return await asyncio.shield(self._refresh(key, compute))
+
+    def clear(self):
+        self.entries.clear()
+
+
+dashboard_cache = DashboardCache(max_stale=settings.DASHBOARD_CACHE_MAX_STALE)
@@ -0,0 +1,201 @@
+# app/services/detection_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from app.config import settings
+from app.services import yolo_worker
+
+
+def detection_cache_key(image_bytes: bytes, model_version: str) -> str:
+    """
+    key ของผลตรวจจับ = hash ของภาพ + เวอร์ชันโมเดล + ค่า threshold ทั้งหมด
+    (เปลี่ยนโมเดลหรือ threshold แล้ว key จะเปลี่ยนเอง ไม่ต้องล้าง cache)
+    """
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    params = f"{model_version}|conf={yolo_worker.CONF_THRESHOLD}|min={yolo_worker.MIN_CONFIDENCE}|iou={yolo_worker.IOU_THRESHOLD}|imgsz={settings.YOLO_IMGSZ}"
+    return hashlib.sha256(f"{digest}|{params}".encode("utf-8")).hexdigest()
+
+
+class DetectionCache:
+    """
+    cache ผลตรวจจับแบบ content-addressed
+    - ชั้นหน่วยความจำ: LRU จำกัดตามจำนวน bytes (max_bytes)
+    - ชั้นดิสก์ (ถ้ากำหนด disk_dir): {key}.json สำหรับ detections และ {key}.jpg สำหรับภาพ annotated
+      จำกัดตามจำนวน bytes (disk_max_bytes) ลบทั้งคู่ของ key ที่ใช้ล่าสุดนานที่สุดก่อน (ลำดับเริ่มต้นจาก mtime)
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: str = "", disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()  # key -> {"detections", "annotated", "size"}
+        self.size = 0
+        self.disk_entries = OrderedDict()  # key -> {".json": bytes, ".jpg": bytes}
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0, "annotated_hits": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    async def run(self, func, *args):
+        """
+        เรียกเมธอดของ cache จาก async route (ถ้ามีชั้นดิสก์จะรันใน thread เพื่อไม่บล็อก event loop)
+        """
+        if self.disk_dir:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def _disk_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}{ext}")
+
+    def _scan_disk(self):
+        """
+        โหลดรายการไฟล์ที่มีอยู่แล้วในชั้นดิสก์ (เรียงตาม mtime เก่า -> ใหม่) แล้วตัดให้อยู่ในงบ
+        """
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            key, ext = os.path.splitext(entry.name)
+            if ext in (".json", ".jpg") and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, key, ext, stat.st_size))
+        for _, key, ext, size in sorted(files):
+            self.disk_entries.setdefault(key, {})[ext] = size
+            self.disk_entries.move_to_end(key)
+            self.disk_size += size
+        with self.lock:
+            self._prune_disk_locked()
+
+    def _prune_disk_locked(self):
+        while self.disk_size > self.disk_max_bytes and len(self.disk_entries) > 1:
+            key, files = self.disk_entries.popitem(last=False)
+            for ext, size in files.items():
+                self.disk_size -= size
+                try:
+                    os.remove(self._disk_path(key, ext))
+                except OSError:
+                    pass
+            self.counters["disk_evictions"] += 1
+
+    def _read_disk(self, key: str, ext: str):
+        """
+        อ่านไฟล์ของ key จากชั้นดิสก์ หรือ None (ไม่มี / ถูกลบไปแล้วตอนตัดงบ)
+        """
+        try:
+            with open(self._disk_path(key, ext), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch_disk(key, ext)
+        return data
+
+    def _touch_disk(self, key: str, ext: str):
+        """
+        ไฟล์ของ key ถูกอ่าน: ย้ายไปท้าย LRU และอัปเดต mtime ให้ลำดับยังถูกหลังรีสตาร์ต
+        """
+        with self.lock:
+            if key in self.disk_entries:
+                self.disk_entries.move_to_end(key)
+        try:
+            os.utime(self._disk_path(key, ext))
+        except OSError:
+            pass
+
+    def _write_disk(self, key: str, ext: str, data: bytes):
+        with open(self._disk_path(key, ext), "wb") as f:
+            f.write(data)
+        with self.lock:
+            files = self.disk_entries.setdefault(key, {})
+            self.disk_size += len(data) - files.get(ext, 0)
+            files[ext] = len(data)
+            self.disk_entries.move_to_end(key)
+            self._prune_disk_locked()
+
+    def _store(self, key: str, detections: list, annotated: bytes = None):
+        size = len(json.dumps(detections)) + (len(annotated) if annotated else 0)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old["size"]
+            self.entries[key] = {"detections": detections, "annotated": annotated, "size": size}
+            self.size += size
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["size"]
+                self.counters["evictions"] += 1
+
+    def get(self, key: str):
+        """
+        คืนค่า detections ที่เคยคำนวณไว้ หรือ None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry["detections"]
+
+        data = self._read_disk(key, ".json") if self.disk_dir else None
+        if data is not None:
+            detections = json.loads(data)
+            self._store(key, detections)
+            with self.lock:
+                self.counters["disk_hits"] += 1
+            return detections
+
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, detections: list):
+        self._store(key, detections)
+        if self.disk_dir:
+            self._write_disk(key, ".json", json.dumps(detections, ensure_ascii=False).encode("utf-8"))
+
+    def get_annotated(self, key: str):
+        """
+        ภาพ annotated (JPEG) ที่เคยสร้างไว้ หรือ None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry["annotated"] is not None:
+                self.entries.move_to_end(key)
+                self.counters["annotated_hits"] += 1
+                return entry["annotated"]
+
+        annotated = self._read_disk(key, ".jpg") if self.disk_dir else None
+        if annotated is not None:
+            with self.lock:
+                self.counters["annotated_hits"] += 1
+        return annotated
+
+    def put_annotated(self, key: str, detections: list, annotated: bytes):
+        self._store(key, detections, annotated)
+        if self.disk_dir:
+            self._write_disk(key, ".jpg", annotated)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round((self.counters["hits"] + self.counters["disk_hits"]) / lookups, 4) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir or None,
+                "disk_entries": len(self.disk_entries),
+                "disk_bytes": self.disk_size,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else None,
+            }
+
+
+detection_cache = DetectionCache(
+    max_bytes=settings.DETECT_CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=settings.DETECT_CACHE_DIR,
+    disk_max_bytes=settings.DETECT_CACHE_DISK_MAX_MB * 1024 * 1024,
+)
@@ -0,0 +1,33 @@
+# app/services/detection_results.py
+
+import threading
+import uuid
+from collections import OrderedDict
+from app.config import settings
+
+
+class RecentDetections:
+    """
+    เก็บภาพต้นฉบับ + detections ของการตรวจจับล่าสุดไว้ในหน่วยความจำ (จำกัดจำนวน, ตัวเก่าสุดถูกลบก่อน)
+    ใช้สร้างภาพ annotated ตอนที่ client ขอจริงเท่านั้น
+    """
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, image_bytes: bytes, detections: list, cache_key: str = None) -> str:
+        detection_id = uuid.uuid4().hex
+        with self.lock:
+            self.items[detection_id] = (image_bytes, detections, cache_key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return detection_id
+
+    def get(self, detection_id: str):
+        with self.lock:
+            return self.items.get(detection_id)
+
+
+recent_detections = RecentDetections(max_items=settings.DETECT_RESULT_CACHE_SIZE)
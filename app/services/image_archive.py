@@ -0,0 +1,20 @@
+# app/services/image_archive.py
+
+import os
+
+
+def write_image(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def archive_detection_images(image_path: str, image_bytes: bytes):
+    """
+    บันทึกภาพต้นฉบับของการตรวจจับลงดิสก์ (ภาพ annotated สร้างเมื่อมีคนขอเท่านั้น)
+    ใช้เป็น background task หลังส่ง response แล้ว จึงไม่บล็อกการตอบกลับ
+    """
+    try:
+        write_image(image_path, image_bytes)
+    except Exception as e:
+        print(f"❌ บันทึกภาพการตรวจจับไม่สำเร็จ ({image_path}): {e}")
@@ -0,0 +1,211 @@
+# app/services/inference_backend.py
+
+import hashlib
+import json
+import os
+import shutil
+import cv2
+import numpy as np
+from app.services import yolo_worker
+
+BACKENDS = ("torch", "onnx")
+
+
+def file_digest(path: str) -> str:
+    """
+    hash สั้น ๆ ของไฟล์โมเดล (ใช้เป็นเวอร์ชันของโมเดล)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def exported_model_path(model_path: str, export_dir: str, int8: bool = False) -> str:
+    """
+    path ของไฟล์ ONNX ที่ export แล้ว (ผูกกับ hash ของ best.pt เพื่อให้ export ใหม่อัตโนมัติเมื่อเปลี่ยนโมเดล)
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = "-int8" if int8 else ""
+    return os.path.join(export_dir, f"{stem}-{file_digest(model_path)}{suffix}.onnx")
+
+
+def names_path(onnx_path: str) -> str:
+    return os.path.splitext(onnx_path)[0] + ".names.json"
+
+
+def export_onnx(model_path: str, export_dir: str, int8: bool = False, imgsz: int = 640) -> str:
+    """
+    export best.pt เป็น ONNX ครั้งเดียวแล้วเก็บไว้ใน export_dir (ถ้ามีอยู่แล้วจะใช้ไฟล์เดิม)
+    - int8=True จะทำ dynamic INT8 quantization ด้วย onnxruntime ต่อจากไฟล์ FP32
+    - บันทึก model.names ไว้คู่กันเพื่อให้ label ตรงกับโมเดล PyTorch
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    target = exported_model_path(model_path, export_dir, int8)
+    if os.path.exists(target) and os.path.exists(names_path(target)):
+        return target
+
+    fp32_target = exported_model_path(model_path, export_dir, int8=False)
+    if not os.path.exists(fp32_target):
+        print(f"🔄 กำลัง export {model_path} เป็น ONNX ...")
+        model = yolo_worker.load_model(model_path)
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, device="cpu")
+        shutil.move(str(exported), fp32_target)
+        with open(names_path(fp32_target), "w", encoding="utf-8") as f:
+            json.dump({int(k): v for k, v in model.names.items()}, f, ensure_ascii=False)
+        print(f"✅ export ONNX สำเร็จ: {fp32_target}")
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("🔄 กำลังทำ INT8 quantization ...")
+        quantize_dynamic(fp32_target, target, weight_type=QuantType.QUInt8)
+        shutil.copyfile(names_path(fp32_target), names_path(target))
+        print(f"✅ INT8 quantization สำเร็จ: {target}")
+
+    return target
+
+
+def prepare_model(backend: str, model_path: str, export_dir: str, int8: bool = False, imgsz: int = 640) -> str:
+    """
+    เตรียมไฟล์โมเดลสำหรับ backend ที่เลือก (เรียกใน process หลักก่อนเปิด replica)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend: {backend} (expected one of {BACKENDS})")
+    if backend == "onnx":
+        return export_onnx(model_path, export_dir, int8=int8, imgsz=imgsz)
+    return model_path
+
+
+def letterbox(image, size: int):
+    """
+    ย่อภาพโดยคงสัดส่วนแล้วเติมขอบให้เป็น size x size (เหมือน preprocessing ของ ultralytics)
+    คืนค่า (ภาพ, gain, (pad_x, pad_y))
+    """
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    if (w, h) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, gain, (left, top)
+
+
+class TorchBackend:
+    """
+    รันโมเดล PyTorch (best.pt) ผ่าน ultralytics
+    """
+
+    name = "torch"
+
+    def __init__(self, model_path: str, threads: int = 0):
+        self.model = yolo_worker.load_model(model_path)
+        self.names = self.model.names
+
+    def warmup(self):
+        yolo_worker.warmup(self.model)
+
+    def predict(self, images):
+        """
+        คืนค่า list ของ numpy array ขนาด (N, 6): x1, y1, x2, y2, conf, cls ต่อภาพ
+        """
+        results = yolo_worker.predict_batch(images, self.model)
+        return [result.boxes.data.cpu().numpy() for result in results]
+
+
+class OnnxBackend:
+    """
+    รันโมเดลที่ export เป็น ONNX ผ่าน ONNX Runtime (CPUExecutionProvider)
+    """
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, threads: int = 0, imgsz: int = 640):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # ถ้า export แบบ static batch จะรันทีละภาพ
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.imgsz = model_input.shape[2] if isinstance(model_input.shape[2], int) else imgsz
+
+        with open(names_path(onnx_path), encoding="utf-8") as f:
+            self.names = {int(k): v for k, v in json.load(f).items()}
+
+    def warmup(self):
+        self.predict([np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)])
+
+    def _preprocess(self, images):
+        tensors, meta = [], []
+        for image in images:
+            boxed, gain, pad = letterbox(image, self.imgsz)
+            tensors.append(boxed[:, :, ::-1].transpose(2, 0, 1))  # BGR -> RGB, HWC -> CHW
+            meta.append((gain, pad, image.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(tensors), dtype=np.float32) / 255.0
+        return batch, meta
+
+    def _decode(self, output):
+        """
+        แปลง output ของโมเดลเป็น (N, 6) ในพิกัดของภาพที่ letterbox แล้ว
+        - YOLOv10 (end-to-end): (300, 6) ใช้ได้เลย
+        - YOLOv8 แบบเดิม: (4 + nc, anchors) ต้องทำ NMS เอง
+        """
+        if output.ndim == 2 and output.shape[1] == 6:
+            return output[output[:, 4] >= yolo_worker.CONF_THRESHOLD]
+
+        preds = output.T  # (anchors, 4 + nc)
+        scores = preds[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        keep = conf >= yolo_worker.CONF_THRESHOLD
+        preds, cls, conf = preds[keep], cls[keep], conf[keep]
+        if not len(preds):
+            return np.zeros((0, 6), dtype=np.float32)
+
+        xywh = preds[:, :4].copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+        indices = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), conf.tolist(), cls.tolist(), yolo_worker.CONF_THRESHOLD, yolo_worker.IOU_THRESHOLD
+        )
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        boxes = np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]], axis=1)
+        return np.column_stack([boxes[indices], conf[indices], cls[indices]]).astype(np.float32)
+
+    def predict(self, images):
+        """
+        คืนค่า list ของ numpy array ขนาด (N, 6): x1, y1, x2, y2, conf, cls ต่อภาพ (พิกัดของภาพต้นฉบับ)
+        """
+        batch, meta = self._preprocess(images)
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: x[None]})[0] for x in batch])
+
+        detections = []
+        for output, (gain, (pad_x, pad_y), (h, w)) in zip(outputs, meta):
+            boxes = self._decode(output).copy()
+            boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / gain).clip(0, w)
+            boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / gain).clip(0, h)
+            detections.append(boxes)
+        return detections
+
+
+def load_backend(backend: str, model_path: str, threads: int = 0, imgsz: int = 640):
+    """
+    สร้าง backend ตามชื่อที่ตั้งค่าไว้ (model_path ต้องผ่าน prepare_model มาแล้ว)
+    """
+    if backend == "onnx":
+        return OnnxBackend(model_path, threads=threads, imgsz=imgsz)
+    return TorchBackend(model_path, threads=threads)
@@ -0,0 +1,174 @@
+# app/services/live_detection.py
+
+import asyncio
+from app.config import settings
+from app.services.camera_broker import get_camera_broker
+from app.services.mjpeg_stream import mjpeg_chunk, offer_latest
+from app.services.yolo_service import get_yolo_service, InferenceQueueFull
+
+
+class LiveDetection:
+    """
+    ตรวจจับต่อเนื่องบนกล้องหนึ่งตัว
+    - ใช้เฟรมล่าสุดจาก camera broker เสมอ เฟรมที่มาระหว่าง inference จะถูกข้าม
+    - มีงาน inference ค้างได้ครั้งละ 1 งานต่อกล้อง และไม่เกิน fps ที่กำหนด (โหลดคงที่ไม่ขึ้นกับ fps ของกล้อง)
+    - ภาพ annotated ถูกสร้างเฉพาะเมื่อมีผู้ชม annotated stream
+    """
+
+    def __init__(self, camera_id: int, feed, fps: float):
+        self.camera_id = camera_id
+        self.feed = feed
+        self.fps = fps
+        self.latest = None  # ผลล่าสุด {seq, timestamp, detections, inference_ms}
+        self.stats = {"inferences": 0, "skipped_frames": 0, "rejected": 0, "errors": 0}
+        self.listeners = set()  # asyncio.Queue ของ WebSocket
+        self.viewers = set()  # asyncio.Queue ของ annotated MJPEG
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def subscribe(self, annotated: bool = False) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        (self.viewers if annotated else self.listeners).add(queue)
+        if not annotated and self.latest is not None:
+            queue.put_nowait(self.latest)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.listeners.discard(queue)
+        self.viewers.discard(queue)
+
+    async def _run(self):
+        broker = get_camera_broker()
+        yolo_service = get_yolo_service()
+        last_seq = 0
+        loop = asyncio.get_running_loop()
+
+        print(f"🎥 เริ่ม live detection กล้อง {self.camera_id} ({self.fps} fps)")
+        try:
+            while self.feed.running:
+                started = loop.time()
+                interval = 1.0 / self.fps
+                entry = await broker.next_frame(self.feed, last_seq)
+                if entry is None:
+                    continue
+
+                seq, timestamp, frame = entry
+                if last_seq:
+                    self.stats["skipped_frames"] += max(seq - last_seq - 1, 0)
+                last_seq = seq
+
+                annotate = bool(self.viewers)
+                try:
+                    output = await yolo_service.detect(frame, save_annotated=annotate)
+                except InferenceQueueFull:
+                    # pool เต็ม: ข้ามเฟรมนี้ แล้วลองใหม่ในรอบถัดไป
+                    self.stats["rejected"] += 1
+                    await asyncio.sleep(interval)
+                    continue
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"❌ live detection กล้อง {self.camera_id}: {e}")
+                    await asyncio.sleep(interval)
+                    continue
+
+                self.stats["inferences"] += 1
+                self.latest = {
+                    "camera_id": self.camera_id,
+                    "seq": seq,
+                    "timestamp": timestamp,
+                    "detections": output["detections"],
+                    "inference_ms": round((loop.time() - started) * 1000, 1),
+                }
+                for queue in list(self.listeners):
+                    offer_latest(queue, self.latest)
+                if annotate and output.get("annotated_bytes"):
+                    chunk = mjpeg_chunk(output["annotated_bytes"])
+                    for queue in list(self.viewers):
+                        offer_latest(queue, chunk)
+
+                # ✅ จำกัดอัตรา inference ตาม fps ที่ตั้งไว้
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+        finally:
+            print(f"🛑 หยุด live detection กล้อง {self.camera_id}")
+
+
+class LiveDetectionManager:
+    """
+    เก็บ live detection ของทุกกล้อง (หนึ่งงานต่อกล้อง) และถือสิทธิ์ผู้ชมของ camera broker ไว้ระหว่างทำงาน
+    """
+
+    def __init__(self, default_fps: float = 2.0, max_fps: float = 10.0):
+        self.default_fps = default_fps
+        self.max_fps = max_fps
+        self.sessions = {}
+
+    def get(self, camera_id: int):
+        return self.sessions.get(camera_id)
+
+    async def start(self, camera_id: int, stream_url: str, fps: float = None) -> LiveDetection:
+        fps = min(max(fps or self.default_fps, 0.1), self.max_fps)
+        session = self.sessions.get(camera_id)
+        if session is not None and session.task is not None and not session.task.done():
+            session.fps = fps
+            return session
+        if session is not None:
+            # งานเดิมหยุดไปแล้ว (เช่นกล้องหลุด): คืนกล้องก่อนเริ่มใหม่
+            await self.stop(camera_id)
+
+        broker = get_camera_broker()
+        feed = broker.acquire(camera_id, stream_url)
+        # ถูกยกเลิกระหว่างรอ (CancelledError) ก็ต้องคืนกล้อง ไม่งั้นจำนวนผู้ใช้ค้างและกล้องไม่ถูกปิด
+        try:
+            ready = await broker.wait_ready(feed)
+        except BaseException:
+            broker.release(camera_id)
+            raise
+        if not ready:
+            broker.release(camera_id)
+            raise TimeoutError(feed.last_error or f"Camera {camera_id} did not respond")
+
+        session = LiveDetection(camera_id, feed, fps)
+        session.start()
+        self.sessions[camera_id] = session
+        return session
+
+    async def stop(self, camera_id: int) -> bool:
+        session = self.sessions.pop(camera_id, None)
+        if session is None:
+            return False
+        await session.stop()
+        get_camera_broker().release(camera_id)
+        return True
+
+    async def stop_all(self):
+        for camera_id in list(self.sessions):
+            await self.stop(camera_id)
+
+    def status(self):
+        return {
+            camera_id: {"fps": session.fps, "running": not session.task.done(), **session.stats}
+            for camera_id, session in self.sessions.items()
+        }
+
+
+live_detection_manager = None
+
+
+def get_live_detection_manager() -> LiveDetectionManager:
+    global live_detection_manager
+    if live_detection_manager is None:
+        live_detection_manager = LiveDetectionManager(
+            default_fps=settings.LIVE_INFERENCE_FPS,
+            max_fps=settings.LIVE_MAX_FPS,
+        )
+    return live_detection_manager
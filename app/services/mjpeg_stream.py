@@ -0,0 +1,135 @@
+# app/services/mjpeg_stream.py
+
+import asyncio
+import threading
+import cv2
+from app.config import settings
+
+BOUNDARY = b"frame"
+
+
+def mjpeg_chunk(jpeg: bytes) -> bytes:
+    """
+    ห่อภาพ JPEG เป็นหนึ่งส่วนของ multipart/x-mixed-replace
+    """
+    return b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
+
+
+def offer_latest(queue: asyncio.Queue, chunk: bytes):
+    """
+    ใส่ chunk ล่าสุดลงคิวของผู้ชม (รันใน event loop) ถ้าผู้ชมยังไม่ได้อ่านเฟรมก่อนหน้าให้ทิ้งเฟรมเก่า
+    """
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(chunk)
+
+
+class MjpegEncoder:
+    """
+    encode เฟรมของกล้องหนึ่งตัวเป็น JPEG ครั้งเดียวต่อเฟรม แล้วส่ง bytes ชุดเดียวกันให้ผู้ชมทุกคน
+    - ทำงานเฉพาะเมื่อมีเฟรมใหม่ใน CameraFeed (ไม่ poll)
+    - ผู้ชมแต่ละคนมี asyncio.Queue(maxsize=1) ผู้ชมที่ช้าจะข้ามเฟรมแทนการสะสม buffer
+    """
+
+    def __init__(self, feed, quality: int, max_width: int):
+        self.feed = feed
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.max_width = max_width
+        self.subscribers = {}  # queue -> event loop ของผู้ชม
+        self.lock = threading.Lock()
+        self.latest_chunk = None
+        self.thread = None
+
+    def subscribe(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=1)
+        with self.lock:
+            self.subscribers[queue] = loop
+            if self.latest_chunk is not None:
+                # ให้ผู้ชมใหม่เห็นภาพทันทีโดยไม่ต้องรอเฟรมถัดไป
+                queue.put_nowait(self.latest_chunk)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"mjpeg-{self.feed.camera_id}", daemon=True)
+                self.thread.start()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self.lock:
+            self.subscribers.pop(queue, None)
+
+    def has_subscribers(self) -> bool:
+        with self.lock:
+            return bool(self.subscribers)
+
+    def _encode(self, frame) -> bytes:
+        if self.max_width and frame.shape[1] > self.max_width:
+            height = int(frame.shape[0] * self.max_width / frame.shape[1])
+            frame = cv2.resize(frame, (self.max_width, height), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, self.params)
+        if not ok:
+            return None
+        return mjpeg_chunk(buffer.tobytes())
+
+    def _run(self):
+        last_seq = 0
+        while True:
+            with self.lock:
+                # ตัดสินใจหยุดภายใต้ lock เพื่อไม่ให้ชนกับผู้ชมที่เพิ่ง subscribe
+                if not self.feed.running or not self.subscribers:
+                    self.thread = None
+                    return
+            entry = self.feed.wait_for_frame(last_seq, 1.0)
+            if entry is None:
+                continue
+            last_seq, _, frame = entry
+            chunk = self._encode(frame)
+            if chunk is None:
+                continue
+            with self.lock:
+                self.latest_chunk = chunk
+                targets = list(self.subscribers.items())
+            for queue, loop in targets:
+                try:
+                    loop.call_soon_threadsafe(offer_latest, queue, chunk)
+                except RuntimeError:
+                    # event loop ของผู้ชมปิดไปแล้ว
+                    self.unsubscribe(queue)
+
+
+class MjpegHub:
+    """
+    เก็บ MjpegEncoder หนึ่งตัวต่อกล้อง (ผูกกับ CameraFeed ปัจจุบันของกล้องนั้น)
+    """
+
+    def __init__(self, quality: int = 80, max_width: int = 0):
+        self.quality = quality
+        self.max_width = max_width
+        self.encoders = {}
+        self.lock = threading.Lock()
+
+    def encoder_for(self, feed) -> MjpegEncoder:
+        with self.lock:
+            encoder = self.encoders.get(feed.camera_id)
+            if encoder is None or encoder.feed is not feed:
+                encoder = MjpegEncoder(feed, self.quality, self.max_width)
+                self.encoders[feed.camera_id] = encoder
+            return encoder
+
+    def discard(self, feed):
+        with self.lock:
+            encoder = self.encoders.get(feed.camera_id)
+            if encoder is not None and encoder.feed is feed and not encoder.has_subscribers():
+                del self.encoders[feed.camera_id]
+
+
+mjpeg_hub = None
+
+
+def get_mjpeg_hub() -> MjpegHub:
+    global mjpeg_hub
+    if mjpeg_hub is None:
+        mjpeg_hub = MjpegHub(quality=settings.STREAM_JPEG_QUALITY, max_width=settings.STREAM_MAX_WIDTH)
+    return mjpeg_hub
@@ -0,0 +1,159 @@
+# app/services/order_verification.py
+
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.product import Product
+
+
+def normalize_label(label: str) -> str:
+    """
+    ทำชื่อ class ของ YOLO / ชื่อสินค้าให้อยู่รูปแบบเดียวกัน (ตัวเล็ก, ไม่สน _ - และช่องว่างซ้ำ)
+    """
+    return re.sub(r"[\s_\-]+", " ", str(label)).strip().lower()
+
+
+class LabelIndex:
+    """
+    index ชื่อ class ของ YOLO -> product_id (สร้างครั้งเดียวแล้ว cache ไว้ตาม TTL)
+    - ใช้ชื่อสินค้าใน tb_products เป็นหลัก
+    - เพิ่ม/ทับได้จากไฟล์ JSON {"label": product_id} ที่ YOLO_LABEL_MAP_PATH
+    """
+
+    def __init__(self, ttl: float = 300.0, label_map_path: str = ""):
+        self.ttl = ttl
+        self.label_map_path = label_map_path
+        self.lock = threading.Lock()
+        self.index = None
+        self.names = None
+        self.built_at = 0.0
+
+    def _build(self, db: Session):
+        index, names = {}, {}
+        for product_id, name in db.query(Product.product_id, Product.name).all():
+            index[normalize_label(name)] = product_id
+            names[product_id] = name
+
+        if self.label_map_path and os.path.exists(self.label_map_path):
+            with open(self.label_map_path, encoding="utf-8") as f:
+                for label, product_id in json.load(f).items():
+                    index[normalize_label(label)] = int(product_id)
+
+        return index, names
+
+    def get(self, db: Session):
+        """
+        คืนค่า (label -> product_id, product_id -> ชื่อสินค้า)
+        """
+        with self.lock:
+            if self.index is None or time.monotonic() - self.built_at > self.ttl:
+                self.index, self.names = self._build(db)
+                self.built_at = time.monotonic()
+                print(f"✅ สร้าง label index ใหม่: {len(self.index)} labels")
+            return self.index, self.names
+
+    async def aget(self, db: AsyncSession):
+        """
+        เหมือน get() สำหรับ AsyncSession (สร้าง index ผ่าน run_sync โดยไม่ถือ lock ระหว่างรอ query)
+        """
+        with self.lock:
+            if self.index is not None and time.monotonic() - self.built_at <= self.ttl:
+                return self.index, self.names
+
+        index, names = await db.run_sync(self._build)
+        with self.lock:
+            self.index, self.names = index, names
+            self.built_at = time.monotonic()
+        print(f"✅ สร้าง label index ใหม่: {len(index)} labels")
+        return index, names
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+
+
+label_index = LabelIndex(ttl=settings.LABEL_INDEX_TTL, label_map_path=settings.YOLO_LABEL_MAP_PATH)
+
+
+def diff_detections(order_items, detections, index: dict, names: dict) -> dict:
+    """
+    เทียบ detections กับรายการสินค้าในออเดอร์
+    คืนค่าต่อสินค้า: expected / detected / matched / missing / extra / max_confidence
+    การนับทำแบบ vectorized ด้วย numpy (np.unique + np.bincount) ไม่ได้วนนับทีละกล่อง
+    """
+    expected = {}
+    for item in order_items:
+        expected[item.product_id] = expected.get(item.product_id, 0) + item.quantity
+
+    labels = np.array([det["label"] for det in detections], dtype=object)
+    confidences = np.array([det["confidence"] for det in detections], dtype=np.float64)
+
+    # แปลง label เป็น product_id เฉพาะ label ที่ไม่ซ้ำ แล้วกระจายกลับด้วย inverse index
+    if len(labels):
+        unique_labels, inverse = np.unique(labels.astype(str), return_inverse=True)
+        unique_ids = np.array([index.get(normalize_label(label), -1) for label in unique_labels], dtype=np.int64)
+        detected_ids = unique_ids[inverse]
+    else:
+        unique_labels = np.array([], dtype=str)
+        inverse = np.array([], dtype=np.int64)
+        unique_ids = np.array([], dtype=np.int64)
+        detected_ids = np.array([], dtype=np.int64)
+
+    known = detected_ids >= 0
+    product_ids = np.union1d(np.fromiter(expected.keys(), dtype=np.int64, count=len(expected)), detected_ids[known])
+    positions = np.searchsorted(product_ids, detected_ids[known])
+
+    detected = np.bincount(positions, minlength=len(product_ids))
+    max_confidence = np.zeros(len(product_ids))
+    np.maximum.at(max_confidence, positions, confidences[known])
+    wanted = np.array([expected.get(int(product_id), 0) for product_id in product_ids], dtype=np.int64)
+
+    matched = np.minimum(detected, wanted)
+    missing = np.clip(wanted - detected, 0, None)
+    extra = np.clip(detected - wanted, 0, None)
+
+    items = []
+    for i, product_id in enumerate(product_ids.tolist()):
+        status = "missing" if missing[i] else "extra" if extra[i] else "matched"
+        items.append({
+            "product_id": product_id,
+            "name": names.get(product_id),
+            "expected": int(wanted[i]),
+            "detected": int(detected[i]),
+            "matched": int(matched[i]),
+            "missing": int(missing[i]),
+            "extra": int(extra[i]),
+            "max_confidence": round(float(max_confidence[i]), 4),
+            "status": status,
+        })
+
+    # label ที่ไม่ตรงกับสินค้าใดเลย
+    unknown_counts = np.bincount(inverse[~known], minlength=len(unique_labels)) if len(unique_labels) else np.array([])
+    unknown = [
+        {"label": str(label), "count": int(count)}
+        for label, count, product_id in zip(unique_labels.tolist(), unknown_counts.tolist(), unique_ids.tolist())
+        if product_id < 0 and count
+    ]
+
+    return {
+        "complete": bool(not missing.any() and not extra.any()),
+        "items": items,
+        "matched": [item for item in items if item["matched"]],
+        "missing": [item for item in items if item["missing"]],
+        "extra": [item for item in items if item["extra"]],
+        "unknown_labels": unknown,
+    }
+
+
+async def verify_detections(db: AsyncSession, order, detections) -> dict:
+    """
+    diff detections กับ order.order_items โดยใช้ label index ที่ cache ไว้
+    """
+    index, names = await label_index.aget(db)
+    return diff_detections(order.order_items, detections, index, names)
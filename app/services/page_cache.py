@@ -0,0 +1,95 @@
+# app/services/page_cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from app.config import settings
+
+
+def make_etag(body: bytes) -> str:
+    """
+    strong ETag จากเนื้อหาของหน้า (หน้าเดียวกันทุก byte จะได้ ETag เดียวกัน)
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def is_anonymous(request: Request) -> bool:
+    """
+    ไม่มี token ใน Cookie / Header (ตรวจแบบเดียวกับ get_current_user แต่ไม่ต้องถอด JWT หรือ query DB)
+    """
+    return not (request.cookies.get("Authorization") or request.headers.get("Authorization"))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    # If-None-Match ใช้ weak comparison: "W/" นำหน้าถือว่าตรงกันได้
+    return "*" in candidates or etag in (value[2:] if value.startswith("W/") else value for value in candidates)
+
+
+class PageCache:
+    """
+    cache หน้า HTML ที่ render แล้วสำหรับผู้ใช้ที่ยังไม่ login
+    key = (template, ส่วนที่ทำให้หน้าเปลี่ยน เช่น หมวดหมู่ + catalog version) จำกัดจำนวนแบบ LRU
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (body, etag)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body: bytes, etag: str):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (body, etag)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+page_cache = PageCache(max_entries=settings.PAGE_CACHE_SIZE)
+
+
+def render_page(request: Request, templates, name: str, context: dict, key: tuple = ()) -> Response:
+    """
+    render template พร้อม ETag / Cache-Control และตอบ 304 เมื่อ If-None-Match ตรงกัน
+    - ไม่ได้ login: ใช้หน้าที่ cache ไว้ (public ให้ proxy เก็บได้)
+    - login แล้ว: render ใหม่ทุกครั้งเพื่อให้ได้ส่วนหัวเฉพาะของผู้ใช้ (private)
+    """
+    anonymous = is_anonymous(request)
+    cache_key = (name,) + tuple(key)
+    entry = page_cache.get(cache_key) if anonymous else None
+    if entry is None:
+        body = templates.get_template(name).render({"request": request, **context}).encode("utf-8")
+        etag = make_etag(body)
+        if anonymous:
+            page_cache.put(cache_key, body, etag)
+    else:
+        body, etag = entry
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            f"public, max-age={settings.PAGE_CACHE_MAX_AGE}, must-revalidate" if anonymous else "private, no-cache"
+        ),
+        "Vary": "Cookie, Authorization",
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
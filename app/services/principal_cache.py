@@ -0,0 +1,105 @@
+# app/services/principal_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    ข้อมูลผู้ใช้ที่จำเป็นสำหรับตรวจสิทธิ์ (ไม่ใช่ ORM object จึงเก็บข้าม request ได้)
+    """
+    id: int
+    email: str
+    name: Optional[str]
+    role_id: Optional[int]
+    position_id: Optional[int]
+    is_active: bool
+
+
+class PrincipalCache:
+    """
+    cache ผู้ใช้ที่ login แล้ว key ด้วย email (sub ของ JWT) มีอายุสั้น (ttl) และจำกัดจำนวน (max_size)
+    - การแก้ไขผู้ใช้ใน process นี้จะลบ entry ทันที (invalidate_user)
+    - server อื่น (เช่น packing) จะเห็นค่าใหม่เมื่อ entry หมดอายุ
+    """
+
+    def __init__(self, ttl: float = 30.0, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # email -> (expires_at, Principal)
+        self.emails_by_id = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[Principal]:
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[principal.email] = (time.monotonic() + self.ttl, principal)
+            self.entries.move_to_end(principal.email)
+            self.emails_by_id[principal.id] = principal.email
+            while len(self.entries) > self.max_size:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.emails_by_id.pop(evicted.id, None)
+
+    def invalidate(self, user_id: int = None, email: str = None):
+        with self.lock:
+            if email is None and user_id is not None:
+                email = self.emails_by_id.get(user_id)
+            if user_id is not None:
+                self.emails_by_id.pop(user_id, None)
+            if email is not None:
+                entry = self.entries.pop(email, None)
+                if entry is not None:
+                    self.emails_by_id.pop(entry[1].id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.emails_by_id.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+principal_cache = PrincipalCache(ttl=settings.PRINCIPAL_CACHE_TTL, max_size=settings.PRINCIPAL_CACHE_SIZE)
+
+
+def principal_from_user(user) -> Principal:
+    """
+    Principal จาก User หรือแถวที่ query เฉพาะคอลัมน์ (id, email, name, role_id, position_id, is_active)
+    """
+    return Principal(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        role_id=user.role_id,
+        position_id=user.position_id,
+        is_active=bool(user.is_active),
+    )
+
+
+def invalidate_user(user_id: int = None, email: str = None):
+    """
+    เรียกหลังแก้ไข role / position / สถานะ / ข้อมูลผู้ใช้ เพื่อให้ request ถัดไปอ่านค่าใหม่จาก DB
+    """
+    principal_cache.invalidate(user_id=user_id, email=email)
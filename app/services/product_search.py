@@ -0,0 +1,329 @@
+# app/services/product_search.py
+
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.product import Product
+
+LATIN_TOKEN = re.compile(r"[a-z0-9]+")
+THAI_RUN = re.compile(r"[\u0e00-\u0e7f]+")
+
+FIELD_WEIGHTS = {"name": 3.0, "description": 1.0}
+MATCH_WEIGHTS = {"exact": 1.0, "prefix": 0.7, "fuzzy": 0.5}
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 4
+COMMON_TERM_RATIO = 0.2  # term ที่อยู่ในสินค้าเกินสัดส่วนนี้ ให้คะแนนเฉพาะสินค้าที่ตรงกับคำค้นอื่นแล้ว
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", str(text or "")).lower()
+
+
+def thai_grams(run: str, size: int = 3) -> list:
+    """
+    ภาษาไทยไม่มีช่องว่างระหว่างคำ จึง index เป็น character n-gram (ข้อความสั้นกว่า n ใช้ทั้งก้อน)
+    """
+    if len(run) <= size:
+        return [run]
+    return [run[i:i + size] for i in range(len(run) - size + 1)]
+
+
+def tokenize(text: str):
+    """
+    คืนค่า (token ภาษาอังกฤษ/ตัวเลข, n-gram ภาษาไทย)
+    """
+    text = normalize_text(text)
+    latin = LATIN_TOKEN.findall(text)
+    grams = [gram for run in THAI_RUN.findall(text) for gram in thai_grams(run)]
+    return latin, grams
+
+
+def deletes(term: str) -> set:
+    """
+    ทุกแบบที่ลบตัวอักษรออก 1 ตัว (ใช้หาคำที่สะกดผิดได้โดยไม่ต้องเทียบกับทุกคำใน vocabulary)
+    """
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) หยุดเร็วเมื่อเกิน limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class ProductSearchIndex:
+    """
+    inverted index ของชื่อและคำอธิบายสินค้าในหน่วยความจำ
+    - ภาษาอังกฤษ/ตัวเลข: ตรงทั้งคำ, prefix (ค้นใน vocabulary ที่เรียงไว้ด้วย bisect) และสะกดผิดได้ 1-2 ตัวอักษร
+    - ภาษาไทย: trigram ของข้อความ
+    - คะแนน: tf ถ่วงน้ำหนักตาม field (ชื่อ > คำอธิบาย) x idf x ชนิดการจับคู่ x สัดส่วนคำค้นที่พบ
+    - upsert/remove ทีละสินค้า, invalidate(product_ids) ทำ index ใหม่เฉพาะสินค้านั้นตอนค้นครั้งถัดไป
+    - หมดอายุ ttl: สร้าง index ชุดใหม่ใน background thread แล้วสลับเข้ามา ระหว่างนั้นค้นจาก index เดิม
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()  # สร้าง index ทั้งชุดได้ทีละครั้ง
+        self.postings = defaultdict(dict)  # term -> {product_id: weighted tf}
+        self.doc_terms = {}  # product_id -> set ของ term (ใช้ตอนลบออกจาก postings)
+        self.categories = {}  # product_id -> หมวดหมู่ (กรองก่อนจัดอันดับ)
+        self.vocabulary = []  # term ทั้งหมดที่เรียงแล้ว สำหรับ prefix
+        self.delete_index = defaultdict(set)  # term ที่ลบ 1 ตัวอักษร -> term จริง
+        self.vocabulary_dirty = False
+        self.dirty = set()
+        self.changed = None  # product_id ที่เปลี่ยนระหว่างสร้าง index ชุดใหม่ (None = ไม่ได้สร้างอยู่)
+        self.generation = 0  # เพิ่มทุกครั้งที่ invalidate() ทั้งหมด
+        self.refreshing = False
+        self.loaded = False
+        self.built_at = 0.0
+
+    # ---------- indexing ----------
+
+    def _add(self, product_id: int, name: str, description: str, category: str = None):
+        weights = defaultdict(float)
+        for field, text in (("name", name), ("description", description)):
+            latin, grams = tokenize(text)
+            for term in latin + grams:
+                weights[term] += FIELD_WEIGHTS[field]
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.vocabulary_dirty = True
+                if LATIN_TOKEN.fullmatch(term):
+                    for variant in deletes(term):
+                        self.delete_index[variant].add(term)
+            self.postings[term][product_id] = weight
+        self.doc_terms[product_id] = set(weights)
+        self.categories[product_id] = category
+
+    def _remove(self, product_id: int):
+        self.categories.pop(product_id, None)
+        for term in self.doc_terms.pop(product_id, ()):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+                self.vocabulary_dirty = True
+                if LATIN_TOKEN.fullmatch(term):
+                    for variant in deletes(term):
+                        self.delete_index[variant].discard(term)
+
+    def _note_changed(self, product_ids):
+        if self.changed is not None:
+            self.changed.update(product_ids)
+
+    def upsert(self, product_id: int, name: str, description: str, category: str = None):
+        with self.lock:
+            self._remove(product_id)
+            self._add(product_id, name, description, category)
+            self._note_changed([product_id])
+
+    def remove(self, product_id: int):
+        with self.lock:
+            self._remove(product_id)
+            self._note_changed([product_id])
+
+    def _load(self, rows):
+        self.postings.clear()
+        self.doc_terms.clear()
+        self.categories.clear()
+        self.delete_index.clear()
+        for row in rows:
+            self._add(*row)
+        self.vocabulary = sorted(self.postings)
+        self.vocabulary_dirty = False
+        self.dirty.clear()
+        self.loaded = True
+        self.built_at = time.monotonic()
+
+    def load(self, rows):
+        """
+        สร้าง index ใหม่ทั้งหมดจาก (product_id, name, description[, category])
+        """
+        with self.lock:
+            self._load(rows)
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self.built_at > self.ttl
+
+    def _rebuild(self, db: Session):
+        """
+        สร้าง index ชุดใหม่จาก DB นอก lock หลัก (การค้นหาอื่นยังใช้ index เดิมได้) แล้วสลับเข้ามาแทน
+        """
+        with self.build_lock:
+            with self.lock:
+                if self.loaded and not self._expired():
+                    return  # request อื่นสร้างให้แล้ว
+                generation = self.generation
+                self.changed = set()
+            try:
+                fresh = ProductSearchIndex(self.ttl)
+                fresh._load(db.query(Product.product_id, Product.name, Product.description, Product.category))
+            except Exception:
+                with self.lock:
+                    self.changed = None
+                raise
+            with self.lock:
+                self.postings, self.doc_terms, self.categories = fresh.postings, fresh.doc_terms, fresh.categories
+                self.vocabulary, self.delete_index = fresh.vocabulary, fresh.delete_index
+                self.vocabulary_dirty = False
+                # สินค้าที่ถูกแก้ระหว่างสร้าง index ชุดใหม่อาจได้ข้อมูลก่อนแก้ ให้โหลดซ้ำตอนค้นครั้งถัดไป
+                self.dirty, self.changed = self.changed, None
+                self.loaded = generation == self.generation
+                self.built_at = fresh.built_at
+            print(f"✅ สร้าง search index ใหม่: {len(fresh.doc_terms)} สินค้า, {len(fresh.postings)} terms")
+
+    def _rebuild_in_background(self):
+        db = SessionLocal()
+        try:
+            self._rebuild(db)
+        except Exception as e:
+            print(f"⚠️ สร้าง search index ใหม่ไม่สำเร็จ: {e}")
+        finally:
+            db.close()
+            with self.lock:
+                self.refreshing = False
+
+    def _refresh(self, db: Session):
+        if self._expired() and not self.refreshing:
+            self.refreshing = True
+            threading.Thread(target=self._rebuild_in_background, name="search-index-rebuild", daemon=True).start()
+
+        if self.dirty:
+            product_ids, self.dirty = list(self.dirty), set()
+            for product_id in product_ids:
+                self._remove(product_id)
+            rows = db.query(Product.product_id, Product.name, Product.description, Product.category).filter(
+                Product.product_id.in_(product_ids)
+            )
+            for row in rows:
+                self._add(*row)
+
+        if self.vocabulary_dirty:
+            self.vocabulary = sorted(self.postings)
+            self.vocabulary_dirty = False
+
+    def invalidate(self, product_ids=None):
+        with self.lock:
+            if product_ids is None:
+                self.loaded = False
+                self.generation += 1
+            else:
+                if self.loaded:
+                    self.dirty.update(product_ids)
+                self._note_changed(product_ids)
+
+    # ---------- search ----------
+
+    def _expand(self, token: str, fuzzy: bool = True) -> dict:
+        """
+        term ใน index ที่ตรงกับ token -> น้ำหนักของการจับคู่ (ตรงทั้งคำ > prefix > สะกดผิด)
+        n-gram ภาษาไทยไม่ใช้การสะกดผิด (fuzzy=False) แต่คำค้นไทยที่สั้นกว่า n-gram จะจับคู่แบบ prefix
+        """
+        matches = {}
+        if token in self.postings:
+            matches[token] = MATCH_WEIGHTS["exact"]
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            i = bisect_left(self.vocabulary, token)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+                matches.setdefault(self.vocabulary[i], MATCH_WEIGHTS["prefix"])
+                i += 1
+
+        if fuzzy and not matches and len(token) >= MIN_FUZZY_LENGTH:
+            limit = 1 if len(token) < 8 else 2
+            candidates = set(self.delete_index.get(token, ()))
+            for variant in deletes(token) | {token}:
+                candidates.update(self.delete_index.get(variant, ()))
+                if variant in self.postings:
+                    candidates.add(variant)
+            for term in candidates:
+                if edit_distance(token, term, limit) <= limit:
+                    matches.setdefault(term, MATCH_WEIGHTS["fuzzy"])
+        return matches
+
+    def search(self, db: Session, query: str, limit: int = 20, category: str = None) -> list:
+        """
+        คืนค่า [(product_id, score)] เรียงตามคะแนนจากมากไปน้อย
+        category: เฉพาะสินค้าในหมวดหมู่นั้น (None / "all" = ทั้งหมด) กรองก่อนตัดเหลือ limit
+        """
+        latin, grams = tokenize(query)
+        tokens = list(dict.fromkeys(latin + grams))
+        if not tokens:
+            return []
+
+        if not self.loaded:
+            # ยังไม่มี index ให้ใช้เลย ต้องรอสร้างใน request นี้
+            self._rebuild(db)
+        with self.lock:
+            self._refresh(db)
+            total = max(len(self.doc_terms), 1)
+            scores = defaultdict(float)
+            hits = defaultdict(int)
+            # ✅ เริ่มจากคำค้นที่เจาะจงที่สุด (posting สั้นสุด) คำที่พบบ่อยจะคิดคะแนนเฉพาะสินค้าที่ได้มาแล้ว
+            expanded = [(token, self._expand(token, fuzzy=token in latin)) for token in tokens]
+            expanded = [
+                (sum(len(self.postings[term]) for term in matches), matches)
+                for token, matches in expanded
+            ]
+            expanded.sort(key=lambda item: item[0])
+            for size, matches in expanded:
+                common = bool(scores) and size > total * COMMON_TERM_RATIO
+                # คำค้นหนึ่งคำได้คะแนนจาก term ที่ตรงที่สุดในแต่ละสินค้า (prefix ที่ตรงหลายคำไม่ถูกนับซ้ำ)
+                token_scores = {}
+                for term, match_weight in matches.items():
+                    postings = self.postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    candidates = (
+                        ((product_id, postings[product_id]) for product_id in scores if product_id in postings)
+                        if common else postings.items()
+                    )
+                    for product_id, weight in candidates:
+                        score = weight * idf * match_weight
+                        if score > token_scores.get(product_id, 0.0):
+                            token_scores[product_id] = score
+                for product_id, score in token_scores.items():
+                    scores[product_id] += score
+                    hits[product_id] += 1
+
+            if category and category != "all":
+                scores = {
+                    product_id: score for product_id, score in scores.items()
+                    if self.categories.get(product_id) == category
+                }
+
+        # ✅ สินค้าที่ตรงกับคำค้นครบทุกคำได้คะแนนมากกว่าที่ตรงบางคำ
+        ranked = heapq.nsmallest(
+            limit,
+            ((-score * (hits[product_id] / len(tokens)) ** 2, product_id) for product_id, score in scores.items()),
+        )
+        return [(product_id, round(-score, 4)) for score, product_id in ranked]
+
+
+product_search_index = ProductSearchIndex(ttl=settings.CATALOG_TTL)
@@ -0,0 +1,57 @@
+# app/services/rollup_reconciler.py
+
+import asyncio
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.crud.rollup_crud import reconcile_rollups, rollups_empty
+
+
+def reconcile_once(days: int = None):
+    """
+    คำนวณ rollup ยอดขายใหม่ ย้อนหลัง days วัน (ครั้งแรกที่ยังไม่มี rollup เลยจะคำนวณทั้งหมด)
+    """
+    db = SessionLocal()
+    try:
+        if rollups_empty(db):
+            days = None
+        rebuilt = reconcile_rollups(db, days)
+        print(f"✅ reconcile rollup ยอดขาย {rebuilt} วัน")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ reconcile rollup ยอดขายไม่สำเร็จ: {e}")
+    finally:
+        db.close()
+
+
+class RollupReconciler:
+    """
+    งานเบื้องหลังที่ reconcile rollup ยอดขายทุก interval วินาที
+    แก้ค่าที่คลาดจากการอัปเดตแบบ incremental ที่ล้มเหลวหรือชนกัน
+    """
+
+    def __init__(self, interval: float, days: int):
+        self.interval = interval
+        self.days = days
+        self.task = None
+
+    def start(self):
+        if self.interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await run_in_threadpool(reconcile_once, self.days)
+            await asyncio.sleep(self.interval)
+
+
+rollup_reconciler = RollupReconciler(settings.ROLLUP_RECONCILE_INTERVAL, settings.ROLLUP_RECONCILE_DAYS)
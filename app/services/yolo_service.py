@@ -0,0 +1,485 @@
+# app/services/yolo_service.py
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from app.config import settings
+
+
+class InferenceQueueFull(Exception):
+    """
+    คิวของ YOLO pool เต็ม ให้ client ลองใหม่ภายหลัง (ใช้ตอบ 503 + Retry-After)
+    """
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("YOLO inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceTimeout(Exception):
+    """
+    รอผลตรวจจับนานเกิน YOLO_DETECT_TIMEOUT (ใช้ตอบ 504)
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__(f"YOLO inference did not finish within {timeout:g}s")
+        self.timeout = timeout
+
+
+# ตรวจ replica ที่ตายแล้วอย่างน้อยทุกกี่วินาที (แม้มีผลลัพธ์จาก replica อื่นเข้ามาตลอด)
+REAP_INTERVAL = 1.0
+
+
+def parse_cpu_affinity(spec: str, num_replicas: int):
+    """
+    แปลงค่า YOLO_CPU_AFFINITY เป็นรายการ CPU ของแต่ละ replica
+
+    - ""      : ไม่ผูก CPU
+    - "auto"  : แบ่ง CPU ทั้งหมดให้แต่ละ replica เท่า ๆ กัน
+    - "0-3;4-7" หรือ "0,1;2,3" : กำหนดเองทีละ replica คั่นด้วย ;
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return [None] * num_replicas
+
+    if spec == "auto":
+        cpu_count = os.cpu_count() or 1
+        per_replica = max(1, cpu_count // num_replicas)
+        return [
+            list(range((i * per_replica) % cpu_count, (i * per_replica) % cpu_count + per_replica))
+            for i in range(num_replicas)
+        ]
+
+    groups = []
+    for group in spec.split(";"):
+        cpus = []
+        for part in group.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                start, end = part.split("-", 1)
+                cpus.extend(range(int(start), int(end) + 1))
+            else:
+                cpus.append(int(part))
+        groups.append(cpus or None)
+
+    # ถ้ากำหนดกลุ่มน้อยกว่าจำนวน replica ให้วนใช้กลุ่มเดิม
+    return [groups[i % len(groups)] for i in range(num_replicas)]
+
+
+def _configure_replica(torch_threads: int, cpu_ids):
+    """
+    ตั้งค่า CPU affinity และจำนวน thread ของ torch ใน process ของ replica (ต้องทำก่อน import torch)
+    """
+    if torch_threads:
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    if cpu_ids:
+        try:
+            if hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, cpu_ids)
+            else:
+                import psutil  # Windows ไม่มี sched_setaffinity
+                psutil.Process().cpu_affinity(cpu_ids)
+        except Exception as e:
+            print(f"⚠️ ตั้งค่า CPU affinity {cpu_ids} ไม่สำเร็จ: {e}")
+
+    import torch
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+
+
+def _next_batch(requests, batch_window: float, max_batch: int):
+    """
+    รองานแรกแบบ blocking จากนั้นรองานเพิ่มจนครบหน้าต่างเวลา หรือครบ max_batch
+    คืนค่า (batch, stopping)
+    """
+    job = requests.get()
+    if job is None:
+        return [], True
+
+    batch = [job]
+    deadline = time.monotonic() + batch_window
+    while len(batch) < max_batch:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            job = requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if job is None:
+            return batch, True
+        batch.append(job)
+    return batch, False
+
+
+def _run_batch(yolo_worker, backend, batch, results):
+    # อ่าน/ถอดรหัสภาพทีละงาน ภาพที่อ่านไม่ได้จะ fail เฉพาะ request นั้น
+    jobs, images = [], []
+    for job in batch:
+        try:
+            images.append(yolo_worker.load_image(job[1]))
+            jobs.append(job)
+        except Exception as e:
+            results.put((job[0], False, str(e)))
+    if not jobs:
+        return
+
+    try:
+        predictions = backend.predict(images)
+    except Exception as e:
+        for job in jobs:
+            results.put((job[0], False, str(e)))
+        return
+
+    if len(jobs) > 1:
+        print(f"📦 YOLO micro-batch: {len(jobs)} ภาพ")
+
+    for (job_id, source, save_annotated), image, boxes in zip(jobs, images, predictions):
+        try:
+            if isinstance(source, str):
+                # โหมดไฟล์: เขียนภาพ annotated ลงดิสก์ข้าง ๆ ไฟล์ต้นฉบับ
+                detections, annotated_path = yolo_worker.postprocess(boxes, image, backend.names, source, save_annotated)
+                payload = {"detections": detections, "annotated_image": annotated_path, "annotated_bytes": None}
+            else:
+                # โหมด in-memory: วาดและส่งภาพ annotated กลับเป็น bytes เฉพาะเมื่อผู้เรียกต้องการ (เช่น live stream ที่มีผู้ชม)
+                detections, _ = yolo_worker.postprocess(boxes, image, backend.names, None, save_annotated)
+                annotated_bytes = yolo_worker.encode_image(image) if save_annotated else None
+                payload = {"detections": detections, "annotated_image": None, "annotated_bytes": annotated_bytes}
+            results.put((job_id, True, payload))
+        except Exception as e:
+            results.put((job_id, False, str(e)))
+
+
+def _replica_main(replica_id, backend_name, model_path, torch_threads, cpu_ids, requests, results, batch_window, max_batch):
+    """
+    จุดเริ่มของ process replica: โหลดโมเดลครั้งเดียว แล้วรับงานจากคิวของตัวเองไปเรื่อย ๆ
+    """
+    _configure_replica(torch_threads, cpu_ids)
+
+    from app.services import inference_backend, yolo_worker
+
+    try:
+        backend = inference_backend.load_backend(backend_name, model_path, threads=torch_threads, imgsz=settings.YOLO_IMGSZ)
+        backend.warmup()
+        print(f"✅ YOLO replica {replica_id} พร้อมใช้งาน (backend={backend_name}, pid={os.getpid()}, threads={torch_threads}, cpus={cpu_ids})")
+    except Exception as e:
+        print(f"❌ YOLO replica {replica_id} โหลดโมเดลไม่สำเร็จ: {e}")
+        backend = None
+        load_error = str(e)
+
+    stopping = False
+    while not stopping:
+        batch, stopping = _next_batch(requests, batch_window, max_batch)
+        if not batch:
+            continue
+        if backend is None:
+            for job in batch:
+                results.put((job[0], False, f"YOLO model is not loaded: {load_error}"))
+            continue
+        _run_batch(yolo_worker, backend, batch, results)
+
+
+def _resolve(future: Future, result=None, error: Exception = None):
+    # Future ที่ผู้เรียกยกเลิกไปแล้ว (เช่น timeout) ไม่ต้อง resolve ซ้ำ
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _Replica:
+    def __init__(self, replica_id: int, process, requests):
+        self.replica_id = replica_id
+        self.process = process
+        self.requests = requests
+        self.in_flight = 0
+        self.alive = True
+
+
+class YoloInferenceService:
+    """
+    บริการตรวจจับวัตถุด้วย YOLO แบบ process pool
+
+    - แต่ละ replica เป็น process แยกที่โหลดโมเดลค้างไว้ (warm) กำหนดจำนวน thread ของ torch และ CPU affinity ได้
+    - ส่งงานไปยัง replica ที่มีงานค้างน้อยที่สุด
+    - เลือก backend ได้ (torch หรือ onnx) ผ่าน YOLO_BACKEND
+    - micro-batching: replica รวบรวมงานที่เข้ามาภายใน batch_window_ms (ไม่เกิน max_batch ภาพ)
+      แล้วรันเป็น forward เดียว จากนั้นกระจายผลลัพธ์กลับไปยังแต่ละ request
+    - คิวมีขนาดจำกัด (max_pending) ถ้าเต็มจะ raise InferenceQueueFull ทันที
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        num_workers: int = 1,
+        batch_window_ms: float = 0,
+        max_batch: int = 1,
+        torch_threads: int = 0,
+        cpu_affinity: str = "",
+        max_pending: int = 32,
+        retry_after: int = 1,
+        detect_timeout: float = 0,
+        backend: str = "torch",
+        onnx_int8: bool = False,
+        export_dir: str = "app/models/exported",
+    ):
+        self.model_path = model_path
+        self.backend = backend
+        self.onnx_int8 = onnx_int8
+        self.export_dir = export_dir
+        self.num_workers = max(1, num_workers)
+        self.batch_window = max(0.0, batch_window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.cpu_affinity = parse_cpu_affinity(cpu_affinity, self.num_workers)
+        self.max_pending = max(1, max_pending)
+        self.retry_after = retry_after
+        self.detect_timeout = max(0.0, detect_timeout)
+
+        self._replicas = []
+        self._results = None
+        self._collector = None
+        self._pending = {}  # job_id -> (future, replica)
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._started = False
+        self.model_version = None  # backend + hash ของไฟล์โมเดลที่ใช้จริง (ตั้งค่าตอน start)
+
+    def start(self):
+        """
+        เปิด replica ทั้งหมด (เรียกซ้ำได้ จะเปิดแค่ครั้งแรก)
+        """
+        with self._lock:
+            if self._started:
+                return
+
+            model_path = self._prepare_model()
+            self.model_version = self._model_version(model_path)
+
+            ctx = multiprocessing.get_context("spawn")
+            self._results = ctx.Queue()
+            for replica_id in range(self.num_workers):
+                requests = ctx.Queue()
+                process = ctx.Process(
+                    target=_replica_main,
+                    args=(
+                        replica_id,
+                        self.backend,
+                        model_path,
+                        self.torch_threads,
+                        self.cpu_affinity[replica_id],
+                        requests,
+                        self._results,
+                        self.batch_window,
+                        self.max_batch,
+                    ),
+                    name=f"yolo-replica-{replica_id}",
+                    daemon=True,
+                )
+                process.start()
+                self._replicas.append(_Replica(replica_id, process, requests))
+
+            self._collector = threading.Thread(target=self._collect_results, name="yolo-collector", daemon=True)
+            self._collector.start()
+            self._started = True
+
+    def _prepare_model(self) -> str:
+        """
+        export โมเดลสำหรับ backend ที่เลือก (ครั้งแรกเท่านั้น) ถ้าไม่สำเร็จจะกลับไปใช้ PyTorch
+        """
+        from app.services import inference_backend
+
+        try:
+            return inference_backend.prepare_model(
+                self.backend, self.model_path, self.export_dir, int8=self.onnx_int8, imgsz=settings.YOLO_IMGSZ
+            )
+        except Exception as e:
+            print(f"⚠️ เตรียมโมเดลสำหรับ backend '{self.backend}' ไม่สำเร็จ ใช้ PyTorch แทน: {e}")
+            self.backend = "torch"
+            return self.model_path
+
+    def _model_version(self, model_path: str) -> str:
+        from app.services import inference_backend
+
+        try:
+            digest = inference_backend.file_digest(model_path)
+        except OSError:
+            digest = "unknown"
+        return f"{self.backend}:{os.path.basename(model_path)}:{digest}"
+
+    def stop(self, timeout: float = 5.0):
+        """
+        ส่งสัญญาณให้ replica ทุกตัวหยุดทำงาน และยกเลิกงานที่ค้างอยู่
+        """
+        with self._lock:
+            if not self._started:
+                return
+            for replica in self._replicas:
+                replica.requests.put(None)
+            self._results.put(None)
+
+        for replica in self._replicas:
+            replica.process.join(timeout=timeout)
+            if replica.process.is_alive():
+                replica.process.terminate()
+        self._collector.join(timeout=timeout)
+
+        with self._lock:
+            for future, _ in self._pending.values():
+                _resolve(future, error=RuntimeError("YOLO service stopped"))
+            self._pending.clear()
+            self._replicas = []
+            self._started = False
+
+    def _collect_results(self):
+        """
+        thread ที่รับผลลัพธ์จากทุก replica แล้ว resolve Future ของ request นั้น
+        """
+        next_reap = time.monotonic() + REAP_INTERVAL
+        while True:
+            try:
+                message = self._results.get(timeout=REAP_INTERVAL)
+            except queue.Empty:
+                message = False
+
+            # ✅ ตรวจ replica ที่ตายตามรอบเวลา ไม่ใช่เฉพาะตอนคิวว่าง (traffic ต่อเนื่องจาก replica อื่นจะไม่บังไว้)
+            if time.monotonic() >= next_reap:
+                self._reap_dead_replicas()
+                next_reap = time.monotonic() + REAP_INTERVAL
+
+            if message is None:
+                break
+            if message is False:
+                continue
+
+            job_id, ok, payload = message
+            with self._lock:
+                entry = self._pending.pop(job_id, None)
+                if entry is None:
+                    continue
+                future, replica = entry
+                replica.in_flight -= 1
+
+            if ok:
+                _resolve(future, result=payload)
+            else:
+                _resolve(future, error=RuntimeError(payload))
+
+    def _reap_dead_replicas(self):
+        with self._lock:
+            self._reap_dead_replicas_locked()
+
+    def _reap_dead_replicas_locked(self):
+        # replica ที่ตายไปแล้ว (เช่น OOM) จะไม่ถูกส่งงานให้อีก และงานที่ค้างอยู่จะ fail ทันที
+        for replica in self._replicas:
+            if replica.alive and not replica.process.is_alive():
+                replica.alive = False
+                print(f"❌ YOLO replica {replica.replica_id} หยุดทำงาน (exitcode={replica.process.exitcode})")
+                for job_id, (future, owner) in list(self._pending.items()):
+                    if owner is replica:
+                        del self._pending[job_id]
+                        _resolve(future, error=RuntimeError(f"YOLO replica {replica.replica_id} died"))
+
+    def has_capacity(self) -> bool:
+        """
+        ตรวจสอบแบบเร็วว่ายังรับงานเพิ่มได้หรือไม่ (ใช้ก่อนรับไฟล์อัปโหลด)
+        """
+        return len(self._pending) < self.max_pending
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "model_version": self.model_version,
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "replicas": [
+                    {"id": r.replica_id, "alive": r.alive, "in_flight": r.in_flight, "cpus": self.cpu_affinity[r.replica_id]}
+                    for r in self._replicas
+                ],
+            }
+
+    def submit(self, source, save_annotated: bool = True) -> Future:
+        """
+        ส่งภาพไปยัง replica ที่มีงานค้างน้อยที่สุด คืนค่าเป็น concurrent.futures.Future
+        source เป็นได้ทั้ง path ของไฟล์ หรือ bytes ของภาพที่อัปโหลด (โหมด in-memory)
+        """
+        self.start()
+        future = Future()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                raise InferenceQueueFull(self.retry_after)
+
+            # ตรวจ process ก่อนเลือก replica เพื่อไม่ส่งงานให้ replica ที่เพิ่งตาย
+            self._reap_dead_replicas_locked()
+            alive = [r for r in self._replicas if r.alive]
+            if not alive:
+                raise RuntimeError("No YOLO replica is running")
+            replica = min(alive, key=lambda r: r.in_flight)
+
+            job_id = next(self._job_ids)
+            self._pending[job_id] = (future, replica)
+            replica.in_flight += 1
+            replica.requests.put((job_id, source, save_annotated))
+        return future
+
+    async def resolve_model_version(self) -> str:
+        """
+        เวอร์ชันโมเดลที่ใช้จริง (backend + hash ของไฟล์) ถ้ายังไม่ start จะ start ใน thread ก่อน
+        ใช้เป็นส่วนหนึ่งของ key ของ cache ผลตรวจจับ (ต้องรู้ค่าก่อนตรวจจับครั้งแรก)
+        """
+        if not self._started:
+            await asyncio.to_thread(self.start)
+        return self.model_version
+
+    async def detect(self, source, save_annotated: bool = True) -> dict:
+        """
+        ตรวจจับวัตถุแบบ async (ไม่บล็อก event loop ระหว่างรอผลลัพธ์)
+        รอไม่เกิน detect_timeout วินาที เกินแล้ว raise InferenceTimeout (ผลที่มาทีหลังจะถูกทิ้ง)
+        """
+        future = asyncio.wrap_future(self.submit(source, save_annotated))
+        if not self.detect_timeout:
+            return await future
+        try:
+            return await asyncio.wait_for(future, self.detect_timeout)
+        except asyncio.TimeoutError:
+            raise InferenceTimeout(self.detect_timeout) from None
+
+
+# ✅ instance เดียวต่อ process
+_service = None
+
+def get_yolo_service() -> YoloInferenceService:
+    global _service
+    if _service is None:
+        _service = YoloInferenceService(
+            settings.YOLO_MODEL_PATH,
+            num_workers=settings.YOLO_WORKERS,
+            batch_window_ms=settings.YOLO_BATCH_WINDOW_MS,
+            max_batch=settings.YOLO_MAX_BATCH,
+            torch_threads=settings.YOLO_TORCH_THREADS,
+            cpu_affinity=settings.YOLO_CPU_AFFINITY,
+            max_pending=settings.YOLO_MAX_PENDING,
+            retry_after=settings.YOLO_RETRY_AFTER,
+            detect_timeout=settings.YOLO_DETECT_TIMEOUT,
+            backend=settings.YOLO_BACKEND,
+            onnx_int8=settings.YOLO_ONNX_INT8,
+            export_dir=settings.YOLO_EXPORT_DIR,
+        )
+    return _service
@@ -38,53 +38,180 @@ import sys
 import json
 import cv2
 import numpy as np
-from ultralytics import YOLOv10 as YOLO
 import os
 
 MODEL_PATH = "app/models/best.pt"
-model = YOLO(MODEL_PATH)
 
-def process_image(image_path, save_annotated=True):
-    # Predict using the model
-    results = model.predict(source=image_path, conf=0.1, iou=0.45, stream=False, device='cpu')
-    
-    # Load the image for drawing
+# ค่าที่ใช้ในการทำนาย (ต้องตรงกันทุกเส้นทางที่เรียกโมเดล)
+CONF_THRESHOLD = 0.1
+IOU_THRESHOLD = 0.45
+MIN_CONFIDENCE = 0.3
+
+# โมเดลสำหรับโหมด CLI (โหลดเมื่อถูกเรียกใช้ครั้งแรกเท่านั้น)
+model = None
+
+def load_model(model_path=MODEL_PATH):
+    """
+    โหลดโมเดล YOLO จากไฟล์ checkpoint
+    (import ultralytics ที่นี่ เพื่อให้ process เว็บใช้ฟังก์ชัน post-processing/annotation ได้โดยไม่ต้องโหลด torch)
+    """
+    from ultralytics import YOLOv10 as YOLO
+
+    return YOLO(model_path)
+
+def warmup(model):
+    """
+    รันภาพว่างหนึ่งครั้งเพื่อให้ torch จัดเตรียม kernel/หน่วยความจำไว้ก่อนรับงานจริง
+    """
+    dummy = np.zeros((640, 640, 3), dtype=np.uint8)
+    model.predict(source=dummy, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, stream=False, device='cpu', verbose=False)
+
+def get_model():
+    global model
+    if model is None:
+        model = load_model(MODEL_PATH)
+    return model
+
+def read_image(image_path):
+    """
+    อ่านภาพจากไฟล์เป็น numpy array (BGR)
+    """
     image = cv2.imread(image_path)
-    
-    detections = []
-    for result in results:
-        for box in result.boxes.data:
-            x1, y1, x2, y2, conf, cls = box.tolist()
-            if conf > 0.3:
-                # Get integer coordinates for drawing
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                label = model.names[int(cls)]
-                
-                # Draw bounding box
-                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                # Add label with confidence score
-                text = f"{label}: {conf:.2f}"
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                text_size = cv2.getTextSize(text, font, 0.5, 2)[0]
-                
-                # Background for text (for better visibility)
-                cv2.rectangle(image, (x1, y1 - text_size[1] - 10), (x1 + text_size[0], y1), (0, 255, 0), -1)
-                # Text
-                cv2.putText(image, text, (x1, y1 - 5), font, 0.5, (0, 0, 0), 2)
-                
-                detections.append({
-                    "label": label,
-                    "confidence": float(conf),
-                    "box": [float(x1), float(y1), float(x2), float(y2)],
-                })
-    
-    # Save the annotated image
+    if image is None:
+        raise ValueError(f"Cannot read image: {image_path}")
+    return image
+
+def decode_image(data):
+    """
+    ถอดรหัสภาพจาก bytes ในหน่วยความจำเป็น numpy array (BGR) โดยไม่ต้องเขียนลงดิสก์
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Cannot decode uploaded image")
+    return image
+
+def load_image(source):
+    """
+    รับได้ทั้ง path ของไฟล์, bytes ของภาพ หรือ numpy array
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(source)
+    return read_image(source)
+
+def encode_image(image, ext=".jpg"):
+    """
+    เข้ารหัสภาพเป็น bytes ตามนามสกุลที่กำหนด
+    """
+    ok, buffer = cv2.imencode(ext, image)
+    if not ok:
+        raise ValueError(f"Cannot encode image as {ext}")
+    return buffer.tobytes()
+
+def annotated_path_for(image_path):
+    root, ext = os.path.splitext(image_path)
+    return f"{root}_annotated{ext or '.jpg'}"
+
+def predict_batch(images, model):
+    """
+    รันโมเดลกับภาพหลายภาพในการ forward ครั้งเดียว (ส่งเป็น list ของ numpy array เพื่อให้ ultralytics รวมเป็น batch)
+    """
+    return model.predict(source=list(images), conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, stream=False, device='cpu', verbose=False)
+
+# ตาราง class id -> label ของแต่ละ model.names (สร้างครั้งเดียวต่อ process)
+_label_tables = {}
+
+def label_table(names):
+    """
+    แปลง model.names (dict) เป็น numpy array เพื่อ map class id ทั้ง tensor ในครั้งเดียว
+    """
+    table = _label_tables.get(id(names))
+    if table is None:
+        table = np.empty(max(names) + 1, dtype=object)
+        for class_id, label in names.items():
+            table[int(class_id)] = label
+        _label_tables[id(names)] = table
+    return table
+
+def as_array(boxes):
+    """
+    รับ torch tensor หรือ numpy array ของกล่อง (N, 6) แล้วคืนค่า numpy array
+    """
+    if hasattr(boxes, "cpu"):
+        boxes = boxes.cpu().numpy()
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+
+def serialize_detections(boxes, names):
+    """
+    กรอง conf > MIN_CONFIDENCE, map class และแปลงพิกัดเป็นจำนวนเต็ม ทั้ง tensor ในครั้งเดียว
+    (ผลลัพธ์เหมือนการวนทีละกล่องแบบเดิม: พิกัดถูกตัดทศนิยมด้วย int())
+    """
+    boxes = as_array(boxes)
+    boxes = boxes[boxes[:, 4] > MIN_CONFIDENCE]
+    if not len(boxes):
+        return []
+
+    labels = label_table(names)[boxes[:, 5].astype(np.int64)].tolist()
+    confidences = boxes[:, 4].astype(np.float64).tolist()
+    coords = np.trunc(boxes[:, :4]).astype(np.float64).tolist()
+    return [
+        {"label": label, "confidence": confidence, "box": box}
+        for label, confidence, box in zip(labels, confidences, coords)
+    ]
+
+def draw_detections(image, detections):
+    """
+    วาดกรอบและ label ลงภาพ (เรียกเฉพาะเมื่อมีคนต้องการภาพ annotated)
+    """
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for det in detections:
+        x1, y1, x2, y2 = (int(v) for v in det["box"])
+        text = f"{det['label']}: {det['confidence']:.2f}"
+        text_size = cv2.getTextSize(text, font, 0.5, 2)[0]
+
+        # Draw bounding box
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        # Background for text (for better visibility)
+        cv2.rectangle(image, (x1, y1 - text_size[1] - 10), (x1 + text_size[0], y1), (0, 255, 0), -1)
+        # Text
+        cv2.putText(image, text, (x1, y1 - 5), font, 0.5, (0, 0, 0), 2)
+    return image
+
+def render_annotated(image_bytes, detections, ext=".jpg"):
+    """
+    สร้างภาพ annotated จาก bytes ของภาพต้นฉบับและ detections ที่เก็บไว้ (lazy annotation)
+    """
+    return encode_image(draw_detections(decode_image(image_bytes), detections), ext)
+
+def postprocess(boxes, image, names, image_path=None, save_annotated=True):
+    """
+    แปลงกล่องของภาพหนึ่งภาพ (แต่ละแถวคือ x1, y1, x2, y2, conf, cls) เป็น detections
+    - save_annotated: วาดกรอบลงภาพ (ถ้ามี image_path จะเขียนไฟล์ annotated ข้างไฟล์ต้นฉบับด้วย)
+    """
+    detections = serialize_detections(boxes, names)
+
+    # Save the annotated image (image_path=None คือโหมด in-memory ผู้เรียกจะจัดการภาพเอง)
+    output_path = None
     if save_annotated:
-        output_path = image_path.replace('.', '_annotated.')
-        cv2.imwrite(output_path, image)
+        draw_detections(image, detections)
+        if image_path:
+            output_path = annotated_path_for(image_path)
+            cv2.imwrite(output_path, image)
     
-    return detections, output_path if save_annotated else None
+    return detections, output_path
+
+def process_image(image_path, save_annotated=True, model=None):
+    if model is None:
+        model = get_model()
+
+    # Load the image for drawing
+    image = read_image(image_path)
+
+    # Predict using the model
+    results = predict_batch([image], model)
+
+    return postprocess(results[0].boxes.data, image, model.names, image_path, save_annotated)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -1,6 +1,7 @@
 # app/utils/product_categories.py
 
-# กำหนดประเภทสินค้าตามรหัสสินค้า (product_id)
+# หมวดหมู่เริ่มต้นของสินค้าชุดแรก (product_id) ใช้ตอน seed / backfill คอลัมน์ tb_products.category
+# หมวดหมู่จริงของสินค้าอ่านจากคอลัมน์ category เสมอ
 PRODUCT_CATEGORIES = {
     1: "arduino",     # Arduino Mega 2560
     2: "arduino",     # Arduino UNO WiFi Rev2
@@ -21,10 +22,10 @@ PRODUCT_CATEGORIES = {
     17: "accessory",  # Arducam ABS Case for IMX... 25° 24mm Camera Boards
 }
 
-# ฟังก์ชันสำหรับดึงประเภทสินค้าจาก product_id
+# ฟังก์ชันสำหรับดึงประเภทสินค้าเริ่มต้นจาก product_id
 def get_product_category(product_id):
     """
-    ดึงประเภทสินค้าจาก product_id
+    ดึงประเภทสินค้าเริ่มต้นจาก product_id (ใช้ตอน backfill คอลัมน์ category)
     
     Args:
         product_id (int): รหัสสินค้า
@@ -49,13 +50,7 @@ def get_products_by_category(products, category):
     if category == "all":
         return products
     
-    filtered_products = []
-    for product in products:
-        product_id = product.product_id
-        if PRODUCT_CATEGORIES.get(product_id) == category:
-            filtered_products.append(product)
-    
-    return filtered_products
+    return [product for product in products if product.category == category]
 
 # รายชื่อประเภทสินค้าทั้งหมด
 CATEGORIES = {
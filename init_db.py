@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from alembic import command
+from alembic.config import Config
 from app.database import Base, engine, SessionLocal
 from app.models.address import Address
 from app.models.camera import Camera
@@ -12,8 +14,11 @@ from app.models.order import Order
 from app.models.position import Position
 from app.models.product import Product
 from app.models.role import Role
+from app.models.sales_rollup import SalesRollup, ProductSalesRollup, StaffRollup
 from app.models.user import User
 from app.services.auth import hash_password
+from app.crud.rollup_crud import reconcile_rollups
+from app.utils.product_categories import get_product_category
 
 # ✅ โหลดค่าตัวแปรจาก .env
 load_dotenv()
@@ -38,6 +43,13 @@ engine = create_engine(DATABASE_URL)
 # ✅ สร้างตารางทั้งหมดใน database
 Base.metadata.create_all(bind=engine)
 
+# ✅ รัน migration ให้เป็น revision ล่าสุด (คอลัมน์ category, FULLTEXT index ของสินค้า, index ของ query ที่ใช้บ่อย, ตาราง rollup ยอดขาย)
+# ฐานข้อมูลใหม่ที่ create_all สร้างไว้ครบแล้วจะแค่บันทึก revision
+alembic_config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+with engine.begin() as conn:
+    alembic_config.attributes["connection"] = conn
+    command.upgrade(alembic_config, "head")
+
 def init_db():
     db = SessionLocal()
     
@@ -218,7 +230,7 @@ def init_db():
             # ตรวจสอบว่ามีสินค้านี้อยู่แล้วหรือไม่
             product = db.query(Product).filter(Product.product_id == product_data["product_id"]).first()
             if not product:
-                product = Product(**product_data)
+                product = Product(**product_data, category=get_product_category(product_data["product_id"]))
                 db.add(product)
                 print(f"➕ เพิ่มสินค้า: {product_data['name']}")
         
@@ -321,6 +333,10 @@ def init_db():
         
         db.commit()
 
+        # ✅ คำนวณ rollup ยอดขายจากออเดอร์ทั้งหมด (dashboard ผู้บริหาร)
+        rebuilt = reconcile_rollups(db)
+        print(f"➕ คำนวณ rollup ยอดขาย {rebuilt} วัน")
+
     except IntegrityError as e:
         db.rollback()
         print(f"❌ เกิดข้อผิดพลาด Integrity Error: {str(e)}")
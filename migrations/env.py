@@ -0,0 +1,54 @@
+# migrations/env.py
+
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+import app.models  # noqa: F401 ลงทะเบียนทุกตารางใน Base.metadata
+from app.database import Base, SQLALCHEMY_DATABASE_URL
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """
+    alembic upgrade --sql: สร้างไฟล์ SQL โดยไม่ต่อฐานข้อมูล
+    """
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """
+    ใช้ connection ที่ส่งมาใน config.attributes["connection"] ถ้ามี (init_db / test)
+    ไม่เช่นนั้นต่อฐานข้อมูลตาม sqlalchemy.url หรือค่าใน .env
+    """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            context.configure(connection=connection, target_metadata=target_metadata)
+            with context.begin_transaction():
+                context.run_migrations()
+    finally:
+        engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,21 @@
+"""baseline: schema ที่ init_db.py สร้างด้วย Base.metadata.create_all
+
+ฐานข้อมูลที่มีอยู่แล้วเริ่มนับ migration จาก revision นี้ (init_db.py เรียก alembic upgrade head ให้เอง)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
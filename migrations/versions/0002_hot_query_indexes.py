@@ -0,0 +1,53 @@
+"""index ของเงื่อนไขที่ query บ่อย (คิวออเดอร์, งานของพนักงาน, dashboard, ผู้ใช้ / กล้อง)
+
+ตรงกับ __table_args__ ของโมเดล ฐานข้อมูลที่สร้างใหม่จาก create_all มี index อยู่แล้วจึงข้ามไป
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (ชื่อ index, ตาราง, คอลัมน์)
+INDEXES = [
+    ("ix_tb_orders_status_created_at", "tb_orders", ["status", "created_at"]),
+    ("ix_tb_orders_assigned_to_status", "tb_orders", ["assigned_to", "status"]),
+    ("ix_tb_orders_assigned_to_created_at", "tb_orders", ["assigned_to", "created_at"]),
+    ("ix_tb_orders_created_at", "tb_orders", ["created_at"]),
+    ("ix_tb_orders_user_id_created_at", "tb_orders", ["user_id", "created_at"]),
+    ("ix_tb_order_items_order_id", "tb_order_items", ["order_id"]),
+    ("ix_tb_cameras_assigned_to", "tb_cameras", ["assigned_to"]),
+    ("ix_tb_users_role_id_is_active", "tb_users", ["role_id", "is_active"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name, table, columns in reversed(INDEXES):
+        inspector = sa.inspect(bind)
+        indexes = inspector.get_indexes(table)
+        others = [index for index in indexes if index["name"] != name]
+        if len(others) == len(indexes):
+            continue
+        # MySQL: foreign key ต้องมี index ที่ขึ้นต้นด้วยคอลัมน์ของมันเสมอ (index เดิมของ FK ถูกแทนที่ตอน upgrade)
+        foreign_keys = {column for fk in inspector.get_foreign_keys(table) for column in fk["constrained_columns"]}
+        if (
+            bind.dialect.name == "mysql"
+            and columns[0] in foreign_keys
+            and not any(index["column_names"][:1] == columns[:1] for index in others)
+        ):
+            op.create_index(f"{table}_{columns[0]}_fk", table, columns[:1])
+        op.drop_index(name, table_name=table)
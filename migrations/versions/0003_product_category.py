@@ -0,0 +1,42 @@
+"""คอลัมน์ tb_products.category พร้อม index และหมวดหมู่เริ่มต้นของสินค้าชุดแรก
+
+ฐานข้อมูลที่สร้างจาก create_all (หรือเคยเพิ่มคอลัมน์ด้วย init_db.py รุ่นก่อน) มีคอลัมน์อยู่แล้วจึงข้ามไป
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from app.utils.product_categories import PRODUCT_CATEGORIES
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+products = sa.table("tb_products", sa.column("product_id", sa.Integer), sa.column("category", sa.String))
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "category" not in {column["name"] for column in inspector.get_columns("tb_products")}:
+        op.add_column(
+            "tb_products",
+            sa.Column("category", sa.String(50), nullable=False, server_default="other"),
+        )
+        # สินค้าเดิมได้ 'other' จาก server_default เติมหมวดหมู่ของสินค้าชุดแรกให้
+        for product_id, category in PRODUCT_CATEGORIES.items():
+            op.execute(
+                products.update()
+                .where(products.c.product_id == product_id, products.c.category == "other")
+                .values(category=category)
+            )
+    if "ix_tb_products_category" not in {index["name"] for index in inspector.get_indexes("tb_products")}:
+        op.create_index("ix_tb_products_category", "tb_products", ["category"])
+
+
+def downgrade():
+    op.drop_index("ix_tb_products_category", table_name="tb_products")
+    op.drop_column("tb_products", "category")
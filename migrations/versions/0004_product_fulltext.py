@@ -0,0 +1,38 @@
+"""FULLTEXT index ของชื่อ + คำอธิบายสินค้า (ngram parser รองรับภาษาไทย) สำหรับ SEARCH_USE_FULLTEXT
+
+มีเฉพาะ MySQL (ngram parser ไม่มีใน MariaDB / SQLite) ฐานข้อมูลอื่นข้าม revision นี้ไป
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ft_tb_products_name_description"
+
+
+def supports_ngram_fulltext() -> bool:
+    dialect = op.get_bind().dialect
+    return dialect.name == "mysql" and not getattr(dialect, "is_mariadb", False)
+
+
+def upgrade():
+    if not supports_ngram_fulltext():
+        return
+    if INDEX_NAME in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("tb_products")}:
+        return
+    op.execute(f"ALTER TABLE tb_products ADD FULLTEXT INDEX {INDEX_NAME} (name, description) WITH PARSER ngram")
+
+
+def downgrade():
+    if not supports_ngram_fulltext():
+        return
+    if INDEX_NAME in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("tb_products")}:
+        op.drop_index(INDEX_NAME, table_name="tb_products")
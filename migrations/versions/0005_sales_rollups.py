@@ -0,0 +1,58 @@
+"""ตาราง rollup ยอดขายรายชั่วโมง / รายวัน (tb_sales_rollup, tb_product_sales_rollup, tb_staff_rollup)
+
+ฐานข้อมูลที่สร้างจาก create_all มีตารางอยู่แล้วจึงข้ามไป
+ตารางว่างจะถูกเติมโดย rollup_reconciler (คำนวณทั้งหมดจาก tb_orders เมื่อยังไม่มี rollup เลย)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ("tb_sales_rollup", "tb_product_sales_rollup", "tb_staff_rollup")
+
+
+def bucket_key():
+    # primary key ร่วมของทุกตาราง rollup: (granularity, bucket, ...)
+    return [
+        sa.Column("granularity", sa.String(4), primary_key=True),
+        sa.Column("bucket", sa.DateTime, primary_key=True),
+    ]
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "tb_sales_rollup" not in existing:
+        op.create_table(
+            "tb_sales_rollup",
+            *bucket_key(),
+            sa.Column("orders_count", sa.Integer, nullable=False),
+            sa.Column("completed_count", sa.Integer, nullable=False),
+            sa.Column("completed_sales", sa.Float, nullable=False),
+        )
+    if "tb_product_sales_rollup" not in existing:
+        op.create_table(
+            "tb_product_sales_rollup",
+            *bucket_key(),
+            sa.Column("product_id", sa.Integer, primary_key=True, autoincrement=False),
+            sa.Column("quantity", sa.Integer, nullable=False),
+        )
+    if "tb_staff_rollup" not in existing:
+        op.create_table(
+            "tb_staff_rollup",
+            *bucket_key(),
+            sa.Column("staff_id", sa.Integer, primary_key=True, autoincrement=False),
+            sa.Column("orders_handled", sa.Integer, nullable=False),
+        )
+
+
+def downgrade():
+    for table in ROLLUP_TABLES:
+        op.drop_table(table)
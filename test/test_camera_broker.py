@@ -0,0 +1,95 @@
+# test/test_camera_broker.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.services.camera_broker import CameraBroker, CameraFeed
+
+
+class FakeCapture:
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+
+    def read(self):
+        self.gate.wait()  # ส่งเฟรมเมื่อ test อนุญาตเท่านั้น
+        self.gate.clear()
+        return True, "frame"
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def feed():
+    gate = threading.Event()
+    feed = CameraFeed(1, "rtsp://camera", buffer_size=2, reconnect_delay=0.01)
+    feed._open = lambda: FakeCapture(gate)
+    feed.gate = gate
+    feed.start()
+    yield feed
+    feed.stop()
+    gate.set()
+    feed.thread.join(timeout=1)
+
+
+def test_next_frame_is_woken_by_capture_thread(feed):
+    broker = CameraBroker()
+
+    async def scenario():
+        waiting = asyncio.ensure_future(broker.next_frame(feed, 0, timeout=2))
+        await asyncio.sleep(0.05)
+        assert len(feed.waiters) == 1
+        feed.gate.set()
+        return await waiting
+
+    started = time.monotonic()
+    seq, _, frame = asyncio.run(scenario())
+    assert (seq, frame) == (1, "frame")
+    assert time.monotonic() - started < 1
+    assert feed.waiters == []
+
+
+def test_timeout_and_stop_leave_no_waiters(feed):
+    broker = CameraBroker()
+    threads = threading.active_count()
+
+    async def scenario():
+        assert await broker.wait_ready(feed, timeout=0.05) is False
+        waiting = asyncio.ensure_future(broker.next_frame(feed, 0, timeout=2))
+        await asyncio.sleep(0.05)
+        feed.stop()
+        return await waiting
+
+    assert asyncio.run(scenario()) is None
+    assert feed.waiters == []
+    assert threading.active_count() <= threads  # การรอไม่ใช้ thread เพิ่ม
+
+
+def test_cancelled_live_detection_start_releases_camera(monkeypatch):
+    from app.services import live_detection
+
+    gate = threading.Event()
+    broker = CameraBroker()
+    monkeypatch.setattr(CameraFeed, "_open", lambda self: FakeCapture(gate))
+    monkeypatch.setattr(live_detection, "get_camera_broker", lambda: broker)
+    manager = live_detection.LiveDetectionManager()
+
+    async def scenario():
+        starting = asyncio.ensure_future(manager.start(1, "rtsp://camera"))
+        await asyncio.sleep(0.05)
+        assert broker.get(1).subscribers == 1
+        starting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await starting
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        gate.set()
+    assert broker.get(1) is None
+    assert manager.get(1) is None
@@ -0,0 +1,59 @@
+# test/test_detection_cache.py
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.services import yolo_worker
+from app.services.detection_cache import DetectionCache
+
+# payload จริงที่ route เก็บลง cache (label / confidence / box)
+DETECTIONS = yolo_worker.serialize_detections(
+    np.array([[10.4, 10.6, 50.2, 50.9, 0.9, 0]], dtype=np.float32), {0: "arduino"}
+)
+
+
+def disk_files(path) -> set:
+    return set(os.listdir(path))
+
+
+def test_detections_round_trip_through_disk(tmp_path):
+    cache = DetectionCache(disk_dir=str(tmp_path))
+    cache.put("a", DETECTIONS)
+    cache.entries.clear()
+    assert cache.get("a") == DETECTIONS
+    assert DETECTIONS[0]["label"] == "arduino" and DETECTIONS[0]["box"] == [10.0, 10.0, 50.0, 50.0]
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    # งบพอสำหรับ detections 2 ไฟล์ + ภาพ annotated 1 ภาพ
+    budget = 2 * len(json.dumps(DETECTIONS, ensure_ascii=False).encode("utf-8")) + 100
+    cache = DetectionCache(disk_dir=str(tmp_path), disk_max_bytes=budget)
+    cache.put_annotated("a", DETECTIONS, b"x" * 100)
+    cache.put("a", DETECTIONS)
+    cache.put("b", DETECTIONS)
+    cache.entries.clear()
+    assert cache.get("a") == DETECTIONS  # a ถูกใช้ล่าสุด b จึงเก่าที่สุด
+
+    cache.put("c", DETECTIONS)
+    assert disk_files(tmp_path) == {"a.json", "a.jpg", "c.json"}
+    assert cache.stats()["disk_evictions"] == 1
+    assert cache.stats()["disk_bytes"] <= budget
+    cache.entries.clear()
+    assert cache.get("b") is None
+    assert cache.get_annotated("a") == b"x" * 100
+
+
+def test_disk_tier_prunes_existing_files_by_mtime(tmp_path):
+    for index, key in enumerate(["old", "mid", "new"]):
+        path = tmp_path / f"{key}.json"
+        path.write_bytes(b"[]" * 50)
+        os.utime(path, (1000 + index, 1000 + index))
+
+    cache = DetectionCache(disk_dir=str(tmp_path), disk_max_bytes=200)
+    assert disk_files(tmp_path) == {"mid.json", "new.json"}
+    assert cache.stats()["disk_bytes"] == 200
@@ -0,0 +1,83 @@
+# test/test_inference_backend.py
+
+import glob
+import os
+import pytest
+
+pytest.importorskip("ultralytics")
+pytest.importorskip("onnxruntime")
+cv2 = pytest.importorskip("cv2")
+
+from app.config import settings
+from app.services import inference_backend
+
+# ภาพทดสอบ: กำหนดผ่าน YOLO_PARITY_IMAGE หรือใช้ภาพที่เคยอัปโหลดไว้ใน uploads/packing_images
+PARITY_IMAGE = os.getenv("YOLO_PARITY_IMAGE") or next(
+    iter(sorted(
+        path for path in glob.glob("uploads/packing_images/*")
+        if not os.path.splitext(path)[0].endswith("_annotated")
+    )),
+    None,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists(settings.YOLO_MODEL_PATH) or not PARITY_IMAGE,
+    reason="ต้องมี best.pt และภาพทดสอบสำหรับเปรียบเทียบผลลัพธ์",
+)
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detect(backend, image):
+    boxes = backend.predict([image])[0]
+    return [
+        (backend.names[int(cls)], float(conf), [float(x1), float(y1), float(x2), float(y2)])
+        for x1, y1, x2, y2, conf, cls in boxes.tolist()
+        if conf > 0.3
+    ]
+
+
+@pytest.fixture(scope="module")
+def image():
+    img = cv2.imread(PARITY_IMAGE)
+    assert img is not None
+    return img
+
+
+@pytest.fixture(scope="module")
+def torch_detections(image):
+    return detect(inference_backend.TorchBackend(settings.YOLO_MODEL_PATH), image)
+
+
+# ✅ ชื่อ label ของ ONNX ต้องตรงกับ model.names ของ PyTorch
+def test_onnx_label_mapping(tmp_path_factory):
+    export_dir = str(tmp_path_factory.getbasetemp() / "exported")
+    onnx_path = inference_backend.export_onnx(settings.YOLO_MODEL_PATH, export_dir)
+    torch_backend = inference_backend.TorchBackend(settings.YOLO_MODEL_PATH)
+    onnx_backend = inference_backend.OnnxBackend(onnx_path)
+    assert onnx_backend.names == {int(k): v for k, v in torch_backend.names.items()}
+
+
+# ✅ กล่องที่ได้จาก ONNX Runtime ต้องใกล้เคียงกับ PyTorch
+@pytest.mark.parametrize("int8, min_iou", [(False, 0.9), (True, 0.7)])
+def test_onnx_boxes_match_torch(tmp_path_factory, image, torch_detections, int8, min_iou):
+    export_dir = str(tmp_path_factory.getbasetemp() / "exported")
+    onnx_path = inference_backend.export_onnx(settings.YOLO_MODEL_PATH, export_dir, int8=int8)
+    onnx_detections = detect(inference_backend.OnnxBackend(onnx_path), image)
+
+    if not int8:
+        assert len(onnx_detections) == len(torch_detections)
+
+    for label, conf, box in torch_detections:
+        candidates = [d for d in onnx_detections if d[0] == label]
+        assert candidates, f"ONNX ไม่พบ {label}"
+        best = max(candidates, key=lambda d: iou(box, d[2]))
+        assert iou(box, best[2]) >= min_iou
+        if not int8:
+            assert abs(best[1] - conf) < 0.05
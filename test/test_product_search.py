@@ -0,0 +1,114 @@
+# test/test_product_search.py
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.product import Product
+from app.services import product_search
+from app.services.product_search import ProductSearchIndex, edit_distance, tokenize
+
+PRODUCTS = [
+    (1, "Arduino Mega 2560", "บอร์ดที่มีขาสำหรับต่อใช้งานเยอะ เหมาะกับโปรเจคที่ใช้ Sensor จำนวนมาก"),
+    (2, "Arduino UNO WiFi Rev2", "เริ่มต้นใช้งาน IoT ได้ง่าย"),
+    (3, "Raspberry Pi 5 - 8GB RAM", "หน่วยความจำขนาดใหญ่สำหรับงานสร้างสื่อ"),
+    (4, "RPI NOIR Camera V2", "โมดูลกล้องพร้อมเซ็นเซอร์ความละเอียด 8 เมกะพิกเซล"),
+    (5, "Raspberry Pi Active Cooler", "ฮีตซิงก์และพัดลมระบายความร้อน"),
+]
+
+
+@pytest.fixture
+def index():
+    index = ProductSearchIndex()
+    index.load(PRODUCTS)
+    return index
+
+
+def ids(results):
+    return [product_id for product_id, _ in results]
+
+
+def test_tokenize_splits_latin_and_thai():
+    latin, grams = tokenize("Raspberry Pi กล้อง")
+    assert latin == ["raspberry", "pi"]
+    assert grams == ["กล้", "ล้อ", "้อง"]
+
+
+def test_edit_distance_counts_transposition_as_one():
+    assert edit_distance("camera", "camrea", 2) == 1
+    assert edit_distance("camera", "cooler", 1) == 2
+
+
+def test_exact_match_ranks_name_first(index):
+    assert ids(index.search(None, "arduino uno"))[0] == 2
+
+
+def test_prefix_and_typo(index):
+    assert set(ids(index.search(None, "rasp"))) == {3, 5}
+    assert ids(index.search(None, "camra")) == [4]
+
+
+def test_thai_query(index):
+    assert ids(index.search(None, "กล้อง"))[0] == 4
+    assert ids(index.search(None, "ระบาย")) == [5]
+
+
+def test_incremental_update(index):
+    index.upsert(6, "Arducam 64MP", "กล้องออโต้โฟกัส")
+    assert 6 in ids(index.search(None, "arducam"))
+    index.remove(6)
+    assert 6 not in ids(index.search(None, "arducam"))
+    assert index.search(None, "") == []
+
+
+def test_category_filter_applies_before_limit():
+    index = ProductSearchIndex()
+    index.load([(product_id, name, description, "cooling" if product_id == 5 else "board")
+                for product_id, name, description in PRODUCTS])
+    assert ids(index.search(None, "raspberry pi", limit=1)) == [3]
+    # สินค้าที่คะแนนเท่ากัน/สูงกว่าแต่อยู่หมวดอื่นต้องไม่กินที่ของ limit
+    assert ids(index.search(None, "raspberry pi", limit=1, category="cooling")) == [5]
+    assert ids(index.search(None, "raspberry pi", limit=5, category="all")) == [3, 5]
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Product.__table__])
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(product_search, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def test_expired_index_rebuilds_in_background(session_factory):
+    db = session_factory()
+    db.add(Product(product_id=6, name="Arducam 64MP", price=1, description="กล้องออโต้โฟกัส", image_path="x", category="camera"))
+    db.commit()
+
+    index = ProductSearchIndex(ttl=0)
+    index.load(PRODUCTS)
+    # request ที่เจอ index หมดอายุได้ผลจาก index เดิมทันที ไม่รอสร้างใหม่
+    assert ids(index.search(db, "arducam")) == []
+    for thread in threading.enumerate():
+        if thread.name == "search-index-rebuild":
+            thread.join(timeout=5)
+
+    index.ttl = 300
+    assert ids(index.search(db, "arducam", category="camera")) == [6]
+    assert ids(index.search(db, "arduino")) == []
+    db.close()
+
+
+def test_first_search_builds_index(session_factory):
+    db = session_factory()
+    db.add(Product(product_id=1, name="Arduino Mega 2560", price=1, description="d", image_path="x", category="arduino"))
+    db.commit()
+    index = ProductSearchIndex()
+    assert ids(index.search(db, "mega", category="arduino")) == [1]
+    assert index.search(db, "mega", category="raspberry") == []
+    db.close()
@@ -0,0 +1,175 @@
+# test/test_query_plans.py
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, func, inspect, or_, select, text
+
+import app.models  # noqa: F401 ลงทะเบียนทุกตารางใน Base.metadata
+from app.database import Base, SQLALCHEMY_DATABASE_URL
+from app.models.camera import Camera
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.user import User
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+HOT_INDEXES = {
+    "tb_orders": {
+        "ix_tb_orders_status_created_at",
+        "ix_tb_orders_assigned_to_status",
+        "ix_tb_orders_assigned_to_created_at",
+        "ix_tb_orders_created_at",
+        "ix_tb_orders_user_id_created_at",
+    },
+    "tb_order_items": {"ix_tb_order_items_order_id"},
+    "tb_cameras": {"ix_tb_cameras_assigned_to"},
+    "tb_users": {"ix_tb_users_role_id_is_active"},
+}
+
+
+def key_queries():
+    """
+    (ชื่อ, ตาราง, statement) ของ query ที่ใช้บ่อยใน packing / admin / preparation / dashboard
+    """
+    end = datetime(2026, 1, 15, 12, 0, 0)
+    start = end - timedelta(days=7)
+    orders = Order.__table__
+    return [
+        ("admin pending orders", "tb_orders", select(orders).where(Order.status == "pending")),
+        ("preparation confirmed orders", "tb_orders", select(orders).where(Order.status == "confirmed")),
+        ("packing queue", "tb_orders", select(orders).where(
+            or_(Order.assigned_to.is_(None), Order.assigned_to == 4),
+            Order.status.in_(["packing", "verifying"]),
+        )),
+        ("packing current order", "tb_orders", select(orders).where(
+            Order.assigned_to == 4, Order.status.in_(["verifying", "packing"]),
+        ).order_by(Order.created_at.desc())),
+        ("staff work history", "tb_orders", select(orders).where(
+            Order.assigned_to == 4, Order.created_at >= start, Order.created_at <= end,
+        ).order_by(Order.created_at.desc())),
+        ("dashboard order count", "tb_orders", select(func.count(Order.order_id)).where(
+            Order.created_at >= start, Order.created_at <= end,
+        )),
+        ("dashboard completed sales", "tb_orders", select(func.sum(Order.total)).where(
+            Order.status == "completed", Order.created_at >= start, Order.created_at <= end,
+        )),
+        ("customer orders", "tb_orders", select(orders).where(Order.user_id == 5)),
+        ("order items", "tb_order_items", select(OrderItem.__table__).where(OrderItem.order_id == 1)),
+        ("staff camera", "tb_cameras", select(Camera.__table__).where(Camera.assigned_to == 4)),
+        ("users to activate", "tb_users", select(User.__table__).where(User.role_id == 1, User.is_active == False)),  # noqa: E712
+    ]
+
+
+def compile_sql(statement, engine) -> str:
+    return str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def alembic_config(connection) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def index_names(engine, table: str) -> set:
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_models_declare_hot_indexes(sqlite_engine):
+    for table, names in HOT_INDEXES.items():
+        assert names <= index_names(sqlite_engine, table)
+
+
+def test_migration_recreates_and_drops_hot_indexes(sqlite_engine):
+    # ฐานข้อมูลเดิมก่อนมี index: ลบออกแล้วให้ migration สร้างคืน
+    with sqlite_engine.begin() as conn:
+        for names in HOT_INDEXES.values():
+            for name in names:
+                conn.execute(text(f"DROP INDEX {name}"))
+        command.upgrade(alembic_config(conn), "head")
+    for table, names in HOT_INDEXES.items():
+        assert names <= index_names(sqlite_engine, table)
+
+    with sqlite_engine.begin() as conn:
+        command.downgrade(alembic_config(conn), "0001")
+    for table, names in HOT_INDEXES.items():
+        assert not names & index_names(sqlite_engine, table)
+
+
+def test_migration_adds_and_backfills_product_category(sqlite_engine):
+    # ฐานข้อมูลที่สร้างก่อนมีคอลัมน์ category
+    with sqlite_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_tb_products_category"))
+        conn.execute(text("ALTER TABLE tb_products DROP COLUMN category"))
+        conn.execute(text(
+            "INSERT INTO tb_products (product_id, name, price, description, image_path, stock) "
+            "VALUES (1, 'Arduino Mega 2560', 100, 'd', 'x', 1), (99, 'Other', 1, 'd', 'x', 1)"
+        ))
+        command.upgrade(alembic_config(conn), "head")
+        categories = dict(conn.execute(text("SELECT product_id, category FROM tb_products")).all())
+    assert categories == {1: "arduino", 99: "other"}
+    assert "ix_tb_products_category" in index_names(sqlite_engine, "tb_products")
+
+    with sqlite_engine.begin() as conn:
+        command.downgrade(alembic_config(conn), "0002")
+    assert "category" not in {column["name"] for column in inspect(sqlite_engine).get_columns("tb_products")}
+
+
+def test_migration_creates_rollup_tables(sqlite_engine):
+    rollup_tables = {"tb_sales_rollup", "tb_product_sales_rollup", "tb_staff_rollup"}
+    with sqlite_engine.begin() as conn:
+        for table in rollup_tables:
+            conn.execute(text(f"DROP TABLE {table}"))
+        command.upgrade(alembic_config(conn), "head")
+    inspector = inspect(sqlite_engine)
+    for table in rollup_tables:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        assert columns == set(Base.metadata.tables[table].columns.keys())
+        assert inspector.get_pk_constraint(table)["constrained_columns"] == \
+            [column.name for column in Base.metadata.tables[table].primary_key.columns]
+
+    with sqlite_engine.begin() as conn:
+        command.downgrade(alembic_config(conn), "0004")
+    assert not rollup_tables & set(inspect(sqlite_engine).get_table_names())
+
+
+@pytest.mark.parametrize("name, table, statement", key_queries(), ids=[query[0] for query in key_queries()])
+def test_sqlite_plan_uses_index(sqlite_engine, name, table, statement):
+    with sqlite_engine.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + compile_sql(statement, sqlite_engine)))]
+    # SEARCH = ค้นผ่าน index, SCAN = อ่านทั้งตาราง (หรือทั้ง index)
+    scans = [detail for detail in plan if detail.startswith(f"SCAN {table}")]
+    assert not scans, f"{name}: {plan}"
+
+
+@pytest.fixture(scope="module")
+def mysql_engine():
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        engine.dispose()
+        pytest.skip(f"เชื่อมต่อ MySQL ไม่ได้: {e}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, table, statement", key_queries(), ids=[query[0] for query in key_queries()])
+def test_mysql_explain_has_usable_index(mysql_engine, name, table, statement):
+    with mysql_engine.connect() as conn:
+        rows = conn.execute(text("EXPLAIN " + compile_sql(statement, mysql_engine))).mappings().all()
+    # ตารางเล็ก optimizer อาจเลือกอ่านทั้งตารางเองได้ แต่ต้องมี index ที่ใช้ได้ (possible_keys) เสมอ
+    full_scans = [row for row in rows if row["table"] == table and row["type"] == "ALL" and not row["possible_keys"]]
+    assert not full_scans, f"{name}: {[dict(row) for row in rows]}"
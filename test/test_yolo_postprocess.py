@@ -0,0 +1,56 @@
+# test/test_yolo_postprocess.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.services import yolo_service, yolo_worker
+
+
+class FakeBackend:
+    names = {0: "arduino", 1: "raspberry"}
+
+    def predict(self, images):
+        boxes = np.array([[10, 10, 50, 50, 0.9, 0], [20, 20, 60, 60, 0.2, 1]], dtype=np.float32)
+        return [boxes for _ in images]
+
+
+class Results(list):
+    def put(self, item):
+        self.append(item)
+
+
+@pytest.fixture
+def draw_calls(monkeypatch):
+    calls = []
+    original = yolo_worker.draw_detections
+
+    def draw(image, detections):
+        calls.append(len(detections))
+        return original(image, detections)
+
+    monkeypatch.setattr(yolo_worker, "draw_detections", draw)
+    return calls
+
+
+def run_in_memory(save_annotated):
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    results = Results()
+    yolo_service._run_batch(yolo_worker, FakeBackend(), [(1, image, save_annotated)], results)
+    (job_id, ok, payload), = results
+    assert ok, payload
+    return payload
+
+
+def test_in_memory_detection_skips_drawing_when_not_annotated(draw_calls):
+    payload = run_in_memory(save_annotated=False)
+    assert draw_calls == []
+    assert payload["annotated_bytes"] is None
+    assert [d["label"] for d in payload["detections"]] == ["arduino"]
+
+
+def test_in_memory_detection_draws_when_annotated(draw_calls):
+    payload = run_in_memory(save_annotated=True)
+    assert draw_calls == [1]
+    assert payload["annotated_bytes"][:2] == b"\xff\xd8"  # JPEG